@@ -0,0 +1,108 @@
+# -*- encoding: utf-8 -*-
+"""
+Benchmarks of the search on synthetic queries and tablets (see pss.synthetic), to be run by asv:
+    asv run
+    asv compare <commit> <commit>
+Each class sweeps the size of the target or the number of nodes of the query, so regressions show up as a change of
+the scaling and not only of a single timing.
+"""
+from os.path import join
+from tempfile import mkdtemp
+
+from numpy.random import RandomState
+
+from pss.synthetic import random_sign, sign_tree, query_svg, SyntheticTarget
+
+SEED = 0
+WEDGES = 8
+SIZES = [256, 512, 1024]
+SPACINGS = [8, 4, 2]
+LIMIT = 10
+
+
+def build_sign():
+    return random_sign(RandomState(SEED), WEDGES)
+
+
+class QuerySuite(object):
+    """
+    Builds up the model of a synthetic query read from SVG, rasterized by numpy, so it doesn't need Qt.
+    """
+    params = [4, 8, 16]
+    param_names = ["wedges"]
+
+    def setup(self, wedges):
+        from pss.raster import RASTERIZER_NUMPY
+        from pss.svg import QuerySvg
+        path = join(mkdtemp(), "query.svg")
+        with open(path, "w") as handle:
+            handle.write(query_svg([random_sign(RandomState(SEED), wedges)]))
+        self.svg_query = QuerySvg(path, rasterizer=RASTERIZER_NUMPY)
+
+    def time_query(self, wedges):
+        from pss.model import Query
+        Query(self.svg_query)
+
+
+class DistanceTransformSuite(object):
+    """
+    Calculates the energy map of a query within tablets of increasing size and for queries of increasing node count.
+    """
+    params = [SIZES, SPACINGS]
+    param_names = ["size", "spacing"]
+
+    def setup(self, size, spacing):
+        sign = build_sign()
+        self.tree = sign_tree(sign, spacing)
+        self.target = SyntheticTarget((size, size), [sign], seed=SEED)
+
+    def time_distance_transform(self, size, spacing):
+        from pss.model import DistanceTransform
+        DistanceTransform(self.tree, self.target)
+
+    def peakmem_distance_transform(self, size, spacing):
+        from pss.model import DistanceTransform
+        DistanceTransform(self.tree, self.target)
+
+    def track_nodes(self, size, spacing):
+        return len(self.tree)
+
+
+class EvaluationSuite(object):
+    """
+    Finds the local minima within energy maps of increasing size and extracts the symbols at them.
+    """
+    params = [SIZES]
+    param_names = ["size"]
+
+    def setup(self, size):
+        from pss.model import DistanceTransform
+        sign = build_sign()
+        self.tree = sign_tree(sign)
+        self.target = SyntheticTarget((size, size), [sign], seed=SEED)
+        self.dt = DistanceTransform(self.tree, self.target)
+
+    def time_evaluation(self, size):
+        from pss.eval import Evaluation
+        Evaluation(self.tree, self.target, self.dt, LIMIT)
+
+
+class CornerSuite(object):
+    """
+    Finds the corners and junctions of the skeleton of tablets of increasing size by corner_harris and by the crossing
+    numbers of its pixels.
+    """
+    params = [SIZES, ["harris", "crossing"]]
+    param_names = ["size", "corners"]
+
+    def setup(self, size, corners):
+        from skimage.morphology import skeletonize
+        self.skeleton = skeletonize(SyntheticTarget((size, size), [build_sign()], seed=SEED).inverted_array)
+
+    def time_corners(self, size, corners):
+        if corners == "crossing":
+            from pss.junctions import find_corners
+            find_corners(self.skeleton)
+        else:
+            from skimage.feature import corner_harris, corner_peaks
+            corner_peaks(corner_harris(self.skeleton), min_distance=2)
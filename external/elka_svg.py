@@ -2,13 +2,13 @@
 # coding=utf-8
 # Batteries
 from xml.etree.ElementTree import iterparse as iterparse_xml
+from xml.parsers.expat import ParserCreate
+from xml.sax.saxutils import quoteattr
+from io import BytesIO
 import re
 
-# Own
-# import graphlib
-
-# PyQt4
-from PyQt4 import QtGui
+# PyQt4 is imported by the functions building QPainterPaths only, so the
+# geometry can be parsed without it (see parse)
 
 # Numpy
 import numpy
@@ -28,76 +28,280 @@ def tokenize_svgdlang(d):
         yield (cmd, coords)
 
 
-def parse_svgdlang(d):
+# One pass over the path data finds the commands and the numbers, which may
+# follow each other without separator, e.g. "l-1.5.5" or "1e-3-2"
+path_token_re = re.compile(r"([MmZzLlHhVvCcSsQqTtAa])"
+                           r"|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)")
+path_params = {"M": 2, "Z": 0, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4,
+               "Q": 4, "T": 2, "A": 7}
+# A segment of a subpath is stored as the number of points it adds: a line
+# adds its end, a cubic curve its two control points and its end
+LINE = 1
+CUBIC = 3
+
+
+def tokenize_path(d):
+    # Returns the commands (cmd, begin, end) indexing into one Numpy-Array
+    # holding all numbers of the path data, which are converted in bulk.
+    # Arc flags may be written without separator ("a1 1 0 013 4"), so they
+    # are split off the following number.
+    commands = []
+    numbers = []
+    arc = False
+    for cmd, number in path_token_re.findall(d):
+        if cmd:
+            if commands:
+                commands[-1][2] = len(numbers)
+            commands.append([cmd, len(numbers), None])
+            arc = cmd in "Aa"
+            continue
+        while (arc and len(number) > 1 and number[0] in "01" and
+               (len(numbers) - commands[-1][1]) % 7 in (3, 4)):
+            numbers.append(number[0])
+            number = number[1:]
+        numbers.append(number)
+    if commands:
+        commands[-1][2] = len(numbers)
+    return commands, numpy.array(numbers, dtype=float)
+
+
+def absolute(params, head):
+    # params has shape (n, k, 2), every segment ending at its last point and
+    # being relative to the end of the segment before
+    ends = numpy.cumsum(params[:, -1], axis=0) + head
+    before = numpy.concatenate([head[None], ends[:-1]])
+    return params + before[:, None]
+
+
+def quadratic_to_cubic(before, controls, ends):
+    first = before + 2.0 / 3.0 * (controls - before)
+    second = ends + 2.0 / 3.0 * (controls - ends)
+    return numpy.stack([first, second, ends], axis=1).reshape(-1, 2)
+
+
+def arc_to_cubic(start, rx, ry, angle, large, sweep, end):
+    # Endpoint to center parameterization (SVG 1.1, F.6.5), the arc is split
+    # into cubic curves spanning at most 90 degrees each. Returns None, if
+    # the arc is a straight line.
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0:
+        return None
+    phi = numpy.radians(angle)
+    cos, sin = numpy.cos(phi), numpy.sin(phi)
+    dx, dy = (start - end) / 2.0
+    x1, y1 = cos * dx + sin * dy, -sin * dx + cos * dy
+    scale = (x1 / rx) ** 2 + (y1 / ry) ** 2
+    if scale > 1:
+        rx, ry = rx * scale ** 0.5, ry * scale ** 0.5
+    num = (rx * ry) ** 2 - (rx * y1) ** 2 - (ry * x1) ** 2
+    den = (rx * y1) ** 2 + (ry * x1) ** 2
+    coef = (max(num, 0.0) / den) ** 0.5
+    if large == sweep:
+        coef = -coef
+    cx1, cy1 = coef * rx * y1 / ry, -coef * ry * x1 / rx
+    cx = cos * cx1 - sin * cy1 + (start[0] + end[0]) / 2.0
+    cy = sin * cx1 + cos * cy1 + (start[1] + end[1]) / 2.0
+    theta = numpy.arctan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    delta = numpy.arctan2((-y1 - cy1) / ry, (-x1 - cx1) / rx) - theta
+    if sweep and delta < 0:
+        delta += 2 * numpy.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * numpy.pi
+    count = max(int(numpy.ceil(abs(delta) / (numpy.pi / 2) - 1e-9)), 1)
+    step = delta / count
+    k = 4.0 / 3.0 * numpy.tan(step / 4)
+    t = theta + numpy.arange(count + 1) * step
+    unit = numpy.stack([numpy.cos(t), numpy.sin(t)], axis=1)
+    tangent = numpy.stack([-numpy.sin(t), numpy.cos(t)], axis=1)
+    curves = numpy.stack([unit[:-1] + k * tangent[:-1],
+                          unit[1:] - k * tangent[1:], unit[1:]], axis=1)
+    curves = curves.reshape(-1, 2) * (rx, ry)
+    points = numpy.stack([cx + cos * curves[:, 0] - sin * curves[:, 1],
+                          cy + sin * curves[:, 0] + cos * curves[:, 1]], axis=1)
+    points[-1] = end
+    return points
+
+
+def parse_subpaths(d):
+    # Parses SVG path data into subpaths (points, kinds, closed) without Qt.
+    # points is a Numpy-Array of shape (n, 2) starting with the start point
+    # of the subpath, kinds holds LINE or CUBIC for every segment, which takes
+    # that many points from points. Every command of SVG 1.1 is supported,
+    # quadratic curves and arcs are converted into cubic curves. Subpaths
+    # without any segment are dropped.
+    commands, values = tokenize_path(d)
+    subpaths = []
+    parts, kinds = [], []
+    head = start = numpy.zeros(2)
+    cubic_control = quadratic_control = None
+
+    def finish(closed):
+        if kinds:
+            kind, count = zip(*kinds)
+            subpaths.append((numpy.concatenate(parts),
+                             numpy.repeat(numpy.array(kind, numpy.uint8),
+                                          count),
+                             closed))
+        del parts[:], kinds[:]
+
+    def add(kind, points):
+        if not parts:
+            parts.append(head.reshape(1, 2))
+        parts.append(points)
+        kinds.append((kind, len(points) // kind))
+
+    for cmd, begin, end in commands:
+        upper = cmd.upper()
+        relative = cmd != upper
+        size = path_params[upper]
+        if upper == "Z":
+            finish(True)
+            head = start
+            cubic_control = quadratic_control = None
+            continue
+        n = (end - begin) // size
+        if n == 0:
+            continue
+        params = values[begin:begin + n * size].reshape(n, size)
+        controls = None, None
+
+        if upper in "HV":
+            axis = 0 if upper == "H" else 1
+            points = numpy.repeat(head[None], n, axis=0)
+            coords = params[:, 0]
+            points[:, axis] = numpy.cumsum(coords) + head[axis] \
+                if relative else coords
+            add(LINE, points)
+            head = points[-1]
+        elif upper == "A":
+            for rx, ry, angle, large, sweep, x, y in params.tolist():
+                target = numpy.array([x, y]) + (head if relative else 0)
+                if not numpy.array_equal(target, head):
+                    curves = arc_to_cubic(head, rx, ry, angle, large, sweep,
+                                          target)
+                    if curves is None:
+                        add(LINE, target.reshape(1, 2))
+                    else:
+                        add(CUBIC, curves)
+                head = target
+        else:
+            points = params.reshape(n, size // 2, 2)
+            if relative:
+                points = absolute(points, head)
+            ends = points[:, -1]
+            if upper in "SQT":
+                before = numpy.concatenate([head[None], ends[:-1]])
+            if upper == "M":
+                finish(False)
+                head = start = ends[0]
+                if n > 1:
+                    add(LINE, ends[1:])
+            elif upper == "L":
+                add(LINE, ends)
+            elif upper == "C":
+                add(CUBIC, points.reshape(-1, 2))
+                controls = points[-1, 1], None
+            elif upper == "S":
+                # The first control point reflects the second one of the
+                # curve before (or is the current point without one)
+                seconds = points[:, 0]
+                reflected = numpy.concatenate([
+                    (head if cubic_control is None else cubic_control)[None],
+                    seconds[:-1]])
+                firsts = 2 * before - reflected
+                add(CUBIC, numpy.stack([firsts, seconds, ends],
+                                       axis=1).reshape(-1, 2))
+                controls = seconds[-1], None
+            elif upper == "Q":
+                add(CUBIC, quadratic_to_cubic(before, points[:, 0], ends))
+                controls = None, points[-1, 0]
+            elif upper == "T":
+                quadratic = numpy.empty_like(ends)
+                control = head if quadratic_control is None \
+                    else 2 * head - quadratic_control
+                for i in range(n):
+                    quadratic[i] = control
+                    control = 2 * ends[i] - control
+                add(CUBIC, quadratic_to_cubic(before, quadratic, ends))
+                controls = None, quadratic[-1]
+            head = ends[-1]
+        cubic_control, quadratic_control = controls
+    finish(False)
+    return subpaths
+
+
+def painter_path(subpaths):
+    # Builds one QPainterPath out of the subpaths of parse_subpaths
+    from PyQt4 import QtGui
     path = QtGui.QPainterPath()
-    head = (0, 0)
-    ctrl = None
-    for cmd, coords in tokenize_svgdlang(d):
-        if cmd == "z":
+    for points, kinds, closed in subpaths:
+        points = points.tolist()
+        path.moveTo(*points[0])
+        i = 1
+        for kind in kinds.tolist():
+            if kind == LINE:
+                path.lineTo(*points[i])
+            else:
+                path.cubicTo(*(points[i] + points[i + 1] + points[i + 2]))
+            i += kind
+        if closed:
             path.closeSubpath()
-        elif cmd == "M":
-            path.moveTo(coords[0], coords[1])
-            head = (coords[0], coords[1])
-        elif cmd == "m":
-            path.moveTo(head[0]+coords[0], head[1]+coords[1])
-            head = (head[0]+coords[0], head[1]+coords[1])
-        elif cmd == "L":
-            path.lineTo(coords[0], coords[1])
-            head = (coords[0], coords[1])
-        elif cmd == "l":
-            path.lineTo(head[0]+coords[0], head[1]+coords[1])
-            head = (head[0]+coords[0], head[1]+coords[1])
-        elif cmd == "C":
-            r = 0
-            while r+6 <= len(coords):
-                path.cubicTo(coords[r+0], coords[r+1],
-                             coords[r+2], coords[r+3],
-                             coords[r+4], coords[r+5])
-                head = (coords[r+4], coords[r+5])
-                ctrl = (coords[r+2], coords[r+3])
-                r += 6
-        elif cmd == "c":
-            r = 0
-            while r+6 <= len(coords):
-                path.cubicTo(head[0]+coords[r+0], head[1]+coords[r+1],
-                             head[0]+coords[r+2], head[1]+coords[r+3],
-                             head[0]+coords[r+4], head[1]+coords[r+5])
-                head = (head[0]+coords[r+4], head[1]+coords[r+5])
-                ctrl = (head[0]+coords[r+2], head[1]+coords[r+3])
-                r += 6
-        elif cmd == "S":
-            r = 0
-            # SVG 1.1 spec: If a short hand is used before a full command
-            # set the shortened control point to the last known endpoint
-            ctrl = ctrl or head
-            while r+6 <= len(coords):
-                path.cubicTo(-ctrl[0], -ctrl[1],
-                             coords[r+0], coords[r+1],
-                             coords[r+2], coords[r+3])
-                head = (coords[r+2], coords[r+3])
-                ctrl = (coords[r+0], coords[r+1])
-                r += 6
-        elif cmd == "s":
-            r = 0
-            # SVG 1.1 spec: If a short hand is used before a full command
-            # set the shortened control point to the last known endpoint
-            ctrl = ctrl or head
-            while r+6 <= len(coords):
-                path.cubicTo(head[0]-ctrl[0], head[1]-ctrl[1],
-                             head[0]+coords[r+0], head[1]+coords[r+1],
-                             head[0]+coords[r+2], head[1]+coords[r+3])
-                head = (head[0]+coords[r+2], head[1]+coords[r+3])
-                ctrl = (head[0]+coords[r+0], head[1]+coords[r+1])
-                r += 6
     return path
 
 
+def parse_svgdlang(d):
+    return painter_path(parse_subpaths(d))
+
+
+transform_re = re.compile(r"[\s,]*(matrix|translate|scale|rotate|skewX|skewY)"
+                          r"\s*\(([^)]*)\)[\s,]*")
+# Number of arguments every transform function accepts
+transform_arguments = {"matrix": (6,), "translate": (1, 2), "scale": (1, 2),
+                       "rotate": (1, 3), "skewX": (1,), "skewY": (1,)}
+
+
+def transform_matrix(name, args):
+    # The 2x3 matrix [[a, c, e], [b, d, f]] of a single transform function
+    if name == "matrix":
+        a, b, c, d, e, f = args
+        return [[a, c, e], [b, d, f]]
+    if name == "translate":
+        return [[1, 0, args[0]], [0, 1, args[1] if len(args) > 1 else 0]]
+    if name == "scale":
+        return [[args[0], 0, 0], [0, args[-1], 0]]
+    if name == "skewX":
+        return [[1, numpy.tan(numpy.radians(args[0])), 0], [0, 1, 0]]
+    if name == "skewY":
+        return [[1, 0, 0], [numpy.tan(numpy.radians(args[0])), 1, 0]]
+    # rotate(angle [cx cy]) rotates around (cx, cy)
+    angle = numpy.radians(args[0])
+    cx, cy = args[1:] if len(args) == 3 else (0, 0)
+    cos, sin = numpy.cos(angle), numpy.sin(angle)
+    return [[cos, -sin, cx - cos * cx + sin * cy],
+            [sin, cos, cy - sin * cx - cos * cy]]
+
+
 def parse_transform(inst):
-    m = re.match("translate\( *"+float_re+" *, *"+float_re+" *\)", inst)
-    if m != None:
-        x, y = float(m.group(1)), float(m.group(2))
-        return [[1, 0, 0, x], [0, 1, 0, y], [0, 0, 1, 0], [0, 0, 0, 1]]
-    raise Exception("Invalid transform instruction: "+inst)
+    # Parses an SVG transform list into a 4x4 matrix, whose upper left 2x2
+    # block is the linear part and whose last column is the translation.
+    # The functions of the list are applied from right to left.
+    # An empty list is the identity.
+    mat = numpy.identity(4)
+    position = 0
+    while inst[position:].strip():
+        m = transform_re.match(inst, position)
+        if m == None:
+            raise ValueError("Invalid transform instruction: "+inst)
+        args = [float(arg) for arg in
+                re.findall(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?",
+                           m.group(2))]
+        if len(args) not in transform_arguments[m.group(1)]:
+            raise ValueError("Invalid transform instruction: "+inst)
+        step = numpy.identity(4)
+        step[numpy.ix_([0, 1], [0, 1, 3])] = transform_matrix(m.group(1), args)
+        mat = mat.dot(step)
+        position = m.end()
+    return mat
 
 
 def find_subtree_titled(title, source):
@@ -118,28 +322,44 @@ def find_subtree_titled(title, source):
                 groups.append(elem)
 
 
-def parse(infix, source):
+def qt_path(d, dx, dy):
+    path = parse_svgdlang(d)
+    path.translate(dx, dy)
+    return path
+
+
+def parse(infix, source, build=qt_path):
+    # build(d, dx, dy) creates a path out of the SVG path data d, translated
+    # by the current transformation (dx, dy). By default it is a QPainterPath.
     #assert infix != "", "Weird things happen with infix == ''"
     mark = None
     mat_stack = [numpy.identity(4)]
+    # Open elements and groups, whose first title was seen already
+    open_elems = []
+    titled = set()
     for ev, elem in iterparse_xml(source, events=("start", "end")):
-        if elem.tag == "{http://www.w3.org/2000/svg}g":
-            if ev == "start":
-                # If a group has "infix" child set the mark to its id.
-                # All elements below the mark will be part of the same
-                # graph.
-                t = elem.find("{http://www.w3.org/2000/svg}title")
-                if t != None and infix in t.text:
-                    mark = elem.attrib["id"]
+        if ev == "start":
+            open_elems.append(elem)
+        else:
+            open_elems.pop()
+
+        if elem.tag == "{http://www.w3.org/2000/svg}title" and ev == "end":
+            # If a group has "infix" child set the mark to it.
+            # All elements below the mark will be part of the same
+            # graph. The title is only checked at its end, since its
+            # text isn't necessarily parsed before.
+            group = open_elems[-1] if open_elems else None
+            if (group != None and group.tag == "{http://www.w3.org/2000/svg}g"
+                    and id(group) not in titled):
+                titled.add(id(group))
+                if elem.text != None and infix in elem.text:
+                    mark = group
                     # Begin a new paths group upon hitting a mark
-                    name = t.text
+                    name = elem.text
                     paths = []
-                #elif "id" in elem.attrib and infix in elem.attrib["id"]:
-                #    mark = elem.attrib["id"]
-                #    # Begin a new paths group upon hitting a mark
-                #    name = elem.attrib["id"]
-                #    paths = []
 
+        if elem.tag == "{http://www.w3.org/2000/svg}g":
+            if ev == "start":
                 # Keep track of the current transformation stack.
                 # This has to be done independently of the current mark
                 # state since unmarked groups also contribute matrices.
@@ -148,9 +368,10 @@ def parse(infix, source):
                     mat_stack.append(mat_stack[-1].dot(numpy.array(mat)))
 
             elif ev == "end":
+                titled.discard(id(elem))
                 # If the element which the mark was set on ends, the mark
                 # has to be removed as well
-                if "id" in elem.attrib and elem.attrib["id"] == mark:
+                if elem is mark:
                     mark = None
 
                     # Dump the current paths group upon leaving a mark.
@@ -170,56 +391,174 @@ def parse(infix, source):
         # The following elements are only parsed if they are part of the
         # selection. Additionally, we only care for "end" events, since only
         # those guarantee that the text of an element has been parsed.
-        if mark == None or ev != "end":
+        if ev != "end":
             continue
 
-        if elem.tag == "{http://www.w3.org/2000/svg}line":
-            # A SVG line element can be modeled as an open SVG path with
-            # pen thickness but no fill. This conversion is allowed and
-            # described in the SVG 1.1 spec.
-            w = 0.25 # elem.attrib["style"] match stroke-width:float_re / 2
-
-            v1 = numpy.array([float(elem.attrib["x1"]),
-                              float(elem.attrib["y1"])])
-            v2 = numpy.array([float(elem.attrib["x2"]),
-                              float(elem.attrib["y2"])])
-
-            # Get the normal vector of the line and calculate perpendicular
-            # vectors, one to the left one to the right. It doesnt matter
-            # which is which as long as they differ.
-            n = v2 - v1
-            n = n / numpy.linalg.norm(n)
-            p = numpy.array([n[1], -n[0]]) * w
-            q = numpy.array([-n[1], n[0]]) * w
-
-            path = QtGui.QPainterPath()
-            path.moveTo(*(v1+q))
-            path.lineTo(*(v1+p))
-            path.lineTo(*(v2+p))
-            path.lineTo(*(v2+q))
-            path.lineTo(*(v1+q))
-            path.translate(mat_stack[-1][0, 3], mat_stack[-1][1, 3])
-            paths.append(path)
-        elif elem.tag == "{http://www.w3.org/2000/svg}path":
-            if "style" in elem.attrib or "fill" in elem.attrib:
-                # CSS styled elements are not yet supported.
-                continue
-            path = parse_svgdlang(elem.attrib["d"])
-            path.translate(mat_stack[-1][0, 3], mat_stack[-1][1, 3])
-            paths.append(path)
+        if mark != None:
+            paths.extend(element_paths(elem, mat_stack[-1], build))
+
+        # Release every parsed element, so the memory needed doesn't grow
+        # with the size of the file
+        elem.clear()
+
+
+def element_paths(elem, mat, build):
+    dx, dy = mat[0, 3], mat[1, 3]
+    if elem.tag == "{http://www.w3.org/2000/svg}line":
+        # A SVG line element can be modeled as an open SVG path with
+        # pen thickness but no fill. This conversion is allowed and
+        # described in the SVG 1.1 spec.
+        w = 0.25 # elem.attrib["style"] match stroke-width:float_re / 2
+
+        v1 = numpy.array([float(elem.attrib["x1"]),
+                          float(elem.attrib["y1"])])
+        v2 = numpy.array([float(elem.attrib["x2"]),
+                          float(elem.attrib["y2"])])
+
+        # Get the normal vector of the line and calculate perpendicular
+        # vectors, one to the left one to the right. It doesnt matter
+        # which is which as long as they differ.
+        n = v2 - v1
+        n = n / numpy.linalg.norm(n)
+        p = numpy.array([n[1], -n[0]]) * w
+        q = numpy.array([-n[1], n[0]]) * w
+
+        corners = [v1+q, v1+p, v2+p, v2+q, v1+q]
+        d = "M " + " L ".join("{:f} {:f}".format(*c) for c in corners)
+        return [build(d, dx, dy)]
+    elif elem.tag == "{http://www.w3.org/2000/svg}path":
+        if "style" in elem.attrib or "fill" in elem.attrib:
+            # CSS styled elements are not yet supported.
+            return []
+        return [build(elem.attrib["d"], dx, dy)]
+    return []
+
+
+def index(infix, source):
+    # Finds the same groups as parse, but only records their names and where
+    # they are within the file, so a group can be parsed on its own later
+    # (see parse_group). Nothing but the stack of open elements is kept in
+    # memory. Returns the root element as (tag, attributes) and a list of
+    # (name, start, end, (dx, dy), namespaces) with the byte offsets of the
+    # start tag and the end tag of each group, the translation of its parent
+    # group and the namespaces declared by the elements between the root and
+    # the group (e.g. an Inkscape layer), which parse_group declares again.
+    parser = ParserCreate()
+    root = []
+    groups = []
+    # Open elements as [local name, byte offset, matrix, parent matrix,
+    # title of a group or None, namespace declarations]
+    stack = []
+    mark = [None]
+
+    def start(tag, attrib):
+        if not root:
+            root.append((tag, attrib))
+        parent = stack[-1][2] if stack else numpy.identity(4)
+        mat = parent
+        if local_name(tag) == "g" and "transform" in attrib:
+            mat = parent.dot(numpy.array(parse_transform(attrib["transform"])))
+        namespaces = {key: value for key, value in attrib.items()
+                      if key == "xmlns" or key.startswith("xmlns:")}
+        stack.append([local_name(tag), parser.CurrentByteIndex, mat, parent,
+                      None, namespaces])
+        if local_name(tag) == "title" and len(stack) > 1:
+            if stack[-2][0] == "g" and stack[-2][4] == None:
+                stack[-2][4] = True
+                stack[-1][4] = ""
+
+    def text(data):
+        if stack and stack[-1][0] == "title" and stack[-1][4] != None:
+            stack[-1][4] += data
+
+    def end(tag):
+        name, offset, _, parent, title, _ = stack.pop()
+        if name == "title" and title != None and infix in title:
+            # Like parse, a group is marked by its first title and a group
+            # marked within another one takes over the mark
+            mark[0] = (len(stack), title)
+        elif name == "g" and mark[0] != None and mark[0][0] == len(stack) + 1:
+            namespaces = {}
+            for element in stack[1:]:
+                namespaces.update(element[5])
+            groups.append((mark[0][1], offset, parser.CurrentByteIndex,
+                           (parent[0, 3], parent[1, 3]), namespaces))
+            mark[0] = None
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = text
+    if hasattr(source, "read"):
+        parser.ParseFile(source)
+    else:
+        with open(source, "rb") as handle:
+            parser.ParseFile(handle)
+    return root[0], groups
+
+
+def local_name(tag):
+    return tag.rsplit(":", 1)[-1]
+
+
+def parse_group(infix, source, root, group, build=qt_path):
+    # Parses a single group found by index. Only the bytes of the group are
+    # read, wrapped into the root element and the translation of its parent,
+    # which declares the namespaces of the ancestors of the group as well.
+    name, start, end, (dx, dy), namespaces = group
+    with open(source, "rb") as handle:
+        handle.seek(start)
+        data = handle.read(end - start)
+        # The end tag itself
+        tail = b""
+        while not tail.endswith(b">"):
+            byte = handle.read(1)
+            if not byte:
+                break
+            tail += byte
+        data += tail
+
+    tag, attrib = root
+    head = "<{} {}>".format(tag, " ".join(
+        "{}={}".format(key, quoteattr(value)) for key, value in attrib.items()))
+    wrapper = '<g transform="translate({:f}, {:f})"{}>'.format(dx, dy, "".join(
+        " {}={}".format(key, quoteattr(value))
+        for key, value in sorted(namespaces.items())))
+    document = (head + wrapper).encode() + data + "</g></{}>".format(tag).encode()
+    for title, paths in parse(infix, BytesIO(document), build):
+        if title == name:
+            return paths
+    raise ValueError("Group {} not found at byte {}".format(name, start))
+
+
+def overlapping_boxes(boxes):
+    # Sweeps over the boxes (left, top, right, bottom) sorted by their left
+    # side. Only the boxes starting before the right side of a box can
+    # overlap it, those are found by a binary search and checked along y.
+    # Returns every overlapping unordered pair (i, j) with i < j once.
+    boxes = numpy.asarray(boxes, dtype=float).reshape(-1, 4)
+    order = numpy.argsort(boxes[:, 0], kind="stable")
+    lefts = boxes[order, 0]
+    stops = numpy.searchsorted(lefts, boxes[order, 2], side="right")
+    pairs = []
+    for k, stop in enumerate(stops):
+        others = order[k+1:stop]
+        i = order[k]
+        others = others[(boxes[others, 1] <= boxes[i, 3]) &
+                        (boxes[others, 3] >= boxes[i, 1])]
+        pairs.extend((min(i, j), max(i, j)) for j in others.tolist())
+    return sorted(pairs)
 
 
 def path_intersections(paths):
-    # ODO: Most expensive function where controlPointRect most expensive call.
-    for i, path1 in enumerate(paths):
-        for j, path2 in enumerate(paths):
-            if path1 == path2:
-                continue
-
-            isctd = path1.intersected(path2)
-            rect = isctd.controlPointRect()
-            if not rect.isNull():
-                yield (i, j, rect)
+    # Intersecting paths is the most expensive call, so it is only done for
+    # paths, whose control point rectangles overlap, and only once per pair.
+    rects = [path.controlPointRect() for path in paths]
+    boxes = [(r.left(), r.top(), r.right(), r.bottom()) for r in rects]
+    for i, j in overlapping_boxes(boxes):
+        isctd = paths[i].intersected(paths[j])
+        rect = isctd.controlPointRect()
+        if not rect.isNull():
+            yield (i, j, rect)
 
 
 def most_distant_vertices(path):
@@ -247,8 +586,40 @@ def most_distant_vertices(path):
     return ((a.x(), a.y()), (b.x(), b.y()))
 
 
+def merge_vertices(vertices, tolerance=1.0):
+    # Merges vertices closer than the tolerance into the one coming first.
+    # Vertices are hashed into a grid of cells as large as the tolerance, so
+    # only the vertices of the neighboring cells have to be compared.
+    # Returns the merged vertices and the index of the merged vertex for
+    # every vertex.
+    vertices = numpy.asarray(vertices, dtype=float).reshape(-1, 2)
+    cells = numpy.floor(vertices / tolerance).astype(int)
+    grid = {}
+    merged = []
+    remap = numpy.zeros(len(vertices), dtype=int)
+    for k, (vertex, (cx, cy)) in enumerate(zip(vertices, cells.tolist())):
+        closest, distance = None, tolerance**2
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for m in grid.get((cx+dx, cy+dy), ()):
+                    d = ((merged[m]-vertex)**2).sum()
+                    if d < distance or (d == distance and closest != None
+                                        and m < closest):
+                        closest, distance = m, d
+        if closest == None:
+            closest = len(merged)
+            merged.append(vertex)
+            grid.setdefault((cx, cy), []).append(closest)
+        remap[k] = closest
+    return numpy.array(merged).reshape(-1, 2), remap
+
+
 def graph_from_paths(paths):
-    paths_iscts = {}
+    # Returns the vertices as numpy.array of shape (n, 2) and the adjacency
+    # of the undirected graph as sparse CSR matrix
+    from scipy.sparse import coo_matrix
+
+    paths_iscts = [[] for _ in paths]
     paths_ends = []
 
     vertices = []
@@ -258,7 +629,8 @@ def graph_from_paths(paths):
     for i, j, rect in path_intersections(paths):
         center = (rect.x()+rect.width()*0.5, rect.y()+rect.height()*0.5)
         vertices.append(center)
-        paths_iscts[i, j] = len(vertices)-1
+        paths_iscts[i].append(len(vertices)-1)
+        paths_iscts[j].append(len(vertices)-1)
 
     # Find the beginning and end of a cuneiform stroke
     for path in paths:
@@ -269,14 +641,14 @@ def graph_from_paths(paths):
         paths_ends.append((len(vertices)-2, len(vertices)-1))
 
     # De-duplicate and merge vertices for a simplified graph
-    vertices, remap = graphlib.merge_vertices(vertices)
-    paths_iscts = {(i, j): remap[k] for (i, j), k in paths_iscts.items()}
+    vertices, remap = merge_vertices(vertices)
+    paths_iscts = [[remap[k] for k in iscts] for iscts in paths_iscts]
     paths_ends = [(remap[i], remap[j]) for i, j in paths_ends]
 
     # Use a titled sweepline to reconnect vertices and form edges
     for i in range(len(paths)):
         ends = paths_ends[i]
-        iscts = [n for (l, m), n in paths_iscts.items() if l == i]
+        iscts = paths_iscts[i]
         # Remove duplicates from collapsed edges.
         stroke = list(set([ends[0]] + iscts + [ends[1]]))
         # Tilted sweep line sorting.
@@ -287,24 +659,16 @@ def graph_from_paths(paths):
             assert v1 != v2, "Edges from and to the same vertex are invalid."
             edges.append((v1, v2))
 
-    # Build a adjacency matrix from the edge and vertex lists
-    adjacency = numpy.zeros((len(vertices), len(vertices)))
-    for edge in edges:
-        adjacency[edge[0], edge[1]] = 1
-        adjacency[edge[1], edge[0]] = 1
-
-    assert (adjacency.T == adjacency).all(), ("Adjacency matrix of an"
-        "undirected graph has to be symmetric.")
-
-    # Since the shape of vertices is unlikely to change anymore
-    # use a numpy.array instead, more functions work with numpy.arrays
-    vertices = numpy.array(vertices)
-
-    # Labels have to be a python list since any object, not only integers,
-    # are valid labels
-    labels = list(range(len(vertices)))
+    # Build a sparse symmetric adjacency matrix from the edge list, an edge
+    # found twice is still stored once
+    edges = numpy.array(edges, dtype=int).reshape(-1, 2)
+    rows = numpy.concatenate([edges[:, 0], edges[:, 1]])
+    cols = numpy.concatenate([edges[:, 1], edges[:, 0]])
+    adjacency = coo_matrix((numpy.ones(len(rows)), (rows, cols)),
+                           shape=(len(vertices), len(vertices))).tocsr()
+    adjacency.data[:] = 1
 
-    return graphlib.Graph(labels, vertices, adjacency)
+    return vertices, adjacency
 
 
 def path_to_vertices(path):
@@ -1,16 +1,12 @@
 #!/usr/bin/python3
 # coding=utf-8
-from copy import deepcopy
-
-from numpy.random import random
-from matplotlib import pyplot as plt
 
 __author__ = 'bbogacz'
 
 # Batteries
 
 # Numpy
-from numpy import zeros, inf, array
+from numpy import zeros, empty, arange, asarray, flatnonzero, inf
 
 
 def of_column(dataInput):
@@ -18,13 +14,15 @@ def of_column(dataInput):
     n = len(dataInput)
 
     d = zeros((n, ))
-    v = zeros((n,))
+    v = zeros((n,), dtype=int)
     z = zeros((n + 1,))
     k = 0
 
     v[0] = 0
-    z[0] = -2**31
-    z[1] = +2**31
+    # Infinite bounds, finite ones get passed by the intersections of very
+    # flat parabolas
+    z[0] = -inf
+    z[1] = +inf
 
     for q in range(1, n):
         s = (((f[q] + q * q) - (f[v[k]] + v[k] * v[k])) / (2.0 * q - 2.0 * v[k]))
@@ -34,7 +32,7 @@ def of_column(dataInput):
         k += 1
         v[k] = q
         z[k] = s
-        z[k + 1] = +2**31
+        z[k + 1] = +inf
 
     k = 0
 
@@ -57,3 +55,66 @@ def of_image(I):
 
     return D2
 
+
+def of_rows(dataInput, weight=1.0):
+    """
+    Same as of_column, but for every row of a 2D array at once. The lower
+    envelopes of all rows are built up together, one column q at a time, so
+    the python loops run over the width only and everything else is done by
+    numpy on whole columns.
+    The weight scales the parabolas, so d[q] = min_p(weight * (q - p)^2 + f[p]).
+    """
+    if weight <= 0:
+        raise ValueError("Weight of the parabolas has to be positive, got {}".format(weight))
+    f = asarray(dataInput, dtype=float)
+    rows, n = f.shape
+    r = arange(rows)
+
+    d = empty((rows, n))
+    v = zeros((rows, n), dtype=int)
+    z = zeros((rows, n + 1))
+    k = zeros((rows,), dtype=int)
+
+    # Infinite bounds, see of_column
+    z[:, 0] = -inf
+    z[:, 1] = +inf
+
+    for q in range(1, n):
+        fq = f[:, q] + weight * (q * q)
+        vk = v[r, k]
+        s = ((fq - (f[r, vk] + weight * (vk * vk))) / (2.0 * weight * q - 2.0 * weight * vk))
+
+        # Only rows whose last parabola gets hidden by q need another step
+        pop = flatnonzero(s <= z[r, k])
+        while len(pop) > 0:
+            k[pop] -= 1
+            vk = v[pop, k[pop]]
+            s[pop] = ((fq[pop] - (f[pop, vk] + weight * (vk * vk))) / (2.0 * weight * q - 2.0 * weight * vk))
+            pop = pop[s[pop] <= z[pop, k[pop]]]
+
+        k += 1
+        v[r, k] = q
+        z[r, k] = s
+        z[r, k + 1] = +inf
+
+    k[:] = 0
+
+    for q in range(n):
+        step = flatnonzero(z[r, k + 1] < q)
+        while len(step) > 0:
+            k[step] += 1
+            step = step[z[step, k[step] + 1] < q]
+        vk = v[r, k]
+        d[:, q] = (weight * ((q - vk) * (q - vk)) + f[r, vk])
+
+    return d
+
+
+def of_image_vectorized(I, weights=(1.0, 1.0)):
+    """
+    Same as of_image, but transforms all rows and then all columns at once.
+    The weights (y, x) scale the parabolas along the columns and rows.
+    """
+    D1 = of_rows(I, weights[1])
+    D2 = of_rows(D1.T, weights[0]).T
+    return D2
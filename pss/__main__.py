@@ -5,12 +5,20 @@ from logging import getLogger
 from os.path import dirname, abspath, join
 from sys import exit
 
+from pss.batch import BatchSearch
 from pss.binimg import TargetBin, QueryBin
-from pss.eval import Evaluation, PR
+from pss.cache import QueryCache
+from pss.eval import Evaluation
 from pss.gui import GUIHandler
-from pss.model import DistanceTransform, Query, Target
+from pss.minima import WINDOW_QUERY
+from pss.profiling import Tracer
+from pss.raster import RASTERIZER_QT
+from pss.model import DistanceTransform, Query, Target, PLACEMENT_GRAPH, CORNERS_HARRIS
+from pss.pyramid import PyramidSearch
+from pss.scratch import Scratch
 from pss.settings import Settings
 from pss.svg import QuerySvg, TargetSvg
+from pss.tiling import TiledSearch
 
 logger = getLogger('Main')
 FILE_LOCATION = dirname(abspath(__file__))
@@ -21,21 +29,84 @@ def main():
     Main entry point for the application to start the program from.
     """
     settings = Settings()
+    tracer = None
+    if settings.options.trace is not None or settings.options.profile is not None:
+        # tracemalloc slows down every allocation, so it only runs for --trace and doesn't distort --profile
+        tracer = Tracer(memory=settings.options.trace is not None, profile=settings.options.profile,
+                        profile_path=settings.options.profile_output).start()
+    try:
+        run(settings)
+    finally:
+        if tracer is not None:
+            tracer.stop()
+            if settings.options.trace is not None:
+                tracer.write(settings.options.trace)
+
+
+def run(settings):
+    """
+    Searches the query within the target as configured by the settings
+    :param settings: Settings holding the parsed options
+    """
     scale = settings.options.scale
     limit = settings.options.limit
     index = settings.options.index
     query_path = settings.options.query
     target_path = settings.options.target
+    cache = None
+    if settings.options.cache is not None:
+        cache = QueryCache(settings.options.cache, max_bytes=settings.options.cache_size * 2**20)
+    if settings.options.batch and settings.options.scratch is not None:
+        settings.arg_parser.error("--scratch can't be combined with --batch, the shared distance transform of the "
+                                  "target is kept in memory")
+    check_search_options(settings)
+    scratch = None
+    if settings.options.scratch is not None:
+        scratch = Scratch(settings.options.scratch)
+    window = settings.options.window
 
     starting_time = str(datetime.now())
     logger.info("PartStructuredSpotting started at %s", starting_time)
 
-    query = read_query_file(index, query_path, scale)
-    target = read_target_file(scale, target_path)
-
-    distance_transform = DistanceTransform(query, target)
-
-    evaluation = Evaluation(query, target, distance_transform, limit, scale=scale)
+    rasterizer = settings.options.rasterizer
+    target = read_target_file(scale, target_path, scratch=scratch, rasterizer=rasterizer)
+    if settings.options.batch:
+        queries = read_query_files([query_path] + settings.options.queries, scale, cache=cache,
+                                   placement=settings.options.placement, rasterizer=rasterizer,
+                                   corners=settings.options.corners)
+        search = BatchSearch(queries, target, limit, engine=settings.options.engine,
+                             deformation=tuple(settings.options.deformation), workers=settings.options.workers,
+                             window=window)
+        for query, minimum, found_symbols in zip(queries, search.minima, search.found_symbols):
+            for y, x, (_, energy) in zip(minimum[0], minimum[1], found_symbols):
+                logger.info("Found symbol [%s] at (%d, %d) with energy %f", query.name, y, x, energy)
+        return
+
+    query = read_query_file(index, query_path, scale, cache=cache, placement=settings.options.placement,
+                            rasterizer=rasterizer, corners=settings.options.corners)
+
+    if settings.options.tile_size is not None:
+        search = TiledSearch(query, target, limit, tile_size=settings.options.tile_size, window=window,
+                             search=not settings.options.stream, workers=settings.options.workers)
+        if settings.options.stream:
+            for detection in search.detections():
+                logger.info("Found symbol at %s with energy %f", detection.position, detection.energy)
+        else:
+            log_minima(search)
+        return
+
+    if settings.options.pyramid is not None:
+        search = PyramidSearch(query, target, limit, levels=settings.options.pyramid,
+                               candidates=settings.options.candidates, threshold=settings.options.threshold,
+                               workers=settings.options.workers)
+        log_minima(search)
+        return
+
+    distance_transform = DistanceTransform(query, target, engine=settings.options.engine,
+                                           deformation=tuple(settings.options.deformation), scratch=scratch,
+                                           workers=settings.options.workers)
+
+    evaluation = Evaluation(query, target, distance_transform, limit, scale=scale, scratch=scratch, window=window)
 
     gui_handler = GUIHandler()
     gui_handler.display_query(query, index)
@@ -46,41 +117,111 @@ def main():
     gui_handler.show()
 
 
-def read_target_file(scale, target_path):
+def check_search_options(settings):
+    """
+    Exits with an error, if options are given, which the chosen kind of search would silently ignore
+    :param settings: Settings holding the parsed options
+    """
+    options = settings.options
+    if options.stream and options.tile_size is None:
+        settings.arg_parser.error("--stream requires --tile-size")
+    if options.tile_size is None and options.pyramid is None:
+        return
+
+    if options.tile_size is not None and options.pyramid is not None:
+        settings.arg_parser.error("--tile-size can't be combined with --pyramid")
+    mode = "--tile-size" if options.tile_size is not None else "--pyramid"
+    unsupported = list()
+    if options.batch:
+        unsupported.append("--batch")
+    if options.engine != "shift":
+        unsupported.append("--engine " + options.engine)
+    if options.deformation != settings.arg_parser.get_default("deformation"):
+        unsupported.append("--deformation")
+    if options.scratch is not None:
+        unsupported.append("--scratch")
+    # The tiles are extended by a square window, the pyramid suppresses minima by the default window
+    if options.window is not None and (options.pyramid is not None or options.window == WINDOW_QUERY):
+        unsupported.append("--window {}".format(options.window))
+    if unsupported:
+        settings.arg_parser.error("{} can't be combined with {}".format(", ".join(unsupported), mode))
+
+
+def log_minima(search):
+    """
+    Logs the minima found by a TiledSearch or PyramidSearch
+    :param search: TiledSearch or PyramidSearch
+    """
+    for y, x, energy in zip(search.minimum[0], search.minimum[1], search.energies):
+        logger.info("Found symbol at (%d, %d) with energy %f", y, x, energy)
+
+
+def read_target_file(scale, target_path, scratch=None, rasterizer=RASTERIZER_QT):
     """
     This method is responsible for reading in the target file and returning a Target-object
     :param scale: Scale of the query
     :param target_path: Path to the target-file starting from the resources-folder
+    :param scratch: Optional Scratch to keep the target arrays in
+    :param rasterizer: Rasterizer of SVG targets. See TargetSvg
     :return: Target Object
     """
     if target_path.endswith(".svg"):
-        svg_target = TargetSvg(join(FILE_LOCATION, "..", "resources", target_path))
-        return Target(svg_target, scale=scale)
+        svg_target = TargetSvg(join(FILE_LOCATION, "..", "resources", target_path), rasterizer=rasterizer)
+        return Target(svg_target, scale=scale, scratch=scratch)
     elif target_path.endswith(".png"):
         png_target = TargetBin(join(FILE_LOCATION, "..", "resources", target_path), scale=scale)
-        return Target(png_target, bin=True, scale=scale)
+        return Target(png_target, bin=True, scale=scale, scratch=scratch)
     else:
         logger.critical("Target can only be of PNG or SVG format!")
         exit(0)
 
 
-def read_query_file(index, query_path, scale):
+def read_query_file(index, query_path, scale, cache=None, placement=PLACEMENT_GRAPH, rasterizer=RASTERIZER_QT,
+                    corners=CORNERS_HARRIS):
     """
     This method is responsible for reading in the query file and returning a Query-object
     :param index: Index for the query in the SVG file
     :param scale: Scale of the query
     :param query_path: Path to the query-file starting from the resources-folder
+    :param cache: Optional QueryCache to load the built up query from
+    :param placement: Placement of the nodes of SVG queries. See Query
+    :param rasterizer: Rasterizer of SVG queries. See QuerySvg
+    :param corners: Detector of the corners and junctions of the skeleton. See Query
     :return: Query Object
     """
     if query_path.endswith(".svg"):
-        svg_query = QuerySvg(join(FILE_LOCATION, "..", "resources", query_path))
-        return Query(svg_query, index=index, scale=scale)
+        svg_query = QuerySvg(join(FILE_LOCATION, "..", "resources", query_path), rasterizer=rasterizer)
+        return Query(svg_query, index=index, scale=scale, placement=placement, cache=cache, corners=corners)
     elif query_path.endswith(".png"):
         png_query = QueryBin(join(FILE_LOCATION, "..", "resources", query_path), scale=scale)
-        return Query(png_query, bin=True, scale=scale)
+        return Query(png_query, bin=True, scale=scale, cache=cache, corners=corners)
     else:
         logger.critical("Query can only be of PNG or SVG format!")
         exit(0)
 
+def read_query_files(query_paths, scale, cache=None, placement=PLACEMENT_GRAPH, rasterizer=RASTERIZER_QT,
+                     corners=CORNERS_HARRIS):
+    """
+    This method reads in every symbol of every given query file
+    :param query_paths: Paths to the query-files starting from the resources-folder
+    :param scale: Scale of the queries
+    :param cache: Optional QueryCache to load the built up queries from
+    :param placement: Placement of the nodes of SVG queries. See Query
+    :param rasterizer: Rasterizer of SVG queries. See QuerySvg
+    :param corners: Detector of the corners and junctions of the skeleton. See Query
+    :return: List of Query Objects
+    """
+    queries = list()
+    for query_path in query_paths:
+        if query_path.endswith(".svg"):
+            svg_query = QuerySvg(join(FILE_LOCATION, "..", "resources", query_path), rasterizer=rasterizer)
+            queries.extend(Query(svg_query, index=index, scale=scale, placement=placement, cache=cache,
+                                 corners=corners) for index in range(len(svg_query.names)))
+        else:
+            queries.append(read_query_file(0, query_path, scale, cache=cache, placement=placement,
+                                           rasterizer=rasterizer, corners=corners))
+    return queries
+
+
 if __name__ == "__main__":
     main()
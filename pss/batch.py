@@ -0,0 +1,81 @@
+# -*- encoding: utf-8 -*-
+"""
+This module searches several queries within one target. The distance transform of the target is calculated only
+once, padded by the largest query, and shared read-only by all queries: each of them gets a view of it cropped to its
+own padding, which holds the same distances as if it was calculated for that query alone. So searching a whole sign
+list costs one target transform plus one tree pass per query. The tree passes run in a thread pool, since the numpy
+operations they consist of release the GIL.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+
+from pss.energy import target_distance_transform, ENGINE_SHIFT, DEFORMATION
+from pss.eval import Evaluation
+from pss.model import DistanceTransform
+from pss.tree import compact
+
+batch_logger = getLogger("Batch")
+
+
+def batch_padding(trees):
+    """
+    :param trees: CompactTrees of all queries
+    :return: Padding (height, width), which is large enough for every query
+    """
+    return max(tree.shape[0] for tree in trees), max(tree.shape[1] for tree in trees)
+
+
+class BatchSearch(object):
+    """
+    This class searches a list of queries within one target, sharing the distance transform of the target.
+    """
+
+    def __init__(self, queries, target, limit, engine=ENGINE_SHIFT, deformation=DEFORMATION, workers=1, window=None):
+        """
+        :param queries: List of Query-objects or their CompactTrees
+        :param target: Target-object, which holds the ndarray-array of the target image
+        :param limit: Number of symbols to extract per query
+        :param engine: Energy engine, see DistanceTransform
+        :param deformation: Weights (wy, wx) of the deformation cost used by ENGINE_DEFORMABLE
+        :param workers: Number of queries searched at the same time
+        :param window: Window to find local minima with, see Evaluation
+        """
+        self.queries = list(queries)
+        self.target = target
+        self.limit = limit
+        self.engine = engine
+        self.deformation = deformation
+        self.window = window
+        self.padding = batch_padding([compact(query) for query in self.queries])
+
+        batch_logger.info("Calculating distance transform of the target with padding %s for %d queries",
+                          self.padding, len(self.queries))
+        self.root_dt = target_distance_transform(target.original_array, self.padding)
+        self.root_dt.flags.writeable = False
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(self.search, self.queries))
+        self.minima = [minimum for minimum, _ in results]
+        self.found_symbols = [found_symbols for _, found_symbols in results]
+
+    def shared_distance_transform(self, shape):
+        """
+        Crops the shared distance transform to the padding of a single query
+        :param shape: Shape (height, width) of the query
+        :return: Read-only view of the distance transform of the target padded by shape
+        """
+        top, left = self.padding[0] - shape[0], self.padding[1] - shape[1]
+        return self.root_dt[top:self.root_dt.shape[0] - top, left:self.root_dt.shape[1] - left]
+
+    def search(self, query):
+        """
+        Searches a single query within the target
+        :param query: Query-object or its CompactTree
+        :return: Minima and found symbols of the query. The DistanceTransform and the Evaluation are dropped right
+                 here, so the energy of the query is freed as soon as the query is done.
+        """
+        tree = compact(query)
+        distance_transform = DistanceTransform(tree, self.target, engine=self.engine, deformation=self.deformation,
+                                               root_dt=self.shared_distance_transform(tree.shape))
+        evaluation = Evaluation(tree, self.target, distance_transform, self.limit, window=self.window)
+        return evaluation.minimum, evaluation.found_symbols
@@ -1,8 +1,6 @@
 from logging import getLogger
 from os.path import isfile
 
-from PyQt4.QtGui import QImage
-
 svg_logger = getLogger("BinImageHandler")
 
 
@@ -29,6 +27,7 @@ class QueryBin(object):
         """
         svg_logger.info("Query Bin-Handler started")
         handle_file_not_existing(path)
+        from PyQt4.QtGui import QImage
         im = QImage(path, "0xAARRGGBB")
         self.image = im.scaled(im.size() * scale)
 
@@ -42,6 +41,7 @@ class TargetBin(object):
         """
         svg_logger.info("Target Bin-Handler started")
         handle_file_not_existing(path)
+        from PyQt4.QtGui import QImage
         im = QImage(path, "0xAARRGGBB")
         self.image = im.scaled(im.size() * scale)
 
@@ -0,0 +1,185 @@
+# -*- encoding: utf-8 -*-
+"""
+This module provides a persistent cache for built up queries. Entries are addressed by a hash of everything the
+query depends on (path data or image, scale and algorithm constants) and stored as compressed numpy archives.
+The cache keeps its size below a limit by deleting the least recently used entries.
+"""
+from hashlib import sha256
+from logging import getLogger
+from os import listdir, makedirs, remove, replace, utime, fdopen
+from os.path import join, getsize, getmtime, isfile
+from tempfile import mkstemp
+from zipfile import BadZipFile
+
+from numpy import asarray, load, savez_compressed, packbits, unpackbits
+
+cache_logger = getLogger("QueryCache")
+
+CACHE_VERSION = 1
+MAX_BYTES = 256 * 2**20
+SUFFIX = ".npz"
+
+
+def pack_bool_array(values):
+    """
+    Packs a boolean Numpy-Array into bits
+    :param values: Boolean Numpy-Array
+    :return: Tuple of packed uint8-array and the shape of values
+    """
+    values = asarray(values, dtype=bool)
+    return packbits(values.ravel()), asarray(values.shape)
+
+
+def unpack_bool_array(packed, shape):
+    """
+    Restores a boolean Numpy-Array packed by pack_bool_array
+    :param packed: Packed uint8-array
+    :param shape: Shape of the original array
+    :return: Boolean Numpy-Array
+    """
+    count = int(asarray(shape).prod())
+    return unpackbits(packed)[:count].astype(bool).reshape(tuple(shape))
+
+
+def discard(path):
+    """
+    Removes a file, unless another process removed it already
+    :param path: Path of the file
+    """
+    try:
+        remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def stat_entry(path):
+    """
+    :param path: Path of an entry
+    :return: Tuple of modification time and size of the entry or None, if another process removed it meanwhile
+    """
+    try:
+        return getmtime(path), getsize(path)
+    except FileNotFoundError:
+        return None
+
+
+class QueryCache(object):
+    """
+    This class manages a directory of cached queries.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        """
+        :param directory: Directory to store the cached queries in (created if missing)
+        :param max_bytes: Maximum size of all entries in bytes, before the least recently used ones get deleted
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """
+        Creates a content-addressed key out of the given parts
+        :param parts: Numpy-Arrays, strings or numbers, the cached query depends on
+        :return: Hex-digest identifying the entry
+        """
+        digest = sha256(str(CACHE_VERSION).encode())
+        for part in parts:
+            if hasattr(part, "tobytes"):
+                part = asarray(part)
+                digest.update("{}{}".format(part.dtype.str, part.shape).encode())
+                digest.update(part.tobytes())
+            else:
+                digest.update(repr(part).encode())
+            digest.update(b"|")
+        return digest.hexdigest()
+
+    def path(self, key):
+        """
+        :param key: Key of the entry
+        :return: Path of the file holding the entry
+        """
+        return join(self.directory, key + SUFFIX)
+
+    def load(self, key):
+        """
+        Loads the arrays stored for the given key and marks the entry as recently used
+        :param key: Key of the entry
+        :return: Dictionary of Numpy-Arrays or None, if the key isn't cached
+        """
+        path = self.path(key)
+        if not isfile(path):
+            cache_logger.info("Cache miss for [%s]", key)
+            return None
+
+        try:
+            with load(path) as archive:
+                arrays = {name: archive[name] for name in archive.files}
+        except FileNotFoundError:
+            cache_logger.info("Cache miss for [%s], it was evicted meanwhile", key)
+            return None
+        except (OSError, ValueError, EOFError, BadZipFile, KeyError):
+            cache_logger.warning("Removing unreadable cache entry [%s]", key)
+            discard(path)
+            return None
+
+        try:
+            utime(path)
+        except FileNotFoundError:
+            # Another process evicted the entry meanwhile, the arrays were read already
+            pass
+        cache_logger.info("Cache hit for [%s]", key)
+        return arrays
+
+    def store(self, key, arrays):
+        """
+        Stores the arrays for the given key and deletes the least recently used entries afterwards, if the cache
+        got too large
+        :param key: Key of the entry
+        :param arrays: Dictionary of Numpy-Arrays
+        """
+        path = self.path(key)
+        # A temporary file of its own, so processes storing the same key at once don't write into the same file
+        descriptor, temporary = mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with fdopen(descriptor, "wb") as handle:
+                savez_compressed(handle, **arrays)
+            replace(temporary, path)
+        except BaseException:
+            remove(temporary)
+            raise
+        cache_logger.info("Stored [%s] with %d bytes", key, getsize(path))
+        self.evict(keep=path)
+
+    def entries(self):
+        """
+        :return: List of tuples of path and size of all entries, least recently used first. Entries removed by
+                 another process meanwhile are left out.
+        """
+        entries = list()
+        for name in listdir(self.directory):
+            if name.endswith(SUFFIX):
+                path = join(self.directory, name)
+                stat = stat_entry(path)
+                if stat is not None:
+                    entries.append((stat[0], path, stat[1]))
+        return [(path, size) for _, path, size in sorted(entries)]
+
+    def evict(self, keep=None):
+        """
+        Deletes the least recently used entries, until all entries fit into max_bytes. Entries another process
+        removes meanwhile are skipped.
+        :param keep: Path of an entry, which must not be deleted (e.g. the one just stored)
+        """
+        entries = self.entries()
+        size = sum(entry_size for _, entry_size in entries)
+        entries = [(path, entry_size) for path, entry_size in entries if path != keep]
+        while entries and size > self.max_bytes:
+            path, entry_size = entries.pop(0)
+            size -= entry_size
+            try:
+                remove(path)
+            except FileNotFoundError:
+                continue
+            cache_logger.info("Evicted [%s]", path)
@@ -0,0 +1,44 @@
+# -*- encoding: utf-8 -*-
+"""
+This module describes a single symbol found within the target, so searches can hand out their results one by one.
+"""
+
+
+class Detection(object):
+    """
+    This class holds a symbol found within the target.
+    """
+
+    def __init__(self, position, bounding_box, energy, crop=None):
+        """
+        :param position: Position (y, x) of the minimum in coordinates of the energy map
+        :param bounding_box: Bounding box (top, bottom, left, right) of the symbol within the target
+        :param energy: Energy of the minimum
+        :param crop: Optional Numpy-Array of the target within the bounding box
+        """
+        self.position = position
+        self.bounding_box = bounding_box
+        self.energy = energy
+        self.crop = crop
+
+    def __repr__(self):
+        return "Detection(position={}, bounding_box={}, energy={})".format(self.position, self.bounding_box,
+                                                                          self.energy)
+
+
+def detect(tree, target_array, y, x, energy, crop=False):
+    """
+    Creates the Detection of a minimum, the same way the found symbols of an Evaluation are extracted
+    :param tree: CompactTree of the query
+    :param target_array: Numpy-Array of the target image
+    :param y: y of the minimum
+    :param x: x of the minimum
+    :param energy: Energy of the minimum
+    :param crop: Boolean value which determines, if the target within the bounding box is added
+    :return: Detection
+    """
+    height, width = tree.shape
+    top, left = int(y) - tree.root_position[0], int(x) - tree.root_position[1]
+    bounding_box = (int(top), int(top) + height, int(left), int(left) + width)
+    return Detection((int(y), int(x)), bounding_box, float(energy),
+                     target_array[top:top + height, left:left + width] if crop else None)
@@ -0,0 +1,448 @@
+# -*- encoding: utf-8 -*-
+"""
+This module sums up the distance transforms of all nodes of a query tree. Each node starts with a copy of the
+distance transform of the target. The score of every child is shifted by the child's offset, added to the score of
+its parent and the parent's score is divided by CHILD_DIVISOR afterwards. The score of the root is the energy of the
+tree. Scores are taken from a ScorePool and handed back as soon as they were combined into their parent, so only a
+few buffers are alive at the same time, no matter how many nodes the tree has. Independent subtrees can be
+evaluated by several threads, which gives the same score, since every parent combines its children in a fixed order.
+Alternatively the deformable engine passes messages like pictorial structures do: the score of a child is
+min-convolved with a quadratic deformation cost (a generalized distance transform) before it is shifted and added,
+so each part may move away from its rest position at a cost instead of having to hit it exactly.
+mahotas is imported by the functions calculating distance transforms only, since it loads PIL as well.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+
+from numpy import asarray, clip, copy, copyto, ones, where, zeros, empty, minimum
+
+from external.generalized_distance_transform import of_image_vectorized
+
+energy_logger = getLogger("Energy")
+
+CHILD_DIVISOR = 1.5
+ENGINE_SHIFT = "shift"
+ENGINE_DEFORMABLE = "deformable"
+DEFORMATION = (1.0, 1.0)
+DISTANCE_DIVISOR = 5
+TASKS_PER_WORKER = 2
+# Fraction of the canvas, above which the distances of candidates are calculated for the whole canvas at once
+WINDOWED_FRACTION = 0.5
+
+
+def padded_canvas(target_array, padding, window=None):
+    """
+    Creates the target padded by the given padding on each side. The padding is filled with ones, so only the
+    zeros of the target count as strokes for the distance transform.
+    :param target_array: Numpy-Array of the target image
+    :param padding: Padding (height, width) added above and below, respectively left and right of the target
+    :param window: Optional window (top, bottom, left, right) of the padded canvas to create (default: all of it)
+    :return: Float Numpy-Array of the padded target or the window of it
+    """
+    height, width = target_array.shape
+    if window is None:
+        window = (0, height + 2 * padding[0], 0, width + 2 * padding[1])
+    top, bottom, left, right = window
+
+    canvas = ones((bottom - top, right - left))
+    target_top, target_bottom = max(top, padding[0]), min(bottom, padding[0] + height)
+    target_left, target_right = max(left, padding[1]), min(right, padding[1] + width)
+    if target_top < target_bottom and target_left < target_right:
+        canvas[target_top - top:target_bottom - top, target_left - left:target_right - left] = \
+            target_array[target_top - padding[0]:target_bottom - padding[0],
+                         target_left - padding[1]:target_right - padding[1]]
+    return canvas
+
+
+def exact_distance_transform(target_array, padding, window, radius, max_radius=None):
+    """
+    Calculates the distance transform of the target for a window of the padded canvas only. The window is extended
+    by a halo, which is doubled until no cell within the window is further away from its closest stroke than the halo
+    is wide (or the halo covers the whole canvas), so every distance is the same as on the whole canvas.
+    Within blank areas the halo grows up to the whole canvas. If max_radius is given, the halo stops growing at
+    max_radius instead and larger distances are clamped to max_radius, so time and memory only depend on the window.
+    Every distance up to max_radius is still exact.
+    :param target_array: Numpy-Array of the target image
+    :param padding: Padding (height, width) added to each side of the target
+    :param window: Window (top, bottom, left, right) in coordinates of the padded canvas
+    :param radius: Initial width of the halo
+    :param max_radius: Optional maximal width of the halo
+    :return: Float Numpy-Array holding the distance transform of the window
+    """
+    from mahotas import distance
+    canvas_height = target_array.shape[0] + 2 * padding[0]
+    canvas_width = target_array.shape[1] + 2 * padding[1]
+    top, bottom, left, right = window
+    if max_radius is not None:
+        radius = min(radius, max_radius)
+
+    while True:
+        halo = (max(top - radius, 0), min(bottom + radius, canvas_height),
+                max(left - radius, 0), min(right + radius, canvas_width))
+        squared = distance(padded_canvas(target_array, padding, halo))
+        squared = squared[top - halo[0]:bottom - halo[0], left - halo[2]:right - halo[2]]
+        if halo == (0, canvas_height, 0, canvas_width) or squared.max() <= radius ** 2:
+            return squared / DISTANCE_DIVISOR
+        if radius == max_radius:
+            # A cell further away than the halo is wide has no stroke within the halo, see above
+            return minimum(squared, radius ** 2) / DISTANCE_DIVISOR
+        radius = radius * 2 if max_radius is None else min(radius * 2, max_radius)
+        energy_logger.debug("Growing distance halo of window %s to %d", window, radius)
+
+
+def target_distance_transform(target_array, padding, window=None):
+    """
+    Calculates the squared euclidean distance of every cell of the padded target to its closest stroke
+    (divided by DISTANCE_DIVISOR)
+    :param target_array: Numpy-Array of the target image
+    :param padding: Padding (height, width) added to each side of the target
+    :param window: Optional window (top, bottom, left, right) of the padded canvas (default: all of it)
+    :return: Float Numpy-Array holding the distance transform
+    """
+    from mahotas import distance
+    return distance(padded_canvas(target_array, padding, window)) / DISTANCE_DIVISOR
+
+
+def shift_slices(shape, offset):
+    """
+    Returns the slices to add a score shifted by the given offset onto another score of the same shape.
+    A cell P of the destination gets the cell P - offset of the source. Cells without a source are left untouched.
+    :param shape: Shape (height, width) of both scores
+    :param offset: Offset (y, x) of the child relative to its parent
+    :return: Tuple of destination slices and source slices
+    """
+    destination, source = list(), list()
+    for size, shift in zip(shape, offset):
+        shift = max(-size, min(size, int(shift)))
+        if shift >= 0:
+            destination.append(slice(shift, size))
+            source.append(slice(0, size - shift))
+        else:
+            destination.append(slice(0, size + shift))
+            source.append(slice(-shift, size))
+    return tuple(destination), tuple(source)
+
+
+def add_shifted(score, child_score, offset):
+    """
+    Adds the score of a child onto the score of its parent
+    :param score: Score of the parent (changed in place)
+    :param child_score: Score of the child
+    :param offset: Offset of the child relative to its parent
+    """
+    destination, source = shift_slices(score.shape, offset)
+    score[destination] += child_score[source]
+
+
+class ScorePool(object):
+    """
+    This class hands out score buffers initialized with the distance transform of the target. Released buffers are
+    reused, so the number of allocated buffers only grows with the number of scores alive at the same time.
+    """
+
+    def __init__(self, root_dt, allocate=None):
+        """
+        :param root_dt: Distance transform of the target, every acquired buffer starts with
+        :param allocate: Optional function (shape, dtype) to allocate new buffers with, e.g. Scratch.allocator
+                         for memory-mapped buffers (default: buffers in memory)
+        """
+        self.root_dt = root_dt
+        self.allocate = allocate
+        self.free = list()
+        self.allocated = 0
+
+    def acquire(self):
+        """
+        :return: Buffer holding a copy of root_dt
+        """
+        if self.free:
+            score = self.free.pop()
+            copyto(score, self.root_dt)
+            return score
+        self.allocated += 1
+        if self.allocate is None:
+            return copy(self.root_dt)
+        score = self.allocate(self.root_dt.shape, self.root_dt.dtype)
+        copyto(score, self.root_dt)
+        return score
+
+    def release(self, score):
+        """
+        Hands a buffer back to the pool
+        :param score: Buffer, which is no longer needed
+        """
+        self.free.append(score)
+
+
+def evaluate(root_dt, tree, combine, pool=None, workers=1):
+    """
+    Evaluates the tree in post-order without recursion. The buffer of a node is acquired only once its first child
+    is done and the buffer of every child is released right after it was combined into its parent. Thereby only the
+    nodes on the current path, which already combined a child, hold a buffer, instead of every node of the tree.
+    Siblings are combined in the order they were added to their parent.
+    With more than one worker, independent subtrees are evaluated concurrently first. See parallel_evaluate
+    :param root_dt: Distance transform of the target
+    :param tree: CompactTree of the query
+    :param combine: Function (score, child_score, offset), which combines the score of a child into its parent
+    :param pool: Optional ScorePool to take the buffers from
+    :param workers: Number of threads evaluating subtrees at the same time
+    :return: Numpy-Array of the same shape as root_dt holding the score of the root node
+    """
+    if workers > 1:
+        return parallel_evaluate(root_dt, tree, combine, workers, pool)
+
+    pool = ScorePool(root_dt) if pool is None else pool
+    score = evaluate_subtree(root_dt, tree, tree.children(), combine, pool, tree.root)
+    energy_logger.info("Evaluated %d nodes with %d score buffers", len(tree), pool.allocated)
+    return score
+
+
+def evaluate_subtree(root_dt, tree, children, combine, pool, root, scores=None):
+    """
+    Evaluates the subtree below root in post-order. See evaluate
+    :param root_dt: Distance transform of the target
+    :param tree: CompactTree of the query
+    :param children: Children of every node as returned by tree.children()
+    :param combine: Function (score, child_score, offset), which combines the score of a child into its parent
+    :param pool: ScorePool to take the buffers from
+    :param root: Index of the root of the subtree
+    :param scores: Optional dictionary of nodes, whose scores are known already, and their scores. These nodes are
+                   not evaluated again.
+    :return: Numpy-Array of the same shape as root_dt holding the score of root
+    """
+    scores = dict() if scores is None else scores
+    stack = [[root, 0, None]]
+    finished = None
+
+    while stack:
+        frame = stack[-1]
+        index, position, score = frame
+        if position == 0 and index in scores:
+            stack.pop()
+            finished = scores.pop(index)
+            continue
+
+        if finished is not None:
+            if score is None:
+                score = frame[2] = pool.acquire()
+            combine(score, finished, tree.offsets[children[index][position - 1]])
+            pool.release(finished)
+            finished = None
+
+        if position < len(children[index]):
+            frame[1] += 1
+            stack.append([children[index][position], 0, None])
+            continue
+
+        stack.pop()
+        finished = score if score is not None else pool.acquire()
+
+    return finished
+
+
+def subtree_sizes(tree, children):
+    """
+    :param tree: CompactTree of the query
+    :param children: Children of every node as returned by tree.children()
+    :return: Numpy-Array holding the number of nodes of the subtree below every node
+    """
+    sizes = ones(len(tree), dtype=int)
+    for index in tree.order[::-1]:
+        for child in children[index]:
+            sizes[index] += sizes[child]
+    return sizes
+
+
+def split_tree(tree, children, tasks):
+    """
+    Splits the tree into independent subtrees by replacing the largest subtree by the subtrees of its children,
+    until there are enough of them or only leaves are left
+    :param tree: CompactTree of the query
+    :param children: Children of every node as returned by tree.children()
+    :param tasks: Number of subtrees to split the tree into
+    :return: List of the roots of the subtrees in pre-order
+    """
+    sizes = subtree_sizes(tree, children)
+    frontier = [tree.root]
+    while len(frontier) < tasks:
+        inner = [index for index in frontier if children[index]]
+        if not inner:
+            break
+        largest = max(inner, key=lambda index: sizes[index])
+        position = frontier.index(largest)
+        frontier[position:position + 1] = children[largest]
+    return frontier
+
+
+def parallel_evaluate(root_dt, tree, combine, workers, pool=None):
+    """
+    Evaluates independent subtrees in a thread pool (the numpy operations release the GIL) and combines their
+    scores into the rest of the tree afterwards. Since every parent still combines its children in the order they
+    were added, the score is bit-for-bit the same as the one of evaluate. The price is, that the scores of all
+    subtrees are held at the same time.
+    :param root_dt: Distance transform of the target
+    :param tree: CompactTree of the query
+    :param combine: Function (score, child_score, offset), which combines the score of a child into its parent
+    :param workers: Number of threads evaluating subtrees at the same time
+    :param pool: Optional ScorePool to take the buffers of the upper part of the tree from. Every subtree gets a
+                 ScorePool of its own, which allocates its buffers the same way, e.g. within a Scratch
+    :return: Numpy-Array of the same shape as root_dt holding the score of the root node
+    """
+    pool = ScorePool(root_dt) if pool is None else pool
+    children = tree.children()
+    frontier = split_tree(tree, children, workers * TASKS_PER_WORKER)
+    energy_logger.info("Evaluating %d subtrees with %d workers", len(frontier), workers)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(evaluate_subtree, root_dt, tree, children, combine,
+                                   ScorePool(root_dt, allocate=pool.allocate), root)
+                   for root in frontier]
+        scores = {root: future.result() for root, future in zip(frontier, futures)}
+
+    return evaluate_subtree(root_dt, tree, children, combine, pool, tree.root, scores)
+
+
+def combine_shifted(score, child_score, offset):
+    """
+    Adds the shifted score of a child onto its parent and divides the parent's score by CHILD_DIVISOR
+    :param score: Score of the parent (changed in place)
+    :param child_score: Score of the child
+    :param offset: Offset of the child relative to its parent
+    """
+    add_shifted(score, child_score, offset)
+    score /= CHILD_DIVISOR
+
+
+def tree_energy(root_dt, tree, pool=None, workers=1):
+    """
+    Calculates the energy of the tree for every cell of the given distance transform.
+    :param root_dt: Distance transform of the target
+    :param tree: CompactTree of the query
+    :param pool: Optional ScorePool to take the buffers from
+    :param workers: Number of threads evaluating subtrees at the same time
+    :return: Numpy-Array of the same shape as root_dt holding the score of the root node
+    """
+    energy_logger.info("Summing up distance transforms of %d nodes", len(tree))
+    return evaluate(root_dt, tree, combine_shifted, pool, workers)
+
+
+def candidate_energy(root_dt, tree, candidates):
+    """
+    Calculates the energy of the tree at the given root positions only. Every node gathers the distance transform at
+    its position below each candidate and the scores are combined the same way tree_energy combines them, so the
+    energies are the same as the ones of tree_energy at the candidates, without creating a score for the whole
+    canvas. Like the shifted scores, a child whose position lies outside of the canvas adds nothing to its parent.
+    :param root_dt: Distance transform of the target padded by the shape of the query
+    :param tree: CompactTree of the query
+    :param candidates: Integer Numpy-Array of shape (n, 2) holding the root positions (y, x) in coordinates of the
+                       padded canvas
+    :return: Numpy-Array holding the energy of every candidate
+    :raise ValueError: If a candidate lies outside of the canvas
+    """
+    candidates = asarray(candidates, dtype=int).reshape(-1, 2)
+    if ((candidates < 0) | (candidates >= root_dt.shape)).any():
+        raise ValueError("Candidates have to lie within the canvas of shape {}".format(root_dt.shape))
+    children = tree.children()
+    positions = {tree.root: candidates}
+    inside = {tree.root: ones(len(candidates), dtype=bool)}
+    for index in tree.order[1:]:
+        parent = tree.parents[index]
+        positions[index] = positions[parent] - tree.offsets[index]
+        inside[index] = inside[parent] & ((positions[index] >= 0) & (positions[index] < root_dt.shape)).all(axis=1)
+
+    scores = dict()
+    for index in tree.order[::-1]:
+        clipped = clip(positions.pop(index), 0, asarray(root_dt.shape) - 1)
+        score = root_dt[clipped[:, 0], clipped[:, 1]]
+        for child in children[index]:
+            score += where(inside.pop(child), scores.pop(child), 0)
+            score /= CHILD_DIVISOR
+        scores[index] = score
+
+    energy_logger.info("Evaluated %d nodes at %d candidates", len(tree), len(candidates))
+    return scores[tree.root]
+
+
+def windowed_candidate_energy(target_array, tree, candidates, radius):
+    """
+    Same as candidate_energy, but without a distance transform of the whole padded canvas, if the candidates lie
+    close together. The distances are calculated exactly by one distance transform of the bounding box of the windows
+    around all candidates, which hold the positions of their nodes. If this box covers more than WINDOWED_FRACTION of
+    the canvas, the whole canvas is transformed instead. See exact_distance_transform
+    :param target_array: Numpy-Array of the target image
+    :param tree: CompactTree of the query
+    :param candidates: Integer Numpy-Array of shape (n, 2) holding the root positions (y, x) in coordinates of the
+                       padded canvas
+    :param radius: Initial width of the halo of the distance transform of the box
+    :return: Numpy-Array holding the energy of every candidate
+    :raise ValueError: If a candidate lies outside of the canvas
+    """
+    candidates = asarray(candidates, dtype=int).reshape(-1, 2)
+    canvas = (target_array.shape[0] + 2 * tree.shape[0], target_array.shape[1] + 2 * tree.shape[1])
+    if ((candidates < 0) | (candidates >= canvas)).any():
+        raise ValueError("Candidates have to lie within the canvas of shape {}".format(canvas))
+    if not len(candidates):
+        return empty(0)
+    # A node lies reach[node] cells above and left of the root, see candidate_energy
+    reach = zeros((len(tree), 2), dtype=int)
+    for index in tree.order[1:]:
+        reach[index] = reach[tree.parents[index]] + tree.offsets[index]
+
+    # Cut at the canvas only, so nodes outside of the box are outside of the canvas, too
+    top, left = (candidates - reach.max(axis=0)).min(axis=0).clip(0)
+    bottom, right = (candidates - reach.min(axis=0) + 1).max(axis=0).clip(None, canvas)
+    if (bottom - top) * (right - left) > WINDOWED_FRACTION * canvas[0] * canvas[1]:
+        energy_logger.info("Candidates spread over the canvas, transforming all of it")
+        return candidate_energy(target_distance_transform(target_array, tree.shape), tree, candidates)
+
+    root_dt = exact_distance_transform(target_array, tree.shape, (top, bottom, left, right), radius)
+    return candidate_energy(root_dt, tree, candidates - (top, left))
+
+
+def min_convolution(score, deformation=DEFORMATION):
+    """
+    Min-convolves a score with a quadratic deformation cost:
+    result[P] = min_Q(score[Q] + wy * (Py - Qy)^2 + wx * (Px - Qx)^2)
+    :param score: Score of a node
+    :param deformation: Weights (wy, wx) of the deformation cost along y and x
+    :return: Numpy-Array of the same shape as score
+    """
+    return of_image_vectorized(score, deformation)
+
+
+def deformable_tree_energy(root_dt, tree, deformation=DEFORMATION, pool=None, workers=1):
+    """
+    Calculates the energy of the tree for every cell of the given distance transform, allowing each node to move
+    away from its rest position at a quadratic deformation cost. The score of a parent is the sum of its own
+    distance transform and the min-convolved, shifted scores of its children.
+    :param root_dt: Distance transform of the target
+    :param tree: CompactTree of the query
+    :param deformation: Weights (wy, wx) of the deformation cost along y and x
+    :param pool: Optional ScorePool to take the buffers from
+    :param workers: Number of threads evaluating subtrees at the same time
+    :return: Numpy-Array of the same shape as root_dt holding the score of the root node
+    """
+    energy_logger.info("Passing messages through %d nodes with deformation %s", len(tree), deformation)
+
+    def combine(score, child_score, offset):
+        add_shifted(score, min_convolution(child_score, deformation), offset)
+
+    return evaluate(root_dt, tree, combine, pool, workers)
+
+
+def energy(root_dt, tree, engine=ENGINE_SHIFT, deformation=DEFORMATION, pool=None, workers=1):
+    """
+    Calculates the energy of the tree with the given engine
+    :param root_dt: Distance transform of the target
+    :param tree: CompactTree of the query
+    :param engine: ENGINE_SHIFT for tree_energy or ENGINE_DEFORMABLE for deformable_tree_energy
+    :param deformation: Weights (wy, wx) of the deformation cost, only used by ENGINE_DEFORMABLE
+    :param pool: Optional ScorePool to take the buffers from
+    :param workers: Number of threads evaluating subtrees at the same time
+    :return: Numpy-Array of the same shape as root_dt holding the score of the root node
+    """
+    if engine == ENGINE_SHIFT:
+        return tree_energy(root_dt, tree, pool, workers)
+    elif engine == ENGINE_DEFORMABLE:
+        return deformable_tree_energy(root_dt, tree, deformation, pool, workers)
+    raise ValueError("Unknown energy engine [{}]".format(engine))
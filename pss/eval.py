@@ -1,24 +1,39 @@
-from itertools import chain
-
-from math import isnan
-from numpy import argsort, nonzero, genfromtxt
 from scipy.ndimage import minimum_filter
-from sklearn.metrics import precision_recall_curve
-from matplotlib import pyplot as plt
+
+from pss.detection import detect
+from pss.minima import local_minima, smallest, suppression_window
+from pss.profiling import stage, STAGE_MINIMA, STAGE_CROPS
+from pss.scratch import mapped_nonzero
+from pss.tree import compact
 
 
 class Evaluation(object):
     """
     This class calculates the minima and extracts the symbols from the target tablet.
     """
-    def __init__(self, query, target, dt, limit, scale=1):
+    def __init__(self, query, target, dt, limit, scale=1, scratch=None, window=None):
+        """
+        :param query: Query-object or its CompactTree
+        :param target: Target-object, which holds the ndarray-array of the target image
+        :param dt: DistanceTransform-object holding the summed up distance transform
+        :param limit: Number of symbols to extract
+        :param scale: Multiplier for the scale
+        :param scratch: Optional Scratch to keep the minimum filtered energy in a memory-mapped file
+        :param window: Window to find local minima with: None for a tenth of the shorter side of the energy map
+                       (default), a size in pixels or WINDOW_QUERY for the bounding box of the query
+        """
         self.query = query
+        self.tree = compact(query)
         self.target = target
         self.dt = dt
         self.limit = limit
+        self.scratch = scratch
+        self.window = suppression_window(self.dt.sum_dt.shape, window, self.tree.shape)
 
-        self.minimum = self.find_local_minima()
-        self.found_symbols = self.extract_found_symbols()
+        with stage(STAGE_MINIMA):
+            self.minimum = self.find_local_minima()
+        with stage(STAGE_CROPS):
+            self.found_symbols = self.extract_found_symbols()
 
     def find_local_minima(self):
         """
@@ -26,13 +41,22 @@ class Evaluation(object):
         n is set by self.limit
         :return: x, y lists
         """
-        size = min(self.dt.sum_dt.shape[1], self.dt.sum_dt.shape[0]) // 10
+        if self.scratch is None:
+            x, y = local_minima(self.dt.sum_dt, self.window)
+        else:
+            res = self.scratch.empty(self.scratch.unique("minimum_filter"), self.dt.sum_dt.shape, self.dt.sum_dt.dtype)
+            minimum_filter(self.dt.sum_dt, size=self.window, mode="nearest", output=res)
+            x, y = mapped_nonzero(res, self.dt.sum_dt)
+        return smallest(self.dt.sum_dt, x, y, self.limit)
 
-        res = minimum_filter(self.dt.sum_dt, size=size, mode="nearest")
-        x, y = nonzero(res == self.dt.sum_dt)
-        order = argsort(self.dt.sum_dt[x, y])
-        x, y = x[order], y[order]
-        return x[0:self.limit], y[0:self.limit]
+    def detections(self, crop=False):
+        """
+        Yields the minima one by one, best first, so callers can handle them before all symbols are extracted
+        :param crop: Boolean value which determines, if the target within the bounding box is added
+        :return: Generator of Detections
+        """
+        for y, x in zip(*self.minimum):
+            yield detect(self.tree, self.target.original_array, y, x, self.dt.sum_dt[y, x], crop)
 
     def extract_found_symbols(self):
         """
@@ -41,11 +65,12 @@ class Evaluation(object):
         """
         found_symbols = list()
 
-        height, width = self.query.original_array.shape
+        height, width = self.tree.shape
+        root_position = self.tree.root_position
 
         for (y, x) in zip(*self.minimum):
-            begin_bbox_y = y - self.query.root_node.position[0]
-            begin_bbox_x = x - self.query.root_node.position[1]
+            begin_bbox_y = y - root_position[0]
+            begin_bbox_x = x - root_position[1]
             box = self.target.original_array[begin_bbox_y:begin_bbox_y + height, begin_bbox_x:begin_bbox_x + width]
             found_symbols.append((box, self.dt.sum_dt[y, x]))
 
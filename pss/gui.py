@@ -35,7 +35,7 @@ def setup_figure(name, rows=ROWS, cols=COLUMNS):
 def setup_plot(ax, array, title):
     """
     :param ax: Empty subplot for the original image or the skeletonized image
-    :param array: The array to fill up the subplot
+    :param array: The array (or CompactTree) to fill up the subplot, only its shape is used
     :param title: Title of the subplot
 
     This fills up the subplots
@@ -140,8 +140,8 @@ class EvaluationPlot(object):
         ax.plot(eval.minimum[1], eval.minimum[0], 'r.')
 
         for (i, j) in zip(*eval.minimum):
-            x = j - eval.query.root_node.position.item(1)
-            y = i - eval.query.root_node.position.item(0)
+            x = j - eval.tree.root_position.item(1)
+            y = i - eval.tree.root_position.item(0)
             ax.add_patch(Rectangle((x, y), shape[1], shape[0], fill=None, ec="red"))
 
     @staticmethod
@@ -222,8 +222,10 @@ class QueryPlot(object):  # pragma: no cover
 
     def __init__(self, query, index):
         self.index = index
-        self.create_original_image_figure(query)
-        self.create_skeleton_figure(query)
+        # Queries placed along their vector strokes are neither rasterized nor skeletonized
+        if query.original_array is not None:
+            self.create_original_image_figure(query)
+            self.create_skeleton_figure(query)
         self.create_tree_figure(query)
 
     def create_skeleton_figure(self, query):
@@ -246,7 +248,7 @@ class QueryPlot(object):  # pragma: no cover
         name = query.name + "_tree"
         name = name.replace("/", "_")
         fig, ax = setup_figure(name)
-        setup_plot(ax, query.original_array, "tree")
+        setup_plot(ax, query.create_compact_tree(), "tree")
         root_node = query.root_node
         center_of_mass = query.center_of_mass
         self.draw_tree_image(ax, root_node, center_of_mass)
@@ -0,0 +1,220 @@
+# -*- encoding: utf-8 -*-
+"""
+This module scans targets without any GUI: query -> target -> DistanceTransform -> Evaluation, writing the detections
+as JSON Lines or CSV only. Neither matplotlib nor pss.gui are imported, so it runs on servers without a display.
+Targets can be given as files, directories or manifests and are scanned by a pool of worker processes.
+
+Run it by: python -m pss.headless -q query.svg -t tablets/ -o results.jsonl
+"""
+from concurrent.futures import ProcessPoolExecutor
+from csv import DictWriter
+from json import dumps
+from logging import getLogger
+from os import listdir
+from os.path import isdir, join, dirname
+from sys import stdout
+
+from pss.binimg import QueryBin, TargetBin
+from pss.cache import QueryCache
+from pss.energy import ENGINE_SHIFT, DEFORMATION
+from pss.eval import Evaluation
+from pss.model import DistanceTransform, Query, Target, PLACEMENT_GRAPH, CORNERS_HARRIS
+from pss.profiling import Tracer
+from pss.raster import RASTERIZER_QT
+from pss.settings import HeadlessSettings
+from pss.svg import QuerySvg, TargetSvg
+
+headless_logger = getLogger("Headless")
+
+TARGET_SUFFIXES = (".png", ".svg")
+MANIFEST_SUFFIXES = (".txt", ".lst")
+FIELDS = ["target", "query", "rank", "y", "x", "top", "bottom", "left", "right", "energy"]
+
+
+def target_paths(paths):
+    """
+    Collects the paths of all targets
+    :param paths: Target files, directories (all PNG and SVG files within, sorted by name) or manifests (one path per
+                  line, relative to the manifest)
+    :return: List of paths of targets
+    """
+    targets = list()
+    for path in paths:
+        if isdir(path):
+            targets.extend(join(path, name) for name in sorted(listdir(path)) if name.endswith(TARGET_SUFFIXES))
+        elif path.endswith(MANIFEST_SUFFIXES):
+            with open(path) as manifest:
+                targets.extend(join(dirname(path), line.strip()) for line in manifest if line.strip())
+        else:
+            targets.append(path)
+    return targets
+
+
+def load_target(path, scale=1, rasterizer=RASTERIZER_QT):
+    """
+    Reads in a target file
+    :param path: Path to a PNG or SVG file
+    :param scale: Multiplier for the scale
+    :param rasterizer: Rasterizer of SVG targets. See TargetSvg
+    :return: Target-object
+    :raise ValueError: If the target is neither a PNG nor an SVG file
+    """
+    if path.endswith(".svg"):
+        return Target(TargetSvg(path, rasterizer=rasterizer), scale=scale)
+    elif path.endswith(".png"):
+        return Target(TargetBin(path, scale=scale), bin=True, scale=scale)
+    raise ValueError("Target can only be of PNG or SVG format: [{}]".format(path))
+
+
+def load_query(path, index=0, scale=1, cache=None, placement=PLACEMENT_GRAPH, rasterizer=RASTERIZER_QT,
+               corners=CORNERS_HARRIS):
+    """
+    Reads in a query file and builds up its tree
+    :param path: Path to a PNG or SVG file
+    :param index: Index of the symbol group of an SVG file
+    :param scale: Multiplier for the scale
+    :param cache: Optional QueryCache to load the built up query from
+    :param placement: Placement of the nodes of SVG queries. See Query
+    :param rasterizer: Rasterizer of SVG queries. See QuerySvg
+    :param corners: Detector of the corners and junctions of the skeleton. See Query
+    :return: Query-object
+    :raise ValueError: If the query is neither a PNG nor an SVG file
+    """
+    if path.endswith(".svg"):
+        return Query(QuerySvg(path, rasterizer=rasterizer), index=index, scale=scale, placement=placement, cache=cache,
+                     corners=corners)
+    elif path.endswith(".png"):
+        return Query(QueryBin(path, scale=scale), bin=True, scale=scale, cache=cache, corners=corners)
+    raise ValueError("Query can only be of PNG or SVG format: [{}]".format(path))
+
+
+def scan_target(tree, target, limit, engine=ENGINE_SHIFT, deformation=DEFORMATION):
+    """
+    Searches a query within a target
+    :param tree: CompactTree of the query
+    :param target: Target-object
+    :param limit: Number of detections
+    :param engine: Energy engine, see DistanceTransform
+    :param deformation: Weights (wy, wx) of the deformation cost used by ENGINE_DEFORMABLE
+    :return: List of the detections, best first
+    """
+    distance_transform = DistanceTransform(tree, target, engine=engine, deformation=deformation)
+    return list(Evaluation(tree, target, distance_transform, limit).detections())
+
+
+def records(detections, target_path, query_name):
+    """
+    Converts detections into flat records
+    :param detections: List of Detections, best first
+    :param target_path: Path of the target the detections were found in
+    :param query_name: Name of the query
+    :return: List of dictionaries holding the FIELDS
+    """
+    rows = list()
+    for rank, detection in enumerate(detections):
+        top, bottom, left, right = detection.bounding_box
+        y, x = detection.position
+        rows.append({"target": target_path, "query": query_name, "rank": rank, "y": y, "x": x, "top": top,
+                     "bottom": bottom, "left": left, "right": right, "energy": detection.energy})
+    return rows
+
+
+def scan_path(job):
+    """
+    Loads and scans a single target. This is run by the worker processes.
+    :param job: Tuple of (CompactTree, query name, target path, scale, limit, engine, deformation, rasterizer)
+    :return: List of records of the detections
+    """
+    tree, query_name, path, scale, limit, engine, deformation, rasterizer = job
+    headless_logger.info("Scanning [%s]", path)
+    target = load_target(path, scale, rasterizer)
+    return records(scan_target(tree, target, limit, engine, deformation), path, query_name)
+
+
+def scan(tree, query_name, paths, scale=1, limit=10, engine=ENGINE_SHIFT, deformation=DEFORMATION, workers=1,
+         rasterizer=RASTERIZER_QT):
+    """
+    Scans all targets, one after another or in a pool of worker processes
+    :param tree: CompactTree of the query
+    :param query_name: Name of the query
+    :param paths: Paths of the targets
+    :param scale: Multiplier for the scale
+    :param limit: Number of detections per target
+    :param engine: Energy engine, see DistanceTransform
+    :param deformation: Weights (wy, wx) of the deformation cost used by ENGINE_DEFORMABLE
+    :param workers: Number of worker processes
+    :param rasterizer: Rasterizer of SVG targets. With RASTERIZER_NUMPY the workers don't need Qt for SVG targets
+    :return: Generator of the lists of records of every target, in the order of paths
+    """
+    jobs = [(tree, query_name, path, scale, limit, engine, deformation, rasterizer) for path in paths]
+    if workers <= 1:
+        for job in jobs:
+            yield scan_path(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for rows in executor.map(scan_path, jobs):
+            yield rows
+
+
+def write_records(rows, handle, csv=False):
+    """
+    Writes records as JSON Lines or CSV
+    :param rows: Iterable of lists of records
+    :param handle: File-like object to write to
+    :param csv: Boolean value which determines, if CSV (with header) instead of JSON Lines is written
+    """
+    writer = None
+    if csv:
+        writer = DictWriter(handle, fieldnames=FIELDS)
+        writer.writeheader()
+    for target_rows in rows:
+        for row in target_rows:
+            if csv:
+                writer.writerow(row)
+            else:
+                handle.write(dumps(row) + "\n")
+        handle.flush()
+
+
+def main():  # pragma: no cover
+    """
+    Entry point of the headless scan.
+    """
+    options = HeadlessSettings().options
+    tracer = None
+    if options.trace is not None or options.profile is not None:
+        # tracemalloc slows down every allocation, so it only runs for --trace and doesn't distort --profile
+        tracer = Tracer(memory=options.trace is not None, profile=options.profile,
+                        profile_path=options.profile_output).start()
+    try:
+        run(options)
+    finally:
+        if tracer is not None:
+            tracer.stop()
+            if options.trace is not None:
+                tracer.write(options.trace)
+
+
+def run(options):  # pragma: no cover
+    """
+    Scans the targets as configured by the options
+    :param options: Parsed options of HeadlessSettings
+    """
+    cache = QueryCache(options.cache) if options.cache is not None else None
+    query = load_query(options.query, options.index, options.scale, cache=cache, placement=options.placement,
+                       rasterizer=options.rasterizer, corners=options.corners)
+    paths = target_paths(options.targets)
+    headless_logger.info("Scanning %d targets for [%s]", len(paths), query.name)
+
+    rows = scan(query.create_compact_tree(), query.name, paths, options.scale, options.limit, options.engine,
+                tuple(options.deformation), options.workers, options.rasterizer)
+    if options.output is None:
+        write_records(rows, stdout)
+    else:
+        with open(options.output, "w", newline="") as handle:
+            write_records(rows, handle, csv=options.output.endswith(".csv"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# -*- encoding: utf-8 -*-
+"""
+This module finds the endpoints, junctions and corners of a skeleton topologically instead of by corner_harris.
+The 8 neighbours of every pixel are packed into one byte by shifting the skeleton, so a lookup table gives the crossing
+number of every pixel, i.e. the number of transitions from background to skeleton when going once around it. Skeleton
+pixels with a crossing number of 1 are endpoints, those with 3 or more are junctions. From every other pixel of a
+stroke, the stroke is followed CURVATURE_STEPS pixels in both directions, for all pixels at once. The pixel is a
+corner, if both directions enclose an angle sharper than CORNER_ANGLE and it isn't close to an endpoint or junction.
+Touching junctions and touching corners are merged into one, so the result doesn't depend on the angle between the
+strokes. Strokes without any of them (e.g. closed loops) get their first pixel, so every stroke can be walked by the
+placement.
+"""
+from logging import getLogger
+
+from numpy import arange, argwhere, array, concatenate, nonzero, ones, roll, zeros, uint8, arccos, degrees, \
+    bincount, lexsort, unique, stack, where, pad, asarray
+
+junctions_logger = getLogger("Junctions")
+
+CURVATURE_STEPS = 4
+CORNER_ANGLE = 120
+# Offsets (dy, dx) of the neighbours, clockwise starting at the top. Neighbour k is bit k of the code of a pixel.
+NEIGHBOURS = array([(-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1)])
+
+
+def crossing_table():
+    """
+    :return: Boolean Numpy-Array of shape (256, 8) holding the neighbours of every code, Numpy-Array holding the
+             crossing number of every code and Numpy-Array of shape (256, 2) holding the first step into both
+             strokes of every code with a crossing number of 2 (-1 otherwise). The first step into a stroke is
+             taken diagonally, if it can be, since the diagonal neighbour is the farther one.
+    """
+    bits = (arange(256)[:, None] >> arange(8)) & 1
+    crossings = ((bits == 0) & (roll(bits, -1, axis=1) == 1)).sum(axis=1)
+    first_steps = -ones((256, 2), dtype=int)
+    for code in nonzero(crossings == 2)[0]:
+        starts = [k for k in range(8) if bits[code, k] and not bits[code, k - 1]]
+        for side, start in enumerate(starts):
+            run = [start]
+            while bits[code, (run[-1] + 1) % 8]:
+                run.append((run[-1] + 1) % 8)
+            diagonal = [k for k in run if k % 2 == 1]
+            first_steps[code, side] = diagonal[0] if diagonal else run[0]
+    return bits.astype(bool), crossings, first_steps
+
+
+NEIGHBOUR_BITS, CROSSINGS, FIRST_STEPS = crossing_table()
+
+
+def neighbour_codes(skeleton):
+    """
+    :param skeleton: Boolean Numpy-Array of the skeleton
+    :return: Numpy-Array of bytes, each holding the 8 neighbours of a pixel. See NEIGHBOURS
+    """
+    height, width = skeleton.shape
+    padded = pad(asarray(skeleton, dtype=uint8), 1)
+    codes = zeros((height, width), dtype=uint8)
+    for k, (dy, dx) in enumerate(NEIGHBOURS):
+        codes |= padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width] << uint8(k)
+    return codes
+
+
+def follow_strokes(codes, crossings, positions, steps):
+    """
+    Follows the stroke through every given pixel in both directions. A walk stops at endpoints and junctions.
+    :param codes: Neighbour codes of the skeleton. See neighbour_codes
+    :param crossings: Crossing numbers of the skeleton, 0 for the background
+    :param positions: Int Numpy-Array of shape (n, 2) holding pixels with a crossing number of 2
+    :param steps: Number of pixels to follow the stroke
+    :return: Int Numpy-Array of shape (2, n, 2) holding the pixels reached in both directions and boolean Numpy-Array
+             of shape (n, ), which is True, if both walks took every step
+    """
+    rows = arange(len(positions))
+    reached = list()
+    complete = ones(len(positions), dtype=bool)
+    for side in (0, 1):
+        previous = positions
+        current = positions + NEIGHBOURS[FIRST_STEPS[codes[positions[:, 0], positions[:, 1]], side]]
+        for _ in range(steps - 1):
+            moving = crossings[current[:, 0], current[:, 1]] == 2
+            complete &= moving
+            candidates = current[:, None] + NEIGHBOURS
+            distances = ((candidates - previous[:, None]) ** 2).sum(axis=2)
+            distances[~NEIGHBOUR_BITS[codes[current[:, 0], current[:, 1]]]] = -1
+            following = candidates[rows, distances.argmax(axis=1)]
+            previous, current = where(moving[:, None], current, previous), where(moving[:, None], following, current)
+        reached.append(current)
+    return stack(reached), complete
+
+
+def merge_touching(positions, shape, scores=None):
+    """
+    Merges touching (8-connected) pixels into the one with the lowest score. Ties are broken by the order of the pixels.
+    :param positions: Int Numpy-Array of shape (n, 2)
+    :param shape: Shape of the skeleton
+    :param scores: Numpy-Array holding the score of every pixel (default: its distance to the center of its group)
+    :return: Int Numpy-Array of shape (m, 2) holding one pixel of every group of touching pixels
+    """
+    from scipy.ndimage import label
+    mask = zeros(shape, dtype=bool)
+    mask[positions[:, 0], positions[:, 1]] = True
+    labels = label(mask, structure=ones((3, 3)))[0][positions[:, 0], positions[:, 1]] - 1
+    if scores is None:
+        center = stack([bincount(labels, positions[:, axis]) for axis in (0, 1)], axis=1) / bincount(labels)[:, None]
+        scores = ((positions - center[labels]) ** 2).sum(axis=1)
+    order = lexsort((arange(len(positions)), scores, labels))
+    _, first = unique(labels[order], return_index=True)
+    return positions[order[first]]
+
+
+def skeleton_points(skeleton, steps=CURVATURE_STEPS, angle=CORNER_ANGLE):
+    """
+    Finds the endpoints, junctions and corners of a skeleton
+    :param skeleton: Boolean Numpy-Array of a skeleton, one pixel wide
+    :param steps: Number of pixels a stroke is followed in both directions to measure its angle
+    :param angle: Angle in degrees, below which a pixel is a corner
+    :return: Int Numpy-Arrays of shape (n, 2) holding the positions (y, x) of the endpoints, the junctions and the
+             corners
+    """
+    skeleton = asarray(skeleton, dtype=bool)
+    codes = neighbour_codes(skeleton)
+    crossings = where(skeleton, CROSSINGS[codes], 0)
+
+    endpoints = argwhere(crossings == 1)
+    junctions = argwhere(crossings >= 3)
+    if len(junctions):
+        junctions = merge_touching(junctions, skeleton.shape)
+
+    corners = argwhere(crossings == 2)
+    if len(corners):
+        reached, complete = follow_strokes(codes, crossings, corners, steps)
+        before, after = (reached - corners).astype(float)
+        cosine = (before * after).sum(axis=1) / ((before ** 2).sum(axis=1) * (after ** 2).sum(axis=1)) ** 0.5
+        angles = degrees(arccos(cosine.clip(-1, 1)))
+        sharp = complete & (angles < angle)
+        # Next to a junction the strokes leaving it look like a corner
+        known = concatenate([endpoints, junctions])
+        if len(known) and sharp.any():
+            sharp[sharp] = (abs(corners[sharp][:, None] - known).max(axis=2) > steps).all(axis=1)
+        corners = merge_touching(corners[sharp], skeleton.shape, angles[sharp]) if sharp.any() else corners[:0]
+
+    junctions_logger.info("Skeleton has %d endpoints, %d junctions and %d corners", len(endpoints), len(junctions),
+                          len(corners))
+    return endpoints, junctions, corners
+
+
+def find_corners(skeleton, steps=CURVATURE_STEPS, angle=CORNER_ANGLE):
+    """
+    Finds the endpoints, junctions and corners of a skeleton. Strokes without any of them get their first pixel.
+    See skeleton_points
+    :param skeleton: Boolean Numpy-Array of a skeleton, one pixel wide
+    :param steps: Number of pixels a stroke is followed in both directions to measure its angle
+    :param angle: Angle in degrees, below which a pixel is a corner
+    :return: Int Numpy-Array of shape (n, 2) holding the positions (y, x) in row-major order
+    """
+    from scipy.ndimage import label
+    skeleton = asarray(skeleton, dtype=bool)
+    points = concatenate(skeleton_points(skeleton, steps, angle)).reshape(-1, 2)
+
+    labels, count = label(skeleton, structure=ones((3, 3)))
+    found = zeros(count + 1, dtype=bool)
+    found[labels[points[:, 0], points[:, 1]]] = True
+    pixels = argwhere(skeleton)
+    _, first = unique(labels[pixels[:, 0], pixels[:, 1]], return_index=True)
+    points = concatenate([points, pixels[first][~found[1:]]])
+    return points[lexsort((points[:, 1], points[:, 0]))]
@@ -0,0 +1,71 @@
+# -*- encoding: utf-8 -*-
+"""
+This module finds the best local minima of an energy map. A cell is a local minimum, if it is the minimum of the
+window around it. The window is a rectangle, so scipy filters it separably, one running minimum per axis, which costs
+a constant number of operations per cell no matter how large the window is. Only the cells, which can be among the
+best ones, are sorted afterwards instead of every local minimum.
+"""
+from numpy import arange, argsort, concatenate, flatnonzero, nonzero, partition
+from scipy.ndimage import minimum_filter
+
+WINDOW_QUERY = "query"
+
+
+def minimum_window(shape):
+    """
+    :param shape: Shape of the energy map
+    :return: Size of the window used to find local minima by default (a tenth of the shorter side)
+    """
+    return max(min(shape) // 10, 1)
+
+
+def suppression_window(shape, window=None, query_shape=None):
+    """
+    :param shape: Shape of the energy map
+    :param window: None for minimum_window, a size in pixels (for both axes or as (height, width)) or WINDOW_QUERY
+                   for the bounding box of the query
+    :param query_shape: Shape (height, width) of the query, needed for WINDOW_QUERY
+    :return: Size of the window as (height, width)
+    """
+    if window is None:
+        return minimum_window(shape), minimum_window(shape)
+    elif window == WINDOW_QUERY:
+        return tuple(query_shape)
+    elif isinstance(window, int):
+        return window, window
+    return tuple(window)
+
+
+def local_minima(values, size):
+    """
+    Finds every cell, which is the minimum of the window around it
+    :param values: 2D Numpy-Array
+    :param size: Size (height, width) of the window
+    :return: y, x arrays of the local minima in row-major order
+    """
+    return nonzero(minimum_filter(values, size=size, mode="nearest") == values)
+
+
+def smallest(values, ys, xs, limit):
+    """
+    Sorts the given cells by their values and keeps the first limit of them. Only the cells, which can be among the
+    first limit, are sorted. Cells of equal value keep their order.
+    :param values: 2D Numpy-Array
+    :param ys: y array of the cells
+    :param xs: x array of the cells
+    :param limit: Number of cells to keep
+    :return: y, x arrays of the limit cells with the smallest values
+    """
+    energies = values[ys, xs]
+    if limit <= 0:
+        return ys[:0], xs[:0]
+
+    kept = arange(len(energies))
+    if limit < len(energies):
+        # Everything below the value of rank limit is kept, ties at that value are kept in their order
+        largest = partition(energies, limit - 1)[limit - 1]
+        below = flatnonzero(energies < largest)
+        kept = concatenate((below, flatnonzero(energies == largest)[:limit - len(below)]))
+        kept.sort()
+    order = kept[argsort(energies[kept], kind="stable")]
+    return ys[order], xs[order]
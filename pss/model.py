@@ -2,6 +2,8 @@
 This module is the core module of this application. It defines a SymbolGroup as the query object and builds
 up a parent-child tree by using the query image, skeletonizing it down to one pixel and placing nodes over the skeleton
 The nodes within the tree are represented by the custom class Node.
+PyQt4, qimage2ndarray, scikit-image, scipy.ndimage and mahotas are imported by the functions, which need them, only. So
+importing this module and searching with a CompactTree (e.g. in worker processes) doesn't load them.
 """
 # -*- encoding: utf-8 -*-
 from copy import deepcopy
@@ -9,25 +11,19 @@ from datetime import datetime
 from functools import reduce  # pylint:disable=redefined-builtin
 from logging import getLogger
 from math import sqrt
-from operator import xor
-from dt import compute
-from random import uniform
-
-from PyQt4 import QtGui
-from PyQt4.QtGui import QPainter, QMatrix, QTransform
-from mahotas import distance
-from numpy import zeros, array, delete, insert, c_, mean, inf, invert, ndarray, add, sqrt as rt, nanmax, nanmin, full, \
-    ones, copy, roll
-from numpy.random import rand
-from qimage2ndarray import recarray_view
-from scipy.ndimage.morphology import distance_transform_edt, distance_transform_cdt
-from skimage.feature import corner_harris
-from skimage.feature import corner_peaks
-from skimage.morphology import skeletonize
-from matplotlib import pyplot as plt
-from skimage.util import random_noise
-
-from external.generalized_distance_transform import of_image
+
+from numpy import zeros, array, delete, insert, c_, mean, inf, invert, ndarray, equal, column_stack
+
+from pss.placement import SkeletonGraph
+from pss.profiling import stage, STAGE_RASTERIZE, STAGE_SKELETONIZE, STAGE_CORNERS, STAGE_PLACEMENT, STAGE_TREE, \
+    STAGE_TARGET_DT, STAGE_ENERGY
+from pss.cache import pack_bool_array, unpack_bool_array
+from pss.energy import energy, candidate_energy, windowed_candidate_energy, exact_distance_transform, \
+    target_distance_transform, ScorePool, ENGINE_SHIFT, DEFORMATION
+from pss.tree import minimum_spanning_tree, compact, CompactTree
+from pss.raster import bounding_box, fill_paths, polygon_data, FILL_EVENODD, RASTERIZER_NUMPY
+from pss.vector import place_nodes
+from pss.junctions import find_corners
 
 sg_logger = getLogger("SymbolGroup")
 
@@ -36,6 +32,13 @@ COLOR_BG = "Black"
 COLOR_FG = "White"
 DISTANCE = 3
 DIVISOR = 12
+PLACEMENT_GREEDY = "greedy"
+PLACEMENT_GRAPH = "graph"
+PLACEMENT_VECTOR = "vector"
+TREE_GREEDY = "greedy"
+TREE_PRIM = "prim"
+CORNERS_HARRIS = "harris"
+CORNERS_CROSSING = "crossing"
 
 
 class Query(object):
@@ -51,7 +54,8 @@ class Query(object):
     the initial symbol group paths given by their svg.
     """
 
-    def __init__(self, query, index=0, bin=False, scale=1):  # pylint:disable=super-on-old-class
+    def __init__(self, query, index=0, bin=False, scale=1, placement=PLACEMENT_GRAPH,
+                 tree=TREE_PRIM, cache=None, corners=CORNERS_HARRIS):  # pylint:disable=super-on-old-class
         """
         This class takes a queries QImage and takes care of building up the tree-model
         :param query: Object of class QueryBin or QuerySvg
@@ -59,39 +63,159 @@ class Query(object):
                       symbol_group should be used
         :param bin: Boolean value which determines, if the input was an svg-file or if the query is already rasterized
         :param scale: Multiplier for the scale
+        :param placement: PLACEMENT_GRAPH to place the nodes by using a SkeletonGraph (default) or PLACEMENT_GREEDY
+                          to use add_nodes_greedily. Both place the same nodes. PLACEMENT_VECTOR places the nodes
+                          along the strokes of the SVG-paths instead (see pss.vector), without rasterizing and
+                          skeletonizing them. original_array and skeleton are None in that case and the cache isn't
+                          used, since building up the query this way is cheap.
+        :param tree: TREE_PRIM to build up the tree with minimum_spanning_tree (default) or TREE_GREEDY to use
+                     find_closest_node. Both create the same relations.
+        :param cache: Optional QueryCache. If the query was built before, skeleton, nodes and tree are loaded from it
+                      instead of being built up again.
+        :param corners: CORNERS_HARRIS to find the corners and junctions of the skeleton by corner_harris (default) or
+                        CORNERS_CROSSING to find its endpoints, junctions and corners by their crossing numbers.
+                        See pss.junctions
         """
         self.width, self.height = scale, scale
+        self.placement = placement
+        self.tree = tree
+        self.corners = corners
+        self.image = None
         if not bin:
             sg_logger.info("Setup SVG-Query with name [%s]", query.names[index])
             self.paths = query.svg_symbol_groups[index]
             self.name = query.names[index]
+            self.rasterizer = query.rasterizer
 
             # Query
-            self.bounding_box = self.create_bounding_box()
-            self.image = self.create_original_image()
-            self.original_array = convert_qimage_to_ndarray(self.image)
+            if self.rasterizer == RASTERIZER_NUMPY:
+                if placement == PLACEMENT_VECTOR:
+                    raise ValueError("Placing the nodes along the vector strokes needs the paths as QPainterPaths")
+                self.bounding_box = bounding_box(self.paths)
+                cache_data = polygon_data(self.paths)
+            else:
+                self.bounding_box = self.create_bounding_box()
+                cache_data = path_data(self.paths)
+
+            if placement == PLACEMENT_VECTOR:
+                self.original_array = None
+                self.skeleton = None
+                self.build_up_vector_model(scale)
+                return
         else:
+            from qimage2ndarray import recarray_view
             self.image = query.image
             self.original_array = recarray_view(query.image).red <= 195
             self.name = "PNG-Image"
+            cache_data = self.original_array
 
-        self.skeleton = create_skeleton(self.name, self.original_array)
-        self.enlarged_skeleton = self.enlarge_skeleton()
-        self.corner_nodes = self.find_corners_and_junctions()
-        self.true_list = self.create_true_list()
-        self.center_of_mass = self.calculate_center_of_mass()
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key("bin" if bin else "svg", cache_data, scale, DISTANCE, DIVISOR,
+                                  None if bin else self.rasterizer, corners)
+            cached = cache.load(cache_key)
+            if cached is not None:
+                self.restore(cached)
+                return
+
+        if not bin:
+            with stage(STAGE_RASTERIZE):
+                if self.rasterizer == RASTERIZER_NUMPY:
+                    self.original_array = self.fill_original_array()
+                else:
+                    self.image = self.create_original_image()
+                    self.original_array = convert_qimage_to_ndarray(self.image)
+        self.build_up_model()
+
+        if cache is not None:
+            cache.store(cache_key, self.dump())
+
+    def build_up_model(self):
+        """
+        Skeletonizes the original_array, places the nodes over the skeleton and builds up the tree
+        """
+        with stage(STAGE_SKELETONIZE):
+            self.skeleton = create_skeleton(self.name, self.original_array)
+            self.enlarged_skeleton = self.enlarge_skeleton()
+        with stage(STAGE_CORNERS):
+            self.corner_nodes = self.find_corners_and_junctions()
 
-        # Tree
-        self.root_node = None
-        self.nodes = list()
+        with stage(STAGE_PLACEMENT):
+            self.skeleton_graph = None
+            if self.placement == PLACEMENT_GREEDY:
+                self.true_list = self.create_true_list()
+            else:
+                self.skeleton_graph = SkeletonGraph(self.enlarged_skeleton,
+                                                    [node.position for node in self.corner_nodes], DISTANCE)
+                self.true_list = self.skeleton_graph.true_list()
+            self.center_of_mass = self.calculate_center_of_mass()
+
+            # Tree
+            self.root_node = None
+            self.nodes = list()
+
+            self.open_list = list()
+            self.closed_list = list()
+
+            self.nodes = self.add_remaining_nodes()
+            self.root_node = self.find_root_node()
+
+        with stage(STAGE_TREE):
+            self.build_up_tree()
+
+    def build_up_vector_model(self, scale):
+        """
+        Places the nodes along the strokes of the paths and builds up the tree
+        :param scale: Multiplier for the scale
+        """
+        self.shape = (int(self.bounding_box.height() * scale), int(self.bounding_box.width() * scale))
+        with stage(STAGE_PLACEMENT):
+            origin = (self.bounding_box.x(), self.bounding_box.y())
+            positions, vertices = place_nodes(self.paths, origin, scale, DISTANCE, self.shape)
+            self.nodes = [Node(position=position) for position in positions]
+            self.corner_nodes = self.nodes[:vertices]
+            self.center_of_mass = Node(position=mean(positions, axis=0, dtype=int))
+            self.root_node = self.find_root_node()
+
+        with stage(STAGE_TREE):
+            self.build_up_tree()
+
+    def dump(self):
+        """
+        Collects everything needed to restore this query without building it up again
+        :return: Dictionary of Numpy-Arrays, which can be stored within a QueryCache
+        """
+        original_array, original_shape = pack_bool_array(self.original_array)
+        skeleton, _ = pack_bool_array(self.skeleton)
+        compact_tree = self.create_compact_tree()
+        return {"original_array": original_array, "shape": original_shape, "skeleton": skeleton,
+                "corners": array([node.position for node in self.corner_nodes], dtype=int).reshape(-1, 2),
+                "center_of_mass": self.center_of_mass.position,
+                "remaining": array([node.position for node in self.nodes], dtype=int).reshape(-1, 2),
+                "positions": compact_tree.positions, "offsets": compact_tree.offsets,
+                "parents": compact_tree.parents, "order": compact_tree.order}
+
+    def restore(self, cached):
+        """
+        Restores skeleton, nodes and tree from the arrays created by dump
+        :param cached: Dictionary of Numpy-Arrays loaded from a QueryCache
+        """
+        sg_logger.info("Restoring Query with name [%s] from cache", self.name)
+        self.original_array = unpack_bool_array(cached["original_array"], cached["shape"])
+        self.skeleton = unpack_bool_array(cached["skeleton"], cached["shape"])
+        self.enlarged_skeleton = self.enlarge_skeleton()
+        self.corner_nodes = [Node(position=position) for position in cached["corners"]]
+        self.skeleton_graph = None
+        self.true_list = SkeletonGraph(self.enlarged_skeleton, cached["corners"], DISTANCE).true_list()
+        self.center_of_mass = Node(position=cached["center_of_mass"])
 
         self.open_list = list()
         self.closed_list = list()
 
-        self.nodes = self.add_remaining_nodes()
-        self.nodes_backup = deepcopy(self.nodes)  # needed for dt height and width
-        self.root_node = self.find_root_node()
-        self.build_up_tree()
+        compact_tree = CompactTree(cached["positions"], cached["offsets"], cached["parents"], cached["order"],
+                                   cached["shape"])
+        self.root_node = nodes_from_compact_tree(compact_tree)
+        self.nodes = [Node(position=position) for position in cached["remaining"]]
 
     def create_bounding_box(self):
         """
@@ -109,18 +233,30 @@ class Query(object):
         After that the QImage is tried to get filled with the paths
         :return: QImage created out of QPainterPaths, which were given to the constructor
         """
+        from PyQt4 import QtGui
         image = QtGui.QImage(self.bounding_box.width() * self.width, self.bounding_box.height() * self.height,
                              QtGui.QImage.Format_ARGB32)
         set_background(COLOR_BG, image)
         image = self.try_to_fill_image_with_paths(image)
         return image
 
+    def fill_original_array(self):
+        """
+        Fills the polygons of the paths into a Numpy-Array the same way create_original_image draws them.
+        See pss.raster
+        :return: Boolean Numpy-Array, which is True within the paths
+        """
+        left, top, width, height = self.bounding_box
+        shape = (int(height * self.height), int(width * self.width))
+        return fill_paths(self.paths, shape, (left, top), (self.width, self.height), FILL_EVENODD)
+
     def try_to_fill_image_with_paths(self, image):
         """
         Tries filling up the QImage with QPainterPaths
         :param image: The empty QImage
         :return: The QImage, filled with QPainterPaths in a binary representation
         """
+        from PyQt4 import QtGui
         qpainter = QtGui.QPainter(image)
         try:
             return self.fill_image_with_paths(qpainter, image)
@@ -135,6 +271,7 @@ class Query(object):
         :return: The QImage, filled with QPainterPaths in a binary representation
 
         """
+        from PyQt4 import QtGui
         sg_logger.info("Brushing Paths onto QImage")
         qpainter.setBrush(QtGui.QColor(COLOR_FG))
         qpainter.setPen(QtGui.QColor(COLOR_FG))
@@ -164,7 +301,11 @@ class Query(object):
         :return: List of all junctions and corners found within the enlarged_skeleton Numpy-Array
         """
         sg_logger.info("Detecting Nodes of skeletonized QImage with name [%s]\n", self.name)
-        skeleton_corners = corner_peaks(corner_harris(self.enlarged_skeleton), min_distance=2)
+        if self.corners == CORNERS_CROSSING:
+            skeleton_corners = find_corners(self.enlarged_skeleton)
+        else:
+            from skimage.feature import corner_harris, corner_peaks
+            skeleton_corners = corner_peaks(corner_harris(self.enlarged_skeleton), min_distance=2)
         nodes = list()
         for corner in skeleton_corners:
             nodes.append(Node(position=corner))
@@ -189,10 +330,21 @@ class Query(object):
         :return: The list of all nodes representing the QImage
         """
         nodes = list()
-        nodes.extend(self.add_nodes_greedily())
+        if self.skeleton_graph is None:
+            nodes.extend(self.add_nodes_greedily())
+        else:
+            nodes.extend(self.add_nodes_from_skeleton_graph())
         nodes.extend(self.corner_nodes)
         return nodes
 
+    def add_nodes_from_skeleton_graph(self):
+        """
+        Adds nodes between junctions and corners by walking the SkeletonGraph. The placed nodes are the same as the
+        ones of add_nodes_greedily, but the skeleton gets indexed only once.
+        :return: The list of all nodes representing the QImage
+        """
+        return [Node(position=position) for position in self.skeleton_graph.place_nodes()]
+
     def add_nodes_greedily(self):
         """
         Adds nodes between junctions and corners greedily.
@@ -367,7 +519,10 @@ class Query(object):
 
         sg_logger.info("Starting to build up tree...")
         start_time = datetime.now()
-        self.creating_all_relations_for_tree()
+        if self.tree == TREE_GREEDY:
+            self.creating_all_relations_for_tree()
+        else:
+            self.creating_all_relations_with_prim()
         end_time = datetime.now()
         print_time(end_time, start_time)
         sg_logger.info("Finished building up tree...\n")
@@ -388,6 +543,29 @@ class Query(object):
             self.add_relation(real_child, real_parent)
             self.update_tree(current_tree, real_child)
 
+    def creating_all_relations_with_prim(self):
+        """
+        This creates all relations at once by using a minimum spanning tree starting from the root node.
+        Nodes, which couldn't be added to the tree, are left within self.nodes.
+        """
+        nodes = self.nodes
+        root_index = next(i for i, node in enumerate(nodes) if node is self.root_node)
+        positions = array([node.position for node in nodes], dtype=int)
+
+        attached = {root_index}
+        for child, parent in minimum_spanning_tree(positions, root_index):
+            link_nodes(nodes[child], nodes[parent])
+            attached.add(child)
+        self.nodes = [node for i, node in enumerate(nodes) if i not in attached]
+
+    def create_compact_tree(self):
+        """
+        Creates a CompactTree out of the built up tree. See pss.tree.CompactTree
+        :return: CompactTree holding positions, offsets and parents of all nodes within the tree
+        """
+        shape = self.shape if self.original_array is None else self.original_array.shape
+        return CompactTree.from_node(self.root_node, shape)
+
     @staticmethod
     def update_tree(current_tree, real_child):
         """
@@ -403,9 +581,7 @@ class Query(object):
         :param real_child: Child-Node to add
         :param real_parent: Parent-Node where Child-Node should be added
         """
-        real_parent.add_child(real_child)
-        real_child.set_parent(real_parent)
-        real_child.calculate_offset()
+        link_nodes(real_child, real_parent)
         self.nodes.remove(real_child)
 
     def find_closest_node(self, current_tree):
@@ -451,7 +627,6 @@ class Node(object):
         self.position = array([0, 0], dtype=int) if position is None else position
         self.offset = None if offset is None else offset
         self.index = None
-        self.root_dt = None
 
     def add_child(self, child):
         """
@@ -493,9 +668,6 @@ class Node(object):
             return False
         return (self.position == other.position).all()
 
-    def add_root_dt(self, root_dt):
-        self.root_dt = root_dt
-
 
 class Target(object):
     """
@@ -508,25 +680,52 @@ class Target(object):
     """
 
     # noinspection PyCallByClass,PyTypeChecker
-    def __init__(self, target, bin=False, scale=1):
+    def __init__(self, target, bin=False, scale=1, scratch=None):
         """
         This class takes a queries QImage and takes care of building up the tree-model
         :param target: Object of class TargetBin or TargetSvg
         :param bin: Boolean value which determines, if the input was an svg-file or if the query is already rasterized
         :param scale: Multiplier for the scale
+        :param scratch: Optional Scratch to keep original_array and inverted_array in memory-mapped files
         """
         self.width, self.height = scale, scale
         if not bin:
-            self.bounding_box = target.renderer.viewBox()
-            self.image = self.create_image(target.renderer)
-            self.original_array = convert_qimage_to_ndarray(self.image)
-
+            with stage(STAGE_RASTERIZE):
+                if target.rasterizer == RASTERIZER_NUMPY:
+                    self.bounding_box = target.view_box
+                    self.original_array = self.fill_array(target.paths)
+                else:
+                    self.bounding_box = target.renderer.viewBox()
+                    self.image = self.create_image(target.renderer)
+                    self.original_array = convert_qimage_to_ndarray(self.image)
+
+            from skimage.util import random_noise
             self.original_array = random_noise(self.original_array, mode="s&p", amount=0.3)
 
         else:
             self.image = target.image
+            from qimage2ndarray import recarray_view
             self.original_array = recarray_view(self.image).red >= 150
-        self.inverted_array = invert(ndarray.astype(self.original_array, dtype=bool))
+
+        if scratch is None:
+            self.inverted_array = invert(ndarray.astype(self.original_array, dtype=bool))
+        else:
+            self.original_array = scratch.store(scratch.unique("target"), self.original_array)
+            # Same as inverting the boolean array, but written straight into the mapped file
+            self.inverted_array = scratch.empty(scratch.unique("target_inverted"), self.original_array.shape, bool)
+            equal(self.original_array, 0, out=self.inverted_array)
+
+    def fill_array(self, paths):
+        """
+        Fills the polygons of the paths into a Numpy-Array the same way create_image renders them. See pss.raster
+        :param paths: List of paths of the target, each a list of polygons
+        :return: Boolean Numpy-Array, which is False within the paths
+        """
+        left, top, width, height = self.bounding_box
+        # create_image passes the height of the view box as width of the QImage and vice versa, the renderer then
+        # stretches the view box over the whole image
+        shape = (int(width * self.width), int(height * self.height))
+        return invert(fill_paths(paths, shape, (left, top), (shape[1] / width, shape[0] / height)))
 
     def create_image(self, renderer):
         """
@@ -534,6 +733,8 @@ class Target(object):
         :param renderer: the QSvgRenderer object given by TargetSvg
         :return: QImage representation of the QSvgRenderer
         """
+        from PyQt4 import QtGui
+        from PyQt4.QtGui import QPainter
         image = QtGui.QImage(self.bounding_box.height() * self.height, self.bounding_box.width() * self.width,
                              QtGui.QImage.Format_ARGB32)
         set_background(COLOR_FG, image)
@@ -552,67 +753,149 @@ class DistanceTransform(object):  # pragma: no cover
     energy minimization for a given target.
     """
 
-    def __init__(self, query, target):
+    def __init__(self, query, target, engine=ENGINE_SHIFT, deformation=DEFORMATION, scratch=None, root_dt=None,
+                 workers=1):
         """
-        :param query: Query-object, which holds the tree-model rest configuration
+        :param query: Query-object, which holds the tree-model rest configuration, or its CompactTree
         :param target: Target-object, which holds the ndarray-array of the target image
+        :param engine: ENGINE_SHIFT to sum up the shifted distance transforms (default) or ENGINE_DEFORMABLE to pass
+                       min-convolved messages, which tolerate deformations of the query. See pss.energy
+        :param deformation: Weights (wy, wx) of the quadratic deformation cost used by ENGINE_DEFORMABLE
+        :param scratch: Optional Scratch to keep root_dt, sum_dt and the scores of the nodes in memory-mapped files,
+                        so targets larger than the physical memory can be searched. root_dt is calculated tile by
+                        tile in that case.
+        :param root_dt: Optional distance transform of the target padded by the shape of the query, e.g. shared by
+                        a BatchSearch. It is calculated here, if it is missing.
+        :param workers: Number of threads evaluating independent subtrees of the query at the same time
         """
         self.query = query
+        self.engine = engine
+        self.deformation = deformation
+        self.scratch = scratch
+        self.workers = workers
+        self.tree = compact(query)
         self.target = target
-        query_shape = self.query.original_array.shape
+        query_shape = self.tree.shape
 
         self.height = self.target.original_array.shape[0]+2*query_shape[0]
         self.width = self.target.original_array.shape[1]+2*query_shape[1]
 
-        self.target.original_array = self.target.original_array.astype(float)
-        target_copy = deepcopy(self.target.original_array)
-        target_copy[target_copy == 1.0] = 2**15
+        with stage(STAGE_TARGET_DT):
+            if root_dt is not None:
+                self.root_dt = root_dt
+            elif scratch is None:
+                self.root_dt = target_distance_transform(self.target.original_array, query_shape)
+            else:
+                self.root_dt = self.mapped_distance_transform()
+
+        crop = (slice(query_shape[0], -query_shape[0]), slice(query_shape[1], -query_shape[1]))
+        with stage(STAGE_ENERGY):
+            self.sum_dt = self.calculate_distance_transform()[crop]
+            if scratch is not None:
+                self.sum_dt = self.store_sum_dt()
+        self.root_dt_normalized = self.root_dt[crop]
+
+    def mapped_distance_transform(self):
+        """
+        Calculates the distance transform of the target tile by tile into a memory-mapped file, so only one tile
+        (and its halo) has to fit into memory at once. See pss.energy.exact_distance_transform
+        :return: numpy.memmap holding the distance transform of the padded target
+        """
+        from pss.tiling import tiles, TILE_SIZE, DISTANCE_RADIUS
+        root_dt = self.scratch.empty(self.scratch.unique("root_dt"), (self.height, self.width))
+        for top, bottom, left, right in tiles(root_dt.shape, TILE_SIZE):
+            root_dt[top:bottom, left:right] = exact_distance_transform(
+                self.target.original_array, self.tree.shape, (top, bottom, left, right), DISTANCE_RADIUS)
+        root_dt.flush()
+        return root_dt
+
+    def calculate_distance_transform(self):
+        """
+        Sums up the distance transforms of all nodes of the tree. See pss.energy.energy
+        :return: The score of the root node for the whole padded target
+        """
+        if self.scratch is None:
+            return energy(self.root_dt, self.tree, self.engine, self.deformation, workers=self.workers)
+
+        allocate, self.score_names = self.scratch.allocator(self.scratch.unique("score"))
+        pool = ScorePool(self.root_dt, allocate=allocate)
+        return energy(self.root_dt, self.tree, self.engine, self.deformation, pool, self.workers)
 
-        empty_dt = ones((self.height, self.width))
-        empty_dt[query_shape[0]:-query_shape[0], query_shape[1]:-query_shape[1]] = target_copy
-        self.root_dt = distance(empty_dt)/5
+    def store_sum_dt(self):
+        """
+        Copies the energy into its own memory-mapped file and removes the files of the scores of the nodes
+        :return: numpy.memmap holding the energy
+        """
+        sum_dt = self.scratch.store(self.scratch.unique("sum_dt"), self.sum_dt)
+        sum_dt.flush()
+        for name in self.score_names:
+            self.scratch.remove(name)
+        return sum_dt
 
-        self.add_root_dt_to_nodes(self.query.root_node)
-        self.calculate_distance_transform(self.query.root_node)
-        self.sum_dt = self.query.root_node.root_dt[query_shape[0]:-query_shape[0], query_shape[1]:-query_shape[1]]
-        self.root_dt_normalized = self.root_dt[query_shape[0]:-query_shape[0], query_shape[1]:-query_shape[1]]
 
+class CandidateEnergy(object):
+    """
+    This class calculates the energy of a query for a few candidate positions within the target only, instead of
+    the whole energy map DistanceTransform calculates.
+    """
 
+    def __init__(self, query, target, candidates, root_dt=None):
+        """
+        :param query: Query-object, which holds the tree-model rest configuration, or its CompactTree
+        :param target: Target-object, which holds the ndarray-array of the target image
+        :param candidates: y, x lists of the candidates, e.g. the minimum of an earlier Evaluation
+        :param root_dt: Optional distance transform of the target padded by the shape of the query, e.g. shared by
+                        a BatchSearch. If it is missing, the distances are calculated around the candidates only.
+        """
+        self.tree = compact(query)
+        self.target = target
+        self.candidates = candidates
+        self.root_dt = root_dt
+
+        positions = column_stack(candidates).reshape(-1, 2) + self.tree.shape
+        if root_dt is None:
+            from pss.tiling import DISTANCE_RADIUS
+            self.energies = windowed_candidate_energy(self.target.original_array, self.tree, positions, DISTANCE_RADIUS)
+        else:
+            self.energies = candidate_energy(root_dt, self.tree, positions)
 
-    def calculate_distance_transform(self, node):
-        for child in node.children:
-            y = child.offset[0]
-            x = child.offset[1]
 
-            if y >= 0 and x > 0:
-                node.root_dt[abs(y):, abs(x):] += self.calculate_distance_transform(child)
-            elif y <= 0 and x < 0:
-                node.root_dt[:self.height - abs(y), :self.width - abs(x)] += self.calculate_distance_transform(child)
-            elif y < 0 <= x:
-                node.root_dt[:self.height - abs(y), abs(x):] += self.calculate_distance_transform(child)
-            elif y > 0 >= x:
-                node.root_dt[abs(y):, :self.width - abs(x)] += self.calculate_distance_transform(child)
-            node.root_dt /= 1.5
+def nodes_from_compact_tree(compact_tree):
+    """
+    Creates Node objects out of a CompactTree
+    :param compact_tree: CompactTree to create the nodes for
+    :return: The root node of the created tree
+    """
+    nodes = [Node(position=array(position, dtype=int)) for position in compact_tree.positions]
+    for index in compact_tree.order[1:]:
+        link_nodes(nodes[index], nodes[compact_tree.parents[index]])
+    return nodes[compact_tree.root]
 
-        if node.offset is not None:
-            y = node.offset[0]
-            x = node.offset[1]
 
-            if y >= 0 and x > 0:
-                return node.root_dt[:self.height - abs(y), :self.width - abs(x)]
-            elif y <= 0 and x < 0:
-                return node.root_dt[abs(y):, abs(x):]
-            elif y < 0 <= x:
-                return node.root_dt[abs(y):, :self.width - abs(x)]
-            elif y > 0 >= x:
-                return node.root_dt[:self.height - abs(y), abs(x):]
+def path_data(paths):
+    """
+    Collects the elements of the given QPainterPaths, so they can be used as key for a QueryCache
+    :param paths: List of QPainterPaths
+    :return: Numpy-Array holding type, x and y of every element of every path
+    """
+    data = list()
+    for path in paths:
+        for i in range(path.elementCount()):
+            element = path.elementAt(i)
+            data.append((element.type, element.x, element.y))
+        data.append((-1, 0, 0))
+    return array(data, dtype=float)
 
-        return node.root_dt
 
-    def add_root_dt_to_nodes(self, node):
-        for child in node.children:
-            self.add_root_dt_to_nodes(child)
-        node.add_root_dt(copy(self.root_dt))
+def link_nodes(child, parent):
+    """
+    Adds the child to the parent and vice versa and calculates the offset of the child
+    :param child: Child-Node to add
+    :param parent: Parent-Node where Child-Node should be added
+    """
+    parent.add_child(child)
+    child.set_parent(parent)
+    child.calculate_offset()
 
 
 def convert_qimage_to_ndarray(image):  # pragma: no cover
@@ -621,6 +904,7 @@ def convert_qimage_to_ndarray(image):  # pragma: no cover
     :param image:
     :return: Boolean Numpy-Array representing the QImage. "True" = Foreground, "False" = Background
     """
+    from qimage2ndarray import recarray_view
     sg_logger.info("Converting QImage to NumPy-Array")
     return recarray_view(image).red >= 128
 
@@ -644,6 +928,7 @@ def set_background(color, image):  # pragma: no cover
     :param image: QImage which background should be changed
     :param color: Color to change background to
     """
+    from PyQt4 import QtGui
     sg_logger.info("Setting Background to [%s]", color)
     image.fill(QtGui.QColor(color))
 
@@ -655,5 +940,6 @@ def create_skeleton(name, original_array):  # pragma: no cover
     :param name: Name of the QImage (For Logging purposes)
     :return: Skeletonized Numpy-Array
     """
+    from skimage.morphology import skeletonize
     sg_logger.info("Skeletonizing QImage with name [%s]", name)
     return skeletonize(original_array)
@@ -0,0 +1,99 @@
+# -*- encoding: utf-8 -*-
+"""
+This module places the nodes of a query over its skeleton. Instead of scanning the whole list of skeleton pixels for
+every visited node, the skeleton is indexed once by a label grid, so only the (2 * DISTANCE + 1)^2 window around a
+node has to be looked at. The order in which nodes are visited and placed is the same as the one of
+Query.add_nodes_greedily, which is why both place exactly the same nodes.
+"""
+from logging import getLogger
+
+from numpy import argwhere, arange, array, full
+
+placement_logger = getLogger("Placement")
+
+
+class SkeletonGraph(object):
+    """
+    This class holds an adjacency index of all "True"-pixels of an enlarged skeleton.
+    Each pixel, which is not a corner or junction, gets a label (its index within the row-major ordered true_list),
+    every other cell of the grid is labeled -1.
+    """
+
+    def __init__(self, skeleton, corners, distance):
+        """
+        :param skeleton: Boolean Numpy-Array of the (enlarged) skeleton
+        :param corners: List of 2D-positions of all corners and junctions found on the skeleton
+        :param distance: Distance between two neighboring nodes (See DISTANCE in pss.model)
+        """
+        self.distance = distance
+        self.shape = skeleton.shape
+        self.corners = [(int(corner[0]), int(corner[1])) for corner in corners]
+        self.corner_set = set(self.corners)
+
+        mask = array(skeleton, dtype=bool)
+        for y, x in self.corners:
+            if 0 <= y < self.shape[0] and 0 <= x < self.shape[1]:
+                mask[y, x] = False
+
+        self.positions = argwhere(mask)
+        self.labels = full(self.shape, -1, dtype=int)
+        self.labels[mask] = arange(len(self.positions))
+
+    def true_list(self):
+        """
+        :return: A list of 2D-Numpy-Arrays, equal to the one of Query.create_true_list
+        """
+        return list(self.positions)
+
+    def place_nodes(self):
+        """
+        Walks the skeleton starting at every corner and junction and places a node every DISTANCE pixels.
+        Pixels closer than DISTANCE to a visited node are removed from the index, so they can't become nodes any
+        longer. See Query.add_nodes_greedily for a description of the walk itself.
+        :return: List of positions of all placed nodes in the order they were found
+        """
+        placement_logger.info("Placing nodes on skeleton graph with %d pixels", len(self.positions))
+        alive = self.labels >= 0
+        closed = set()
+        placed = list()
+
+        for corner in self.corners:
+            open_list = [corner]
+            rest_list = list()
+
+            while open_list or rest_list:
+                if len(open_list) > 1:
+                    rest_list = open_list
+                    open_list = list()
+                    continue
+
+                node = open_list.pop(0) if open_list else rest_list.pop(0)
+                closed.add(node)
+
+                for position in self.visit(node, alive):
+                    if position not in closed and position not in self.corner_set:
+                        open_list.append(position)
+                        placed.append(position)
+
+        return [array(position, dtype=int) for position in placed]
+
+    def visit(self, node, alive):
+        """
+        Removes all pixels too close to the given node from the index and returns the ones exactly DISTANCE away.
+        :param node: Position of the current node
+        :param alive: Boolean Numpy-Array of the pixels still within the index
+        :return: List of positions exactly DISTANCE away (in row-major order)
+        """
+        y, x = node
+        top, left = max(y - self.distance, 0), max(x - self.distance, 0)
+        bottom = min(y + self.distance + 1, self.shape[0])
+        right = min(x + self.distance + 1, self.shape[1])
+
+        neighbors = list()
+        for i, j in argwhere(alive[top:bottom, left:right]):
+            i, j = int(i) + top, int(j) + left
+            if abs(i - y) < self.distance and abs(j - x) < self.distance:
+                alive[i, j] = False
+            else:
+                neighbors.append((i, j))
+        return neighbors
@@ -0,0 +1,177 @@
+# -*- encoding: utf-8 -*-
+"""
+This module traces the stages of the pipeline (rasterization, skeletonize, corners, node placement, tree building,
+target distance transform, tree energy, minima and crops). Every stage records its wall time, CPU time and the peak
+memory allocated above the memory allocated when it started (traced by tracemalloc, which numpy reports to). Since
+tracemalloc traces the whole process, the peak memory of stages running in several threads at once includes the memory
+of each other. Before Python 3.9 the traced peak can't be reset, so a stage, which stays below the peak reached before
+it started, only reports the memory it holds when it is done.
+Stages are only traced while a Tracer is started, otherwise stage() does nothing. A single stage can additionally
+be run under cProfile.
+"""
+from contextlib import contextmanager
+from cProfile import Profile
+from json import dump
+from logging import getLogger
+from threading import local
+from time import perf_counter, process_time
+import tracemalloc
+
+profiling_logger = getLogger("Profiling")
+
+STAGE_RASTERIZE = "rasterize"
+STAGE_SKELETONIZE = "skeletonize"
+STAGE_CORNERS = "corners"
+STAGE_PLACEMENT = "placement"
+STAGE_TREE = "tree"
+STAGE_TARGET_DT = "target_dt"
+STAGE_ENERGY = "energy"
+STAGE_MINIMA = "minima"
+STAGE_CROPS = "crops"
+STAGES = [STAGE_RASTERIZE, STAGE_SKELETONIZE, STAGE_CORNERS, STAGE_PLACEMENT, STAGE_TREE, STAGE_TARGET_DT,
+          STAGE_ENERGY, STAGE_MINIMA, STAGE_CROPS]
+
+tracer = None
+RESET_PEAK = hasattr(tracemalloc, "reset_peak")
+
+
+class Tracer(object):
+    """
+    This class records the stages run while it is started.
+    """
+
+    def __init__(self, memory=True, profile=None, profile_path=None):
+        """
+        :param memory: Boolean value which determines, if the peak memory of every stage is traced
+        :param profile: Optional name of a stage to run under cProfile
+        :param profile_path: Optional path to dump the cProfile statistics of that stage to
+        """
+        self.memory = memory
+        self.profile = profile
+        self.profile_path = profile_path
+        self.profiler = None
+        self.started_tracing = False
+        self.stages = list()
+        self.threads = local()
+
+    @property
+    def stack(self):
+        """
+        :return: Stages currently running within the calling thread, innermost last
+        """
+        if not hasattr(self.threads, "stack"):
+            self.threads.stack = list()
+        return self.threads.stack
+
+    def start(self):
+        """
+        Makes this tracer the one stage() reports to
+        """
+        global tracer
+        tracer = self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        return self
+
+    def stop(self):
+        """
+        Stops tracing (unless tracemalloc was started by someone else) and dumps the cProfile statistics, if a stage
+        was profiled
+        """
+        global tracer
+        tracer = None
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        if self.profiler is not None and self.profile_path is not None:
+            self.profiler.dump_stats(self.profile_path)
+            profiling_logger.info("Dumped profile of stage [%s] to [%s]", self.profile, self.profile_path)
+
+    def enter(self, name):
+        """
+        Starts recording a stage
+        :param name: Name of the stage
+        :return: Frame of the stage
+        """
+        frame = {"name": name, "wall": perf_counter(), "cpu": process_time(), "start": 0, "peak": 0,
+                 "traced_peak": 0}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.stack:
+                self.stack[-1]["peak"] = max(self.stack[-1]["peak"], peak)
+            if RESET_PEAK:
+                tracemalloc.reset_peak()
+                peak = current
+            frame["start"] = frame["peak"] = current
+            frame["traced_peak"] = peak
+        if name == self.profile:
+            self.profiler = self.profiler or Profile()
+            self.profiler.enable()
+        self.stack.append(frame)
+        return frame
+
+    def exit(self, frame):
+        """
+        Finishes recording a stage
+        :param frame: Frame returned by enter
+        """
+        self.stack.pop()
+        if frame["name"] == self.profile:
+            self.profiler.disable()
+        record = {"stage": frame["name"], "wall": perf_counter() - frame["wall"],
+                  "cpu": process_time() - frame["cpu"], "depth": len(self.stack)}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # A traced peak, which didn't grow during the stage, was reached before it started
+            peak = max(frame["peak"], peak if peak > frame["traced_peak"] else current)
+            record["peak_memory"] = peak - frame["start"]
+            if self.stack:
+                self.stack[-1]["peak"] = max(self.stack[-1]["peak"], peak)
+        self.stages.append(record)
+        profiling_logger.debug("Stage [%s] took %.3fs", frame["name"], record["wall"])
+
+    def summary(self):
+        """
+        Sums up the records of every stage, which was run more than once (e.g. once per query)
+        :return: Dictionary of stage names and their summed up wall time, CPU time, maximal peak memory and count
+        """
+        summary = dict()
+        for record in self.stages:
+            total = summary.setdefault(record["stage"], {"wall": 0.0, "cpu": 0.0, "peak_memory": 0, "count": 0})
+            total["wall"] += record["wall"]
+            total["cpu"] += record["cpu"]
+            total["peak_memory"] = max(total["peak_memory"], record.get("peak_memory", 0))
+            total["count"] += 1
+        return summary
+
+    def report(self):
+        """
+        :return: Dictionary holding every record in the order the stages finished and the summary
+        """
+        return {"stages": self.stages, "summary": self.summary()}
+
+    def write(self, path):
+        """
+        Writes the report as JSON
+        :param path: Path of the JSON-file
+        """
+        with open(path, "w") as handle:
+            dump(self.report(), handle, indent=2)
+
+
+@contextmanager
+def stage(name):
+    """
+    Records the enclosed code as a stage of the started tracer, if there is one
+    :param name: Name of the stage
+    """
+    current = tracer
+    if current is None:
+        yield
+        return
+    frame = current.enter(name)
+    try:
+        yield
+    finally:
+        current.exit(frame)
@@ -0,0 +1,172 @@
+# -*- encoding: utf-8 -*-
+"""
+This module searches a query coarse to fine. The target is downsampled by taking the minimum of blocks of
+FACTOR x FACTOR cells, so a block is a stroke as soon as one of its cells is a stroke, and the positions of the
+query tree are scaled down likewise. Only the coarsest level is searched as a whole. Afterwards the best candidates
+are refined level by level: each one is searched again within a small region around its position at the next finer
+level, until the energies at full resolution are known. Blank clay and unrelated signs are thereby dropped early.
+"""
+from logging import getLogger
+
+from numpy import ones, nonzero, argsort, unravel_index, maximum
+from scipy.ndimage import minimum_filter
+
+from pss.energy import target_distance_transform, tree_energy
+from pss.minima import minimum_window
+from pss.profiling import stage, STAGE_TARGET_DT, STAGE_ENERGY, STAGE_MINIMA, STAGE_CROPS
+from pss.tiling import region_energy, extract_symbols, DISTANCE_RADIUS
+from pss.tree import compact, CompactTree
+
+pyramid_logger = getLogger("Pyramid")
+
+FACTOR = 2
+LEVELS = 2
+CANDIDATES = 50
+MARGIN = 3
+
+
+def downsample(target_array, factor=FACTOR):
+    """
+    Downsamples the target by taking the minimum of every block of factor x factor cells
+    :param target_array: Numpy-Array of the target image (strokes are zeros)
+    :param factor: Height and width of a block
+    :return: Float Numpy-Array of the downsampled target
+    """
+    height, width = target_array.shape
+    blocks = ones((-(-height // factor) * factor, -(-width // factor) * factor))
+    blocks[:height, :width] = target_array
+    return blocks.reshape(blocks.shape[0] // factor, factor, blocks.shape[1] // factor, factor).min(axis=(1, 3))
+
+
+def scale_tree(tree, factor=FACTOR):
+    """
+    Scales the positions of a tree down, the same way downsample scales the target
+    :param tree: CompactTree of the query
+    :param factor: Height and width of a block
+    :return: CompactTree with the scaled positions and offsets
+    """
+    positions = tree.positions // factor
+    offsets = positions - positions[maximum(tree.parents, 0)]
+    offsets[tree.root] = 0
+    shape = (-(-tree.shape[0] // factor), -(-tree.shape[1] // factor))
+    return CompactTree(positions, offsets, tree.parents, tree.order, shape)
+
+
+class PyramidSearch(object):
+    """
+    This class finds the minima of the tree energy of a query within a target, refining coarse candidates only.
+    """
+
+    def __init__(self, query, target, limit, levels=LEVELS, candidates=CANDIDATES, threshold=None, margin=MARGIN,
+                 radius=DISTANCE_RADIUS, workers=1):
+        """
+        :param query: Query-object or its CompactTree
+        :param target: Target-object, which holds the ndarray-array of the target image
+        :param limit: Number of minima to find
+        :param levels: Number of times the target is downsampled (0 searches the full resolution as a whole)
+        :param candidates: Number of candidates kept at every level
+        :param threshold: Optional energy at the coarsest level, candidates above it are dropped
+        :param margin: Number of cells added around the position of a candidate at the next finer level
+        :param radius: Initial radius of the halo for the distance transform of the target
+        :param workers: Number of threads evaluating subtrees of the query at the same time
+        """
+        self.tree = compact(query)
+        self.target = target
+        self.limit = limit
+        self.candidates = candidates
+        self.threshold = threshold
+        self.margin = margin
+        self.radius = radius
+        self.workers = workers
+
+        self.trees, self.arrays = self.build_pyramid(levels)
+        self.minimum, self.energies = self.find_minima()
+        with stage(STAGE_CROPS):
+            self.found_symbols = extract_symbols(self.tree, self.target.original_array, self.minimum, self.energies)
+
+    def build_pyramid(self, levels):
+        """
+        Downsamples the target and scales the tree down, until levels is reached or the query would vanish
+        :param levels: Number of times the target is downsampled
+        :return: Lists of the trees and target arrays, full resolution first
+        """
+        trees, arrays = [self.tree], [self.target.original_array]
+        while len(trees) <= levels and min(trees[-1].shape) >= 2 * FACTOR:
+            trees.append(scale_tree(trees[-1]))
+            arrays.append(downsample(arrays[-1]))
+        pyramid_logger.info("Built pyramid with %d levels, coarsest target has shape %s", len(trees),
+                            arrays[-1].shape)
+        return trees, arrays
+
+    def find_minima(self):
+        """
+        Searches the coarsest level and refines its candidates
+        :return: y, x lists of the top n minima (n is set by self.limit) and their energies
+        """
+        candidates = self.coarse_candidates()
+        for level in range(len(self.trees) - 2, -1, -1):
+            candidates = self.refine(level, candidates)
+            pyramid_logger.info("Kept %d candidates at level %d", len(candidates), level)
+
+        if len(self.trees) > 1:
+            with stage(STAGE_MINIMA):
+                candidates = self.suppress(candidates)
+        ranking = candidates[:self.limit]
+        return ([y for _, y, _ in ranking], [x for _, _, x in ranking]), [energy for energy, _, _ in ranking]
+
+    def coarse_candidates(self):
+        """
+        Finds the local minima of the energy at the coarsest level
+        :return: Sorted list of the best (energy, y, x) tuples
+        """
+        tree, target_array = self.trees[-1], self.arrays[-1]
+        height, width = tree.shape
+        with stage(STAGE_TARGET_DT):
+            root_dt = target_distance_transform(target_array, tree.shape)
+        with stage(STAGE_ENERGY):
+            sum_dt = tree_energy(root_dt, tree, workers=self.workers)[height:-height, width:-width]
+
+        with stage(STAGE_MINIMA):
+            filtered = minimum_filter(sum_dt, size=minimum_window(sum_dt.shape), mode="nearest")
+            ys, xs = nonzero(filtered == sum_dt)
+            energies = sum_dt[ys, xs]
+            order = argsort(energies, kind="stable")
+        candidates = [(energies[i], ys[i], xs[i]) for i in order]
+        if self.threshold is not None:
+            candidates = [candidate for candidate in candidates if candidate[0] <= self.threshold]
+        limit = self.candidates if len(self.trees) > 1 else self.limit
+        return [(float(energy), int(y), int(x)) for energy, y, x in candidates[:limit]]
+
+    def refine(self, level, candidates):
+        """
+        Searches each candidate of the next coarser level again within a region around it
+        :param level: Level to refine the candidates at
+        :param candidates: (energy, y, x) tuples of the next coarser level
+        :return: Sorted list of the best (energy, y, x) tuples at this level
+        """
+        tree, target_array = self.trees[level], self.arrays[level]
+        height, width = target_array.shape
+        refined = dict()
+        for _, y, x in candidates:
+            region = (max(y * FACTOR - self.margin, 0), min((y + 1) * FACTOR + self.margin, height),
+                      max(x * FACTOR - self.margin, 0), min((x + 1) * FACTOR + self.margin, width))
+            energies = region_energy(tree, target_array, region, self.radius, self.workers)
+            with stage(STAGE_MINIMA):
+                best_y, best_x = unravel_index(energies.argmin(), energies.shape)
+            position = (int(best_y) + region[0], int(best_x) + region[2])
+            refined[position] = float(energies[best_y, best_x])
+        return sorted((energy, y, x) for (y, x), energy in refined.items())[:self.candidates]
+
+    def suppress(self, candidates):
+        """
+        Drops every candidate, which lies within the window of the minimum filter of a better one, like
+        Evaluation.find_local_minima does
+        :param candidates: Sorted list of (energy, y, x) tuples at full resolution
+        :return: Sorted list of the remaining (energy, y, x) tuples
+        """
+        reach = minimum_window(self.target.original_array.shape) // 2
+        kept = list()
+        for energy, y, x in candidates:
+            if all(abs(y - other_y) > reach or abs(x - other_x) > reach for _, other_y, other_x in kept):
+                kept.append((energy, y, x))
+        return kept
@@ -0,0 +1,266 @@
+# -*- encoding: utf-8 -*-
+"""
+This module rasterizes SVG paths with numpy only, so queries and targets can be rasterized without PyQt4, e.g. within
+worker processes. Paths are flattened into polygons (curves are split into short line segments, quadratic curves and
+arcs are converted into cubic curves first) and filled by a scanline fill: for every row of pixels the crossings of all
+edges with the line through the centers of the pixels are collected and the pixels between crossings are filled by the
+nonzero winding rule, as SVG does. A pixel is covered, if its center is, which is what an unantialiased QPainter does as
+well. Stroked paths of a target are filled as polygons around their lines, like QSvgRenderer strokes them. Unlike
+QPainter, no outline is drawn around the paths of a query, so the coverage differs by about one pixel along their
+borders.
+"""
+from logging import getLogger
+from re import split
+from xml.etree.ElementTree import iterparse
+
+from numpy import asarray, arange, concatenate, cumsum, add, lexsort, repeat, zeros, identity, minimum, maximum, ceil, \
+    full, nan, where, stack, einsum, cos, sin, pi
+from numpy.linalg import norm
+
+from external.elka_svg import parse_subpaths, parse_transform, float_re, CUBIC
+
+raster_logger = getLogger("Raster")
+
+RASTERIZER_QT = "qt"
+RASTERIZER_NUMPY = "numpy"
+RASTERIZERS = [RASTERIZER_QT, RASTERIZER_NUMPY]
+FILL_NONZERO = "nonzero"
+FILL_EVENODD = "evenodd"
+CURVE_SEGMENT = 0.5
+MAX_CURVE_STEPS = 64
+SVG = "{http://www.w3.org/2000/svg}"
+SEPARATOR = full((1, 2), nan)
+JOIN_CORNERS = 8
+
+
+def flatten_subpath(points, kinds, segment=CURVE_SEGMENT):
+    """
+    Flattens a subpath into a polygon. All curves are evaluated at once, a line is handled as a curve, whose control
+    points are its end, evaluated at t = 1 only.
+    :param points: Numpy-Array of shape (n, 2) holding the start point and the points of the segments
+    :param kinds: Numpy-Array holding LINE or CUBIC for every segment. See external.elka_svg.parse_subpaths
+    :param segment: Maximum length of a segment along the control polygon of a curve
+    :return: Numpy-Array of shape (m, 2) holding the corners of the polygon
+    """
+    kinds = asarray(kinds, dtype=int)
+    if not (kinds == CUBIC).any():
+        return points
+    ends = cumsum(kinds)
+    controls = points[minimum((ends - kinds)[:, None] + arange(4), ends[:, None])]
+    length = (((controls[:, 1:] - controls[:, :-1]) ** 2).sum(axis=2) ** 0.5).sum(axis=1)
+    steps = where(kinds == CUBIC, ceil(length / segment).clip(1, MAX_CURVE_STEPS), 1).astype(int)
+
+    segments = repeat(arange(len(kinds)), steps)
+    t = (arange(steps.sum()) - repeat(cumsum(steps) - steps, steps) + 1) / steps[segments]
+    weights = stack([(1 - t) ** 3, 3 * (1 - t) ** 2 * t, 3 * (1 - t) * t ** 2, t ** 3], axis=1)
+    return concatenate([points[:1], einsum("ij,ijk->ik", weights, controls[segments])])
+
+
+def flatten_path(d, offset=(0, 0), segment=CURVE_SEGMENT):
+    """
+    Flattens SVG path data into polygons. See external.elka_svg.parse_subpaths
+    :param d: SVG path data
+    :param offset: Translation (x, y) added to all points
+    :param segment: Maximum length of a segment of a flattened curve
+    :return: List of Numpy-Arrays of shape (n, 2), one polygon (x, y) per subpath
+    """
+    return [flatten_subpath(points, kinds, segment) + offset for points, kinds, _ in parse_subpaths(d)]
+
+
+def polygon_path(d, dx, dy):
+    """
+    Path builder for external.elka_svg.parse, which creates polygons instead of QPainterPaths
+    :param d: SVG path data
+    :param dx: Translation along x
+    :param dy: Translation along y
+    :return: List of polygons. See flatten_path
+    """
+    return flatten_path(d, (dx, dy))
+
+
+def parse_polygons(infix, source):
+    """
+    Reads the symbol groups of an SVG file the same way as external.elka_svg.parse, but as polygons
+    :param infix: Infix to look for in the titles of the groups
+    :param source: Path of the SVG-file
+    :return: Generator of names and lists of paths, each a list of polygons
+    """
+    from external.elka_svg import parse
+    return parse(infix, source, build=polygon_path)
+
+
+def document_paths(source):
+    """
+    Reads every path of an SVG file as polygons, the way QSvgRenderer draws it: the whole transformation of the groups
+    and of the path itself is applied, fill and stroke are inherited from the groups, a filled path (fill isn't none)
+    becomes its polygons and a stroked path (stroke isn't none) the outline of its stroke. See stroke_polygons
+    :param source: Path of the SVG-file
+    :return: List of paths, each a list of polygons, and the view box (x, y, width, height) of the document
+    """
+    paths = list()
+    view_box = None
+    # Transformation and presentation attributes of every open group
+    states = [(identity(4), {"fill": "black", "stroke": "none", "stroke-width": "1"})]
+    for event, elem in iterparse(source, events=("start", "end")):
+        if elem.tag == SVG + "svg" and event == "start":
+            view_box = document_view_box(elem.attrib)
+        elif elem.tag == SVG + "g":
+            if event == "start":
+                states.append(element_state(elem.attrib, *states[-1]))
+            else:
+                states.pop()
+        elif elem.tag == SVG + "path" and event == "end":
+            matrix, presentation = element_state(elem.attrib, *states[-1])
+            paths.extend(element_polygons(elem.attrib["d"], matrix, presentation))
+            elem.clear()
+    return paths, view_box
+
+
+def element_state(attributes, matrix, presentation):
+    """
+    :param attributes: Attributes of an element
+    :param matrix: 4x4 transformation matrix of the parent. See external.elka_svg.parse_transform
+    :param presentation: Dictionary of fill, stroke and stroke-width of the parent
+    :return: Transformation matrix and presentation attributes of the element, the style taking precedence over the
+             attributes of the same name
+    """
+    if "transform" in attributes:
+        matrix = matrix.dot(parse_transform(attributes["transform"]))
+    style = dict(declaration.split(":", 1) for declaration in attributes.get("style", "").split(";")
+                 if ":" in declaration)
+    style = {key.strip(): value.strip() for key, value in style.items()}
+    presentation = {name: style.get(name, attributes.get(name, value)).strip()
+                    for name, value in presentation.items()}
+    return matrix, presentation
+
+
+def element_polygons(d, matrix, presentation, segment=CURVE_SEGMENT):
+    """
+    Flattens the path data of an element and transforms the polygons of its fill and its stroke
+    :param d: SVG path data
+    :param matrix: 4x4 transformation matrix of the element. See external.elka_svg.parse_transform
+    :param presentation: Dictionary of fill, stroke and stroke-width of the element
+    :param segment: Maximum length of a segment of a flattened curve after the transformation
+    :return: List of paths (fill first, then stroke), each a list of polygons
+    """
+    linear, translation = matrix[:2, :2], matrix[:2, 3]
+    # Curves are flattened before they are transformed, so their segments are shortened by the largest scale
+    scale = max(norm(linear, 2), 1e-9)
+    subpaths = [(flatten_subpath(points, kinds, segment / scale), closed)
+                for points, kinds, closed in parse_subpaths(d)]
+    paths = list()
+    if presentation["fill"] != "none":
+        paths.append([polygon.dot(linear.T) + translation for polygon, _ in subpaths])
+    if presentation["stroke"] != "none":
+        width = float(split(float_re, presentation["stroke-width"])[1])
+        paths.append([polygon.dot(linear.T) + translation for subpath, closed in subpaths
+                      for polygon in stroke_polygons(subpath, closed, width)])
+    return [path for path in paths if path]
+
+
+def stroke_polygons(polyline, closed, width, corners=JOIN_CORNERS):
+    """
+    Creates polygons covering the stroke along a polyline: a rectangle along every segment and a regular polygon
+    around every join, which approximates its miter. The ends of an open line are cut off, as SVG does by default.
+    All polygons are oriented the same way, so the nonzero rule fills their union.
+    :param polyline: Numpy-Array of shape (n, 2) holding the points of the line
+    :param closed: Boolean value which determines, if the last point is connected to the first one
+    :param width: Width of the stroke
+    :param corners: Number of corners of the polygon around every join
+    :return: List of Numpy-Arrays of shape (m, 2), one polygon each
+    """
+    polyline = asarray(polyline, dtype=float)
+    begin, end = polyline[:-1], polyline[1:]
+    if closed and len(polyline) > 2:
+        begin, end = concatenate([begin, polyline[-1:]]), concatenate([end, polyline[:1]])
+    direction = end - begin
+    length = norm(direction, axis=1)
+    begin, end, direction = begin[length > 0], end[length > 0], direction[length > 0] / length[length > 0, None]
+    # The rectangles run clockwise (in a y-up frame), whichever direction their segment has
+    side = stack([-direction[:, 1], direction[:, 0]], axis=1) * width / 2
+    rectangles = stack([begin + side, end + side, end - side, begin - side], axis=1)
+    angles = -arange(corners) * 2 * pi / corners
+    around = stack([cos(angles), sin(angles)], axis=1) * width / 2
+    joins = polyline if closed else polyline[1:-1]
+    return list(rectangles) + [point + around for point in joins]
+
+
+def document_view_box(attributes):
+    """
+    :param attributes: Attributes of the svg-element
+    :return: The view box (x, y, width, height), taken from width and height, if there is no viewBox-attribute
+    """
+    if "viewBox" in attributes:
+        return tuple(float(value) for value in split(r"[ ,]+", attributes["viewBox"].strip()))
+    width, height = (float(split(float_re, attributes[name])[1]) for name in ("width", "height"))
+    return 0.0, 0.0, width, height
+
+
+def bounding_box(paths):
+    """
+    :param paths: List of paths, each a list of polygons
+    :return: Bounding box (x, y, width, height) of all paths
+    """
+    points = concatenate([polygon for path in paths for polygon in path])
+    left, top = points.min(axis=0)
+    right, bottom = points.max(axis=0)
+    return left, top, right - left, bottom - top
+
+
+def polygon_data(paths):
+    """
+    Collects the corners of all polygons of the given paths, so they can be used as key for a QueryCache
+    :param paths: List of paths, each a list of polygons
+    :return: Numpy-Array holding x and y of every corner, each polygon followed by a row of NaN
+    """
+    rows = [row for path in paths for polygon in path for row in (asarray(polygon, dtype=float), SEPARATOR)]
+    return concatenate(rows) if rows else zeros((0, 2))
+
+
+def fill_paths(paths, shape, origin=(0, 0), scale=(1, 1), rule=FILL_NONZERO):
+    """
+    Fills paths into a boolean array by a scanline fill. Every polygon is closed implicitly. The fill rule is applied
+    to each path on its own, so overlapping paths never cancel each other out.
+    :param paths: List of paths, each a list of Numpy-Arrays of shape (n, 2) holding the corners (x, y) of a polygon
+    :param shape: Shape (height, width) of the array
+    :param origin: Point (x, y) mapped to the top left corner of the array
+    :param scale: Multipliers (x, y) mapping the paths onto the array
+    :param rule: FILL_NONZERO (default, as SVG fills paths) or FILL_EVENODD (as QPainterPaths are filled)
+    :return: Boolean Numpy-Array, which is True for every pixel, whose center is inside a path
+    """
+    height, width = shape
+    covered = zeros((height, width + 1), dtype=int)
+    polygons = [((asarray(polygon, dtype=float) - origin) * scale, index)
+                for index, path in enumerate(paths) for polygon in path if len(polygon) > 1]
+    if not polygons or height == 0 or width == 0:
+        return covered[:, :width] > 0
+
+    begin = concatenate([polygon for polygon, _ in polygons])
+    end = concatenate([concatenate([polygon[1:], polygon[:1]]) for polygon, _ in polygons])
+    path = concatenate([repeat(index, len(polygon)) for polygon, index in polygons])
+    sloped = begin[:, 1] != end[:, 1]
+    begin, end, path = begin[sloped], end[sloped], path[sloped]
+    direction = (end[:, 1] > begin[:, 1]).astype(int) * 2 - 1
+
+    # Rows, whose center line (row + 0.5) lies within [top, bottom) of an edge
+    top = ceil(minimum(begin[:, 1], end[:, 1]) - 0.5).clip(0, height).astype(int)
+    bottom = ceil(maximum(begin[:, 1], end[:, 1]) - 0.5).clip(0, height).astype(int)
+    counts = (bottom - top).clip(0)
+    edges = repeat(arange(len(begin)), counts)
+    rows = repeat(top, counts) + arange(counts.sum()) - repeat(cumsum(counts) - counts, counts)
+
+    b, e = begin[edges], end[edges]
+    xs = b[:, 0] + (rows + 0.5 - b[:, 1]) * (e[:, 0] - b[:, 0]) / (e[:, 1] - b[:, 1])
+    order = lexsort((xs, path[edges], rows))
+    rows, path, xs, winding = rows[order], path[edges][order], xs[order], cumsum(direction[edges][order])
+
+    # A closed polygon crosses every row as often downwards as upwards, so the winding number returns to zero after
+    # the last crossing of a path within a row. The spans between consecutive crossings of the same path and row are
+    # filled depending on their winding number.
+    inside = winding[:-1] != 0 if rule == FILL_NONZERO else winding[:-1] % 2 == 1
+    inside &= (rows[:-1] == rows[1:]) & (path[:-1] == path[1:])
+    first = ceil(xs[:-1][inside] - 0.5).clip(0, width).astype(int)
+    last = ceil(xs[1:][inside] - 0.5).clip(0, width).astype(int)
+    add.at(covered, (rows[:-1][inside], first), 1)
+    add.at(covered, (rows[:-1][inside], last), -1)
+    return cumsum(covered, axis=1)[:, :width] > 0
@@ -0,0 +1,136 @@
+# -*- encoding: utf-8 -*-
+"""
+This module backs large arrays by numpy.memmap-files within a scratch directory. The files are stored in the .npy
+format, so they can be inspected later on by numpy.load(path, mmap_mode="r") without recomputing anything. Every
+Scratch keeps its arrays in a subdirectory of its own, so several runs can share one scratch directory.
+"""
+from logging import getLogger
+from os import makedirs, remove, listdir
+from os.path import join, isfile
+from tempfile import mkdtemp
+from threading import Lock
+
+from numpy import load, nonzero, concatenate
+from numpy.lib.format import open_memmap
+
+scratch_logger = getLogger("Scratch")
+
+SUFFIX = ".npy"
+RUN_PREFIX = "run_"
+ROWS_PER_CHUNK = 1024
+
+
+def mapped_nonzero(filtered, energy):
+    """
+    Same as nonzero(filtered == energy), but compares a chunk of rows at a time, so no boolean array of the whole
+    (memory-mapped) energy is needed
+    :param filtered: Minimum filtered energy
+    :param energy: Energy
+    :return: y, x arrays of the cells, where both are equal
+    """
+    ys, xs = list(), list()
+    for top in range(0, energy.shape[0], ROWS_PER_CHUNK):
+        y, x = nonzero(filtered[top:top + ROWS_PER_CHUNK] == energy[top:top + ROWS_PER_CHUNK])
+        ys.append(y + top)
+        xs.append(x)
+    return concatenate(ys), concatenate(xs)
+
+
+class Scratch(object):
+    """
+    This class creates, opens and removes memory-mapped arrays within a unique subdirectory of a directory.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: Directory to create the subdirectory holding the memory-mapped arrays in (created if missing)
+        """
+        makedirs(directory, exist_ok=True)
+        self.directory = mkdtemp(prefix=RUN_PREFIX, dir=directory)
+        self.reserved = set()
+        self.lock = Lock()
+        scratch_logger.info("Storing memory-mapped arrays in [%s]", self.directory)
+
+    def path(self, name):
+        """
+        :param name: Name of the array
+        :return: Path of the file backing the array
+        """
+        return join(self.directory, name + SUFFIX)
+
+    def unique(self, name):
+        """
+        Reserves a name, which no other caller of this Scratch got before, so several queries can share it
+        :param name: Wanted name of the array
+        :return: name itself, if it is still free, name followed by a number otherwise
+        """
+        with self.lock:
+            unique, number = name, 1
+            while unique in self.reserved:
+                number += 1
+                unique = "{}_{}".format(name, number)
+            self.reserved.add(unique)
+        return unique
+
+    def empty(self, name, shape, dtype=float):
+        """
+        Creates a new memory-mapped array, replacing any array of the same name
+        :param name: Name of the array
+        :param shape: Shape of the array
+        :param dtype: Data-type of the array
+        :return: Writable numpy.memmap
+        """
+        scratch_logger.debug("Mapping [%s] with shape %s", name, shape)
+        return open_memmap(self.path(name), mode="w+", dtype=dtype, shape=tuple(shape))
+
+    def store(self, name, values):
+        """
+        Copies an array into a new memory-mapped array
+        :param name: Name of the array
+        :param values: Numpy-Array to copy
+        :return: Writable numpy.memmap holding the values
+        """
+        stored = self.empty(name, values.shape, values.dtype)
+        stored[...] = values
+        return stored
+
+    def load(self, name, mode="r"):
+        """
+        Opens a memory-mapped array stored before
+        :param name: Name of the array
+        :param mode: Mode to open the file with (default: read-only)
+        :return: numpy.memmap
+        """
+        return load(self.path(name), mmap_mode=mode)
+
+    def remove(self, name):
+        """
+        Removes the file backing an array. Arrays still mapped stay valid until they are released.
+        :param name: Name of the array
+        """
+        if isfile(self.path(name)):
+            remove(self.path(name))
+
+    def names(self):
+        """
+        :return: Sorted list of the names of all arrays within the scratch directory
+        """
+        return sorted(name[:-len(SUFFIX)] for name in listdir(self.directory) if name.endswith(SUFFIX))
+
+    def allocator(self, prefix):
+        """
+        Creates a function, which maps a new array with a unique name starting with prefix on every call. The function
+        may be called by several threads at the same time.
+        :param prefix: Prefix of the names of the arrays
+        :return: Function (shape, dtype), returning a writable numpy.memmap, and the list of names mapped by it
+        """
+        mapped = list()
+        lock = Lock()
+
+        def allocate(shape, dtype):
+            with lock:
+                name = "{}_{}".format(prefix, len(mapped))
+                mapped.append(name)
+            return self.empty(name, shape, dtype)
+
+        return allocate, mapped
@@ -1,11 +1,33 @@
 # -*- encoding: utf-8 -*-
 
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 from logging import getLogger, INFO, DEBUG, basicConfig
 
+from pss.minima import WINDOW_QUERY
+from pss.profiling import STAGES
+from pss.raster import RASTERIZERS, RASTERIZER_QT
+
 settings_logger = getLogger('Settings')
 
 
+def window_size(value):
+    """
+    Converts the value of --window
+    :param value: A positive number of pixels or WINDOW_QUERY
+    :return: The size as int or WINDOW_QUERY
+    :raise ArgumentTypeError: If the value is neither
+    """
+    if value == WINDOW_QUERY:
+        return value
+    try:
+        size = int(value)
+    except ValueError:
+        size = 0
+    if size <= 0:
+        raise ArgumentTypeError("expected a positive number of pixels or '{}', got '{}'".format(WINDOW_QUERY, value))
+    return size
+
+
 class Settings(object):  # pragma: no cover
     """
     This class sets the initial configuration of PartStructuredSpotting, such as activating verbose mode.
@@ -51,6 +73,140 @@ class Settings(object):  # pragma: no cover
                                      help="Path to the query file", type=str)
         self.arg_parser.add_argument("-t", "--target",
                                      help="Path to the target file", type=str)
+        self.arg_parser.add_argument("-e", "--engine",
+                                     help="Energy engine: shift or deformable (default=shift)", type=str,
+                                     choices=["shift", "deformable"], default="shift")
+        self.arg_parser.add_argument("-d", "--deformation",
+                                     help="Weights (y, x) of the deformation cost of the deformable engine " +
+                                          "(default=1.0 1.0)", type=float, nargs=2, default=[1.0, 1.0])
+        self.arg_parser.add_argument("--window",
+                                     help="Window to find local minima with: a size in pixels or 'query' for the " +
+                                          "bounding box of the query (default: a tenth of the shorter side of the " +
+                                          "target)", type=window_size)
+        self.arg_parser.add_argument("--tile-size",
+                                     help="Searches the target tile by tile with tiles of this size instead of " +
+                                          "all at once (shift engine only, no plots are shown in this mode)", type=int)
+        self.arg_parser.add_argument("--stream",
+                                     help="Logs the local minima of every tile as soon as the tile is searched " +
+                                          "(requires --tile-size)", action="store_true")
+        self.arg_parser.add_argument("--pyramid",
+                                     help="Searches the target coarse to fine, downsampling it this many times " +
+                                          "(shift engine only, no plots are shown in this mode)", type=int)
+        self.arg_parser.add_argument("--candidates",
+                                     help="Number of candidates kept at every level of the pyramid (default=50)",
+                                     type=int, default=50)
+        self.arg_parser.add_argument("--threshold",
+                                     help="Energy at the coarsest level of the pyramid, candidates above it are " +
+                                          "dropped (default: no threshold)", type=float)
+        self.arg_parser.add_argument("--rasterizer",
+                                     help="Rasterizes SVG queries and targets by Qt or by the numpy scanline fill, " +
+                                          "which doesn't need Qt (default=qt)", type=str, choices=RASTERIZERS,
+                                     default=RASTERIZER_QT)
+        self.arg_parser.add_argument("--placement",
+                                     help="Places the nodes of SVG queries along the skeleton (graph or greedy) or " +
+                                          "along the vector strokes without rasterizing them (vector, default=graph)",
+                                     type=str, choices=["graph", "greedy", "vector"], default="graph")
+        self.arg_parser.add_argument("--corners",
+                                     help="Finds the corners and junctions of query skeletons by corner_harris or by " +
+                                          "their crossing numbers (crossing, default=harris)", type=str,
+                                     choices=["harris", "crossing"], default="harris")
+        self.arg_parser.add_argument("-c", "--cache",
+                                     help="Directory to cache built up queries in (default: no caching)", type=str)
+        self.arg_parser.add_argument("--cache-size",
+                                     help="Maximum size of the query cache in MB (default=256)", type=int, default=256)
+        self.arg_parser.add_argument("--batch",
+                                     help="Searches every symbol of the query SVG (ignoring --index) and every " +
+                                          "file given by --queries within the target, sharing its distance " +
+                                          "transform (no plots are shown in this mode)", action="store_true")
+        self.arg_parser.add_argument("--queries",
+                                     help="Additional query files searched in batch mode", type=str, nargs="+",
+                                     default=[])
+        self.arg_parser.add_argument("-w", "--workers",
+                                     help="Number of worker threads evaluating subtrees of the query (or queries " +
+                                          "in batch mode) at the same time (default=1)", type=int, default=1)
+        self.arg_parser.add_argument("--trace",
+                                     help="Writes the wall time, CPU time and peak memory of every stage as JSON " +
+                                          "to this file", type=str)
+        self.arg_parser.add_argument("--profile",
+                                     help="Runs this stage under cProfile", type=str, choices=STAGES)
+        self.arg_parser.add_argument("--profile-output",
+                                     help="File to dump the cProfile statistics of --profile to (default=pss.prof)",
+                                     type=str, default="pss.prof")
+        self.arg_parser.add_argument("--scratch",
+                                     help="Directory to keep the target, distance transforms and energy in as " +
+                                          "memory-mapped .npy-files, within a new subdirectory per run " +
+                                          "(default: everything is kept in memory)", type=str)
+
+
+class HeadlessSettings(Settings):  # pragma: no cover
+    """
+    This class sets the configuration of the headless scan, which writes machine-readable results only.
+    """
+
+    @staticmethod
+    def setup_arg_parser():
+        """
+        Sets up the ArgumentParser
+        :return: The ArgumentParser to work with
+        """
+        return ArgumentParser(
+            prog='PartStructuredSpotting-Headless',
+            add_help=True
+        )
+
+    def add_arguments(self):
+        """
+        Adds the arguments supported by the headless scan.
+        """
+        self.arg_parser.add_argument("-v", "--verbose",
+                                     help="Activates verbose mode (DEBUG-logging)", action="store_true")
+        self.arg_parser.add_argument("-s", "--scale",
+                                     help="Determines the Scale of the Query and Target (default=1)", type=float,
+                                     default=1)
+        self.arg_parser.add_argument("-l", "--limit",
+                                     help="This gives the top n results per target (default=10)", type=int, default=10)
+        self.arg_parser.add_argument("-i", "--index",
+                                     help="This uses the i-th symbol of the query set (default=0)", type=int,
+                                     default=0)
+        self.arg_parser.add_argument("-q", "--query",
+                                     help="Path to the query file", type=str, required=True)
+        self.arg_parser.add_argument("-t", "--targets",
+                                     help="Target files, directories of targets or manifests (text files listing " +
+                                          "one target per line)", type=str, nargs="+", required=True)
+        self.arg_parser.add_argument("-o", "--output",
+                                     help="File to write the results to, as CSV if it ends with .csv and as JSON " +
+                                          "Lines otherwise (default: JSON Lines to stdout)", type=str)
+        self.arg_parser.add_argument("-e", "--engine",
+                                     help="Energy engine: shift or deformable (default=shift)", type=str,
+                                     choices=["shift", "deformable"], default="shift")
+        self.arg_parser.add_argument("-d", "--deformation",
+                                     help="Weights (y, x) of the deformation cost of the deformable engine " +
+                                          "(default=1.0 1.0)", type=float, nargs=2, default=[1.0, 1.0])
+        self.arg_parser.add_argument("-w", "--workers",
+                                     help="Number of processes scanning targets at the same time (default=1)",
+                                     type=int, default=1)
+        self.arg_parser.add_argument("--rasterizer",
+                                     help="Rasterizes SVG queries and targets by Qt or by the numpy scanline fill, " +
+                                          "which doesn't need Qt (default=qt)", type=str, choices=RASTERIZERS,
+                                     default=RASTERIZER_QT)
+        self.arg_parser.add_argument("--placement",
+                                     help="Places the nodes of SVG queries along the skeleton (graph or greedy) or " +
+                                          "along the vector strokes without rasterizing them (vector, default=graph)",
+                                     type=str, choices=["graph", "greedy", "vector"], default="graph")
+        self.arg_parser.add_argument("--corners",
+                                     help="Finds the corners and junctions of query skeletons by corner_harris or by " +
+                                          "their crossing numbers (crossing, default=harris)", type=str,
+                                     choices=["harris", "crossing"], default="harris")
+        self.arg_parser.add_argument("-c", "--cache",
+                                     help="Directory to cache built up queries in (default: no caching)", type=str)
+        self.arg_parser.add_argument("--trace",
+                                     help="Writes the wall time, CPU time and peak memory of every stage as JSON " +
+                                          "to this file (stages run by worker processes are not traced)", type=str)
+        self.arg_parser.add_argument("--profile",
+                                     help="Runs this stage under cProfile", type=str, choices=STAGES)
+        self.arg_parser.add_argument("--profile-output",
+                                     help="File to dump the cProfile statistics of --profile to (default=pss.prof)",
+                                     type=str, default="pss.prof")
 
 
 class ArgumentListener(object):  # pragma: no cover
@@ -3,9 +3,8 @@
 from logging import getLogger
 from os.path import isfile
 
-from PyQt4.QtSvg import QSvgRenderer
-
-from external.elka_svg import parse
+from external.elka_svg import index, parse_group, qt_path
+from pss.raster import document_paths, polygon_path, RASTERIZER_QT, RASTERIZER_NUMPY
 
 svg_logger = getLogger("SvgHandler")
 
@@ -25,41 +24,89 @@ class TargetSvg(object):
     """
     This class opens and manages a given svg file as the target image.
     """
-    def __init__(self, path):
+    def __init__(self, path, rasterizer=RASTERIZER_QT):
         """
         :param path: Path to the SVG-file (required)
+        :param rasterizer: RASTERIZER_QT to render the file by a QSvgRenderer (default) or RASTERIZER_NUMPY to read
+                           its paths as polygons, which are filled without Qt. See pss.raster
         :raise FileNotFoundError: This is raised, when an invalid svg file is passed.
         """
         svg_logger.info("Target SVG-Handler started")
         handle_file_not_existing(path)
-        self.renderer = QSvgRenderer(path)
+        self.rasterizer = rasterizer
+        if rasterizer == RASTERIZER_NUMPY:
+            self.paths, self.view_box = document_paths(path)
+        else:
+            from PyQt4.QtSvg import QSvgRenderer
+            self.renderer = QSvgRenderer(path)
+
+
+class SymbolGroups(object):
+    """
+    This class is the sequence of the symbol groups of an SVG-file. A symbol group is parsed, when it is accessed for
+    the first time, so only the requested ones are ever built.
+    """
+    def __init__(self, infix, path, root, groups, build):
+        """
+        :param infix: Infix the groups were found by
+        :param path: Path to the SVG-file
+        :param root: Root element (tag, attributes) of the SVG-file
+        :param groups: List of (name, start, end, translation, namespaces) of the groups. See external.elka_svg.index
+        :param build: Creates a path out of path data. See external.elka_svg.parse
+        """
+        self.infix = infix
+        self.path = path
+        self.root = root
+        self.groups = groups
+        self.build = build
+        self.parsed = dict()
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = range(len(self))[index]
+        if index not in self.parsed:
+            svg_logger.info("Parsing symbol group [%s]", self.groups[index][0])
+            self.parsed[index] = parse_group(self.infix, self.path, self.root, self.groups[index], self.build)
+        return self.parsed[index]
 
 
 class QuerySvg(object):
     """
     This class opens and manages as the query image.
     """
-    def __init__(self, path, infix=''):
+    def __init__(self, path, infix='', rasterizer=RASTERIZER_QT):
         """
         :param path: Path to the SVG-file (required)
         :param infix: Infix to look for in svg-file (default: "")
+        :param rasterizer: RASTERIZER_QT to read the paths as QPainterPaths (default) or RASTERIZER_NUMPY to read them
+                           as polygons, which are filled without Qt. See pss.raster
         :raise FileNotFoundError: This is raised, when an invalid svg file is passed.
         """
         svg_logger.info("Query SVG-Handler started")
         handle_file_not_existing(path)
-        self.names, self.svg_symbol_groups = self.load_svg(infix, path)
+        self.rasterizer = rasterizer
+        self.names, self.svg_symbol_groups = self.load_svg(infix, path, rasterizer)
 
     @staticmethod
-    def load_svg(infix, path):
+    def load_svg(infix, path, rasterizer=RASTERIZER_QT):
         """
-        Opens an SVG-file
+        Opens an SVG-file. Only the names and positions of the SymbolGroups are read right away, their paths are
+        parsed when they are accessed.
         :param infix: This infix is used by the external library elka_svg.py
         to check for specific groups within the svg.
         :param path: Path, where the SVG file is located
-        :return: names and lists of QPainterPaths of the SymbolGroups read from the SVG
+        :param rasterizer: RASTERIZER_QT or RASTERIZER_NUMPY
+        :return: names and SymbolGroups holding the lists of QPainterPaths (or lists of polygons) read from the SVG
         """
         svg_logger.info("Opening SVG-File at [%s]", path)
-        names, symbol_groups = zip(*parse(infix, path))
+        root, groups = index(infix, path)
+        names = tuple(group[0] for group in groups)
+        symbol_groups = SymbolGroups(infix, path, root, groups,
+                                     polygon_path if rasterizer == RASTERIZER_NUMPY else qt_path)
         svg_logger.info("SVG-File successfully loaded. (%d names, %d symbol-groups)\n",
                         len(names), len(symbol_groups))
         return names, symbol_groups
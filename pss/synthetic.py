@@ -0,0 +1,257 @@
+# -*- encoding: utf-8 -*-
+"""
+This module generates synthetic cuneiform-like data, since the real queries and tablets can't be shipped. A sign is a
+group of wedges, each wedge a closed path of a triangular head and a tapering tail. Queries are written as SVG
+symbol groups, which QuerySvg reads, and tablets as SVG (for TargetSvg) or as binary arrays and PNG images with the
+signs scattered over them at a given density, plus random wedges as noise.
+
+Run it by: python -m pss.synthetic resources/
+to write test_query.svg, test_query.png, test_target.svg and test_target.png, which the tests expect.
+"""
+from logging import getLogger
+from math import cos, sin, pi
+from os.path import join
+from struct import pack
+from sys import argv
+from zlib import compress, crc32
+
+from numpy import array, argmin, nonzero, zeros, uint8
+from numpy.random import RandomState
+
+from pss.tree import minimum_spanning_tree, CompactTree
+
+synthetic_logger = getLogger("Synthetic")
+
+SIGN_SIZE = 48
+WEDGE_LENGTH = (14, 30)
+WEDGE_WIDTH = (6, 11)
+QUERY_NAME = "Query"
+TABLET_NAME = "Tablet"
+SVG_HEADER = '<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" ' \
+             'viewBox="0 0 {width} {height}">\n'
+
+
+def wedge_polygon(y, x, length, width, angle):
+    """
+    Creates the outline of a wedge, whose head starts at (y, x) and whose tail points into the direction of angle
+    :param y: y of the middle of the head
+    :param x: x of the middle of the head
+    :param length: Length of the wedge
+    :param width: Width of the head
+    :param angle: Direction of the tail in radians
+    :return: Float Numpy-Array of shape (5, 2) holding the corners (x, y) of the wedge
+    """
+    head = length / 3.0
+    tail = width / 6.0
+    outline = array([[0, -width / 2.0], [0, width / 2.0], [head, tail], [length, 0], [head, -tail]])
+    rotation = array([[cos(angle), -sin(angle)], [sin(angle), cos(angle)]])
+    return outline.dot(rotation.T) + [x, y]
+
+
+def random_wedge(random, top, left, size):
+    """
+    :param random: RandomState to draw from
+    :param top: Top of the box the wedge starts in
+    :param left: Left of the box the wedge starts in
+    :param size: Height and width of the box
+    :return: Parameters (y, x, length, width, angle) of a random wedge, which starts within the box
+    """
+    length = random.uniform(*WEDGE_LENGTH)
+    return (top + random.uniform(0, size), left + random.uniform(0, size), length, random.uniform(*WEDGE_WIDTH),
+            random.choice([0, pi / 2, pi / 4, -pi / 4]) + random.uniform(-0.1, 0.1))
+
+
+def random_sign(random, wedges, size=SIGN_SIZE):
+    """
+    Creates a sign of wedges, whose heads lie within a box of size x size around the origin
+    :param random: RandomState to draw from
+    :param wedges: Number of wedges
+    :param size: Height and width of the box
+    :return: List of wedge parameters
+    """
+    return [random_wedge(random, 0, 0, size) for _ in range(wedges)]
+
+
+def path_data(polygon):
+    """
+    :param polygon: Corners (x, y) of a polygon
+    :return: SVG path data of the closed polygon
+    """
+    points = " L ".join("{:.2f} {:.2f}".format(x, y) for x, y in polygon)
+    return "M {} z".format(points)
+
+
+def shift(sign, dy, dx):
+    """
+    :param sign: List of wedge parameters
+    :param dy: Shift along y
+    :param dx: Shift along x
+    :return: List of the parameters of the shifted wedges
+    """
+    return [(y + dy, x + dx) + tuple(rest) for y, x, *rest in sign]
+
+
+def group_svg(group_id, name, sign):
+    """
+    :param group_id: Id of the group
+    :param name: Title of the group, which QuerySvg uses as name
+    :param sign: List of wedge parameters
+    :return: SVG group holding one path per wedge
+    """
+    paths = "".join('    <path d="{}"/>\n'.format(path_data(wedge_polygon(*wedge))) for wedge in sign)
+    return '  <g id="{}">\n    <title>{}</title>\n{}  </g>\n'.format(group_id, name, paths)
+
+
+def query_svg(signs, names=None):
+    """
+    Creates an SVG file of symbol groups
+    :param signs: List of signs (lists of wedge parameters)
+    :param names: Optional names of the signs (default: QUERY_NAME and its index)
+    :return: Content of the SVG file
+    """
+    names = names or ["{}{}".format(QUERY_NAME, index) if index else QUERY_NAME for index in range(len(signs))]
+    groups = [group_svg("sign{}".format(index), name, shift(sign, SIGN_SIZE, SIGN_SIZE))
+              for index, (name, sign) in enumerate(zip(names, signs))]
+    size = 3 * SIGN_SIZE
+    return SVG_HEADER.format(width=size, height=size) + "".join(groups) + "</svg>\n"
+
+
+def tablet(random, shape, signs, density=1.0, noise=0.1):
+    """
+    Scatters signs and random wedges over a tablet
+    :param random: RandomState to draw from
+    :param shape: Shape (height, width) of the tablet
+    :param signs: List of signs to place
+    :param density: Number of signs per SIGN_SIZE * SIGN_SIZE * 16 pixels
+    :param noise: Number of random wedges per wedge of the placed signs
+    :return: List of the wedge parameters of the tablet and list of the placements (sign index, y, x)
+    """
+    height, width = shape
+    count = int(round(density * height * width / (16.0 * SIGN_SIZE ** 2)))
+    wedges, placements = list(), list()
+    for _ in range(count):
+        index = random.randint(len(signs))
+        y, x = random.uniform(0, max(height - 2 * SIGN_SIZE, 1)), random.uniform(0, max(width - 2 * SIGN_SIZE, 1))
+        wedges.extend(shift(signs[index], y, x))
+        placements.append((index, y, x))
+    for _ in range(int(round(noise * len(wedges)))):
+        wedges.append(random_wedge(random, random.uniform(0, height), random.uniform(0, width), 0))
+    synthetic_logger.info("Placed %d signs and %d wedges on tablet of shape %s", count, len(wedges), shape)
+    return wedges, placements
+
+
+def tablet_svg(wedges, shape):
+    """
+    :param wedges: List of wedge parameters
+    :param shape: Shape (height, width) of the tablet
+    :return: Content of the SVG file of the tablet
+    """
+    return SVG_HEADER.format(width=shape[1], height=shape[0]) + group_svg("tablet", TABLET_NAME, wedges) + "</svg>\n"
+
+
+def rasterize(wedges, shape):
+    """
+    Fills the wedges into a binary array
+    :param wedges: List of wedge parameters
+    :param shape: Shape (height, width) of the array
+    :return: Boolean Numpy-Array, which is True within the wedges
+    """
+    from skimage.draw import polygon
+
+    strokes = zeros(shape, dtype=bool)
+    for wedge in wedges:
+        corners = wedge_polygon(*wedge)
+        rows, columns = polygon(corners[:, 1], corners[:, 0], shape)
+        strokes[rows, columns] = True
+    return strokes
+
+
+def write_png(path, strokes):
+    """
+    Writes a binary array as 8-bit grayscale PNG with black strokes on white background
+    :param path: Path of the PNG-file
+    :param strokes: Boolean Numpy-Array, which is True on strokes
+    """
+    pixels = (~strokes).astype(uint8) * 255
+    rows = b"".join(b"\x00" + row.tobytes() for row in pixels)
+
+    def chunk(kind, data):
+        return pack(">I", len(data)) + kind + data + pack(">I", crc32(kind + data) & 0xffffffff)
+
+    header = pack(">IIBBBBB", strokes.shape[1], strokes.shape[0], 8, 0, 0, 0, 0)
+    with open(path, "wb") as handle:
+        handle.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", compress(rows)) +
+                     chunk(b"IEND", b""))
+
+
+def write_test_resources(directory, seed=0, shape=(600, 800)):
+    """
+    Writes the files the tests expect within the resources-folder
+    :param directory: Directory to write the files to
+    :param seed: Seed of the RandomState
+    :param shape: Shape (height, width) of the target
+    """
+    random = RandomState(seed)
+    query = random_sign(random, 16)
+    wedges, _ = tablet(random, shape, [query])
+
+    with open(join(directory, "test_query.svg"), "w") as handle:
+        handle.write(query_svg([query]))
+    write_png(join(directory, "test_query.png"), rasterize(shift(query, SIGN_SIZE, SIGN_SIZE),
+                                                           (3 * SIGN_SIZE, 3 * SIGN_SIZE)))
+    with open(join(directory, "test_target.svg"), "w") as handle:
+        handle.write(tablet_svg(wedges, shape))
+    write_png(join(directory, "test_target.png"), rasterize(wedges, shape))
+
+
+def sign_tree(sign, spacing=4):
+    """
+    Builds the tree of a sign without rendering it by Qt: nodes are put on the strokes every spacing pixels and
+    connected by their minimum spanning tree, starting at the node closest to the center of mass
+    :param sign: List of wedge parameters
+    :param spacing: Distance between neighboring nodes along y and x
+    :return: CompactTree of the sign
+    """
+    size = 3 * SIGN_SIZE
+    strokes = rasterize(shift(sign, SIGN_SIZE, SIGN_SIZE), (size, size))
+    ys, xs = nonzero(strokes)
+    top, left = ys.min(), xs.min()
+    grid = strokes[top::spacing, left::spacing]
+    positions = array(nonzero(grid)).T * spacing
+    shape = (ys.max() - top + 1, xs.max() - left + 1)
+
+    root = int(argmin(((positions - positions.mean(axis=0)) ** 2).sum(axis=1)))
+    parents = [-1] * len(positions)
+    children = [list() for _ in positions]
+    for child, parent in minimum_spanning_tree(positions, root):
+        parents[child] = parent
+        children[parent].append(child)
+    order, open_list = list(), [root]
+    while open_list:
+        index = open_list.pop()
+        order.append(index)
+        open_list.extend(reversed(children[index]))
+    offsets = [[0, 0] if parent < 0 else positions[index] - positions[parent] for index, parent in enumerate(parents)]
+    return CompactTree(positions, offsets, parents, order, shape)
+
+
+class SyntheticTarget(object):
+    """
+    This class holds a synthetic tablet like a Target-object does, without rendering it by Qt.
+    """
+
+    def __init__(self, shape, signs, density=1.0, noise=0.1, seed=0):
+        """
+        :param shape: Shape (height, width) of the tablet
+        :param signs: List of signs to place
+        :param density: Number of signs per SIGN_SIZE * SIGN_SIZE * 16 pixels
+        :param noise: Number of random wedges per wedge of the placed signs
+        :param seed: Seed of the RandomState
+        """
+        self.wedges, self.placements = tablet(RandomState(seed), shape, signs, density, noise)
+        self.original_array = ~rasterize(self.wedges, shape)
+        self.inverted_array = ~self.original_array
+
+
+if __name__ == "__main__":
+    write_test_resources(argv[1] if len(argv) > 1 else ".")
@@ -0,0 +1,208 @@
+# -*- encoding: utf-8 -*-
+"""
+This module searches a query within a target tile by tile, so peak memory depends on the size of a tile instead of
+the size of the whole tablet. Each tile gets a halo around its core:
+ - the window of the minimum filter, so local minima are decided the same way as on the whole energy map,
+ - the shape of the query, since the energy of a cell depends on the distance transform up to one query
+   width and height away,
+ - a radius for the distance transform of the target, which is doubled until every distance within the tile is
+   known to be exact. Within blank areas it stops at MAX_DISTANCE_RADIUS, larger distances are clamped to it, so
+   a blank tile doesn't need the distance transform of the whole tablet.
+The local minima of all tiles are merged into one global ranking, which matches the one of the untiled run, as long as
+no node of a minimum is further away from its closest stroke than MAX_DISTANCE_RADIUS.
+"""
+from heapq import merge
+from itertools import islice
+from logging import getLogger
+
+from numpy import nonzero
+from scipy.ndimage import minimum_filter
+
+from pss.detection import detect
+from pss.energy import exact_distance_transform, tree_energy
+from pss.minima import minimum_window
+from pss.profiling import stage, STAGE_TARGET_DT, STAGE_ENERGY, STAGE_MINIMA, STAGE_CROPS
+from pss.tree import compact
+
+tiling_logger = getLogger("Tiling")
+
+TILE_SIZE = 512
+DISTANCE_RADIUS = 32
+MAX_DISTANCE_RADIUS = 16 * DISTANCE_RADIUS
+
+
+def tiles(shape, tile_size):
+    """
+    Splits an array into tiles
+    :param shape: Shape (height, width) of the array
+    :param tile_size: Height and width of a tile
+    :return: Generator of the windows (top, bottom, left, right) of all tiles in row-major order
+    """
+    height, width = shape
+    for top in range(0, height, tile_size):
+        for left in range(0, width, tile_size):
+            yield top, min(top + tile_size, height), left, min(left + tile_size, width)
+
+
+class TiledSearch(object):
+    """
+    This class finds the local minima of the tree energy of a query within a target, one tile at a time.
+    """
+
+    def __init__(self, query, target, limit, tile_size=TILE_SIZE, window=None, radius=DISTANCE_RADIUS,
+                 search=True, workers=1, max_radius=MAX_DISTANCE_RADIUS):
+        """
+        :param query: Query-object or its CompactTree
+        :param target: Target-object, which holds the ndarray-array of the target image
+        :param limit: Number of minima to find
+        :param tile_size: Height and width of the core of a tile
+        :param window: Size of the window to find local minima with (default: the one of Evaluation)
+        :param radius: Initial radius of the halo for the distance transform of the target
+        :param search: Boolean value which determines, if all tiles are searched right away. Otherwise the tiles
+                       are searched while iterating over detections.
+        :param workers: Number of threads evaluating subtrees of the query at the same time
+        :param max_radius: Maximal radius of the halo, larger distances are clamped to it (None: no limit)
+        """
+        self.tree = compact(query)
+        self.target = target
+        self.limit = limit
+        self.tile_size = tile_size
+        self.radius = radius
+        self.workers = workers
+        self.max_radius = max_radius
+        self.shape = target.original_array.shape
+        self.padding = self.tree.shape
+        self.window = minimum_window(self.shape) if window is None else window
+
+        if search:
+            self.minimum, self.energies = self.find_local_minima()
+            with stage(STAGE_CROPS):
+                self.found_symbols = self.extract_found_symbols()
+
+    def detections(self, crop=False):
+        """
+        Searches one tile after another and yields the local minima of each tile as soon as it is done, so the
+        first results are known long before the whole target is searched. The detections of a tile are sorted by
+        their energy. Merging the detections of all tiles by their energy gives the ranking of find_local_minima.
+        :param crop: Boolean value which determines, if the target within the bounding box is added
+        :return: Generator of Detections
+        """
+        for core in self.tiles():
+            for energy, y, x in self.tile_minima(core):
+                yield detect(self.tree, self.target.original_array, y, x, energy, crop)
+
+    def tiles(self):
+        """
+        :return: Generator of the cores (top, bottom, left, right) of all tiles, in coordinates of the energy map
+        """
+        return tiles(self.shape, self.tile_size)
+
+    def find_local_minima(self):
+        """
+        Finds the local minima of all tiles and merges them into one ranking
+        :return: y, x lists of the top n minima (n is set by self.limit) and their energies
+        """
+        ranking = list(islice(merge(*(self.tile_minima(core) for core in self.tiles())), self.limit))
+        ys = [y for _, y, _ in ranking]
+        xs = [x for _, _, x in ranking]
+        energies = [energy for energy, _, _ in ranking]
+        return (ys, xs), energies
+
+    def tile_minima(self, core):
+        """
+        Finds the local minima within the core of a tile
+        :param core: Core (top, bottom, left, right) of the tile in coordinates of the energy map
+        :return: Sorted list of the best (energy, y, x) tuples of this tile (at most self.limit)
+        """
+        region = self.filter_region(core)
+        sum_dt = self.tile_energy(region)
+
+        with stage(STAGE_MINIMA):
+            filtered = minimum_filter(sum_dt, size=self.window, mode="nearest")
+            top, bottom, left, right = core
+            inner = (slice(top - region[0], bottom - region[0]), slice(left - region[2], right - region[2]))
+            ys, xs = nonzero(filtered[inner] == sum_dt[inner])
+            energies = sum_dt[inner][ys, xs]
+
+            minima = sorted(zip(energies.tolist(), (ys + top).tolist(), (xs + left).tolist()))[:self.limit]
+        tiling_logger.info("Tile %s has %d local minima", core, len(minima))
+        return minima
+
+    def filter_region(self, core):
+        """
+        Extends the core of a tile by the window of the minimum filter
+        :param core: Core (top, bottom, left, right) of the tile in coordinates of the energy map
+        :return: Region (top, bottom, left, right) of the energy map needed to filter the core
+        """
+        before, after = self.window // 2, self.window - 1 - self.window // 2
+        top, bottom, left, right = core
+        return (max(top - before, 0), min(bottom + after, self.shape[0]),
+                max(left - before, 0), min(right + after, self.shape[1]))
+
+    def tile_energy(self, region):
+        """
+        Calculates the energy of the tree for a region of the energy map. See region_energy
+        :param region: Region (top, bottom, left, right) in coordinates of the energy map
+        :return: Numpy-Array holding the energy of the region
+        """
+        return region_energy(self.tree, self.target.original_array, region, self.radius, self.workers,
+                             self.max_radius)
+
+    def tile_distance_transform(self, window):
+        """
+        Calculates the distance transform of the target for a window of the padded canvas.
+        See pss.energy.exact_distance_transform
+        :param window: Window (top, bottom, left, right) in coordinates of the padded canvas
+        :return: Numpy-Array holding the distance transform of the window
+        """
+        return exact_distance_transform(self.target.original_array, self.padding, window, self.radius,
+                                        self.max_radius)
+
+    def extract_found_symbols(self):
+        """
+        Extracts the symbols at the local minima of the target tablet
+        :return: List of symbols represented as boolean arrays and their respective energies
+        """
+        return extract_symbols(self.tree, self.target.original_array, self.minimum, self.energies)
+
+
+def region_energy(tree, target_array, region, radius=DISTANCE_RADIUS, workers=1, max_radius=None):
+    """
+    Calculates the energy of the tree for a region of the energy map only
+    :param tree: CompactTree of the query
+    :param target_array: Numpy-Array of the target image
+    :param region: Region (top, bottom, left, right) in coordinates of the energy map
+    :param radius: Initial radius of the halo for the distance transform of the target
+    :param workers: Number of threads evaluating subtrees at the same time
+    :param max_radius: Optional maximal radius of the halo. See pss.energy.exact_distance_transform
+    :return: Numpy-Array holding the energy of the region
+    """
+    top, bottom, left, right = region
+    height, width = tree.shape
+    # In coordinates of the padded canvas the region starts at (top + height, left + width), the energy of
+    # its cells depends on the distance transform up to one query height and width around it
+    window = (top, bottom + 2 * height, left, right + 2 * width)
+    with stage(STAGE_TARGET_DT):
+        root_dt = exact_distance_transform(target_array, tree.shape, window, radius, max_radius)
+    with stage(STAGE_ENERGY):
+        return tree_energy(root_dt, tree, workers=workers)[height:height + bottom - top, width:width + right - left]
+
+
+def extract_symbols(tree, target_array, minimum, energies):
+    """
+    Extracts the symbols at the given minima of the target tablet
+    :param tree: CompactTree of the query
+    :param target_array: Numpy-Array of the target image
+    :param minimum: y, x lists of the minima
+    :param energies: Energies of the minima
+    :return: List of symbols represented as boolean arrays and their respective energies
+    """
+    height, width = tree.shape
+    root_position = tree.root_position
+    found_symbols = list()
+    for y, x, energy in zip(minimum[0], minimum[1], energies):
+        begin_bbox_y = y - root_position[0]
+        begin_bbox_x = x - root_position[1]
+        box = target_array[begin_bbox_y:begin_bbox_y + height, begin_bbox_x:begin_bbox_x + width]
+        found_symbols.append((box, energy))
+    return found_symbols
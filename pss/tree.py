@@ -0,0 +1,143 @@
+# -*- encoding: utf-8 -*-
+"""
+This module builds up the parent-child tree of a query. Instead of searching the closest pair of tree-node and
+remaining node from scratch for every added node, Prim's algorithm keeps the closest tree-node of every remaining
+node and only updates it with the node added last.
+Once built, the tree can be stored as a CompactTree, which holds the relations in a few contiguous arrays.
+"""
+from logging import getLogger
+
+from numpy import asarray, full, inf, zeros, argmin, where, sqrt, int32
+
+tree_logger = getLogger("Tree")
+
+
+def minimum_spanning_tree(positions, root):
+    """
+    Creates the relations of a minimum spanning tree over the given positions starting from the root.
+    Ties are broken the same way as in Query.find_closest_node: the remaining node coming first in positions wins and
+    is attached to the node added to the tree first. Two nodes sharing a position are never connected.
+    :param positions: Numpy-Array of shape (n, 2) holding the positions of all nodes
+    :param root: Index of the root node within positions
+    :return: List of (child, parent) index tuples in the order the children were added to the tree
+    """
+    positions = asarray(positions, dtype=int).reshape(-1, 2)
+    count = len(positions)
+    tree_logger.info("Building minimum spanning tree over %d nodes", count)
+
+    in_tree = zeros(count, dtype=bool)
+    closest_distance = full(count, inf)
+    closest_parent = full(count, -1, dtype=int)
+    relations = list()
+
+    source = root
+    for _ in range(count - 1):
+        in_tree[source] = True
+        update_closest(positions, source, in_tree, closest_distance, closest_parent)
+
+        remaining = where(in_tree, inf, closest_distance)
+        child = int(argmin(remaining))
+        if remaining[child] == inf:  # pragma: no cover
+            break
+
+        relations.append((child, int(closest_parent[child])))
+        source = child
+    return relations
+
+
+def update_closest(positions, source, in_tree, closest_distance, closest_parent):
+    """
+    Updates the closest tree-node of all remaining nodes with the node added to the tree last.
+    Only strictly closer nodes replace the current parent, so earlier tree-nodes win ties.
+    :param positions: Numpy-Array of shape (n, 2) holding the positions of all nodes
+    :param source: Index of the node added to the tree last
+    :param in_tree: Boolean Numpy-Array marking all nodes already within the tree
+    :param closest_distance: Distance of each node to its closest tree-node (updated in place)
+    :param closest_parent: Index of the closest tree-node for each node (updated in place)
+    """
+    delta = positions - positions[source]
+    squared = (delta * delta).sum(axis=1)
+    distance = sqrt(squared.astype(float))
+    closer = (distance < closest_distance) & ~in_tree & (squared != 0)
+    closest_distance[closer] = distance[closer]
+    closest_parent[closer] = source
+
+
+class CompactTree(object):
+    """
+    This class represents a query tree by contiguous int32-arrays instead of Node objects.
+    positions and offsets are arrays of shape (n, 2), parents holds the index of each node's parent (-1 for the root)
+    and order lists all indices in pre-order, so every parent comes before its children and siblings keep the order
+    in which they were added to their parent. Since it only consists of a few small arrays, it can be pickled and
+    passed between processes cheaply.
+    """
+
+    def __init__(self, positions, offsets, parents, order, shape):
+        """
+        :param positions: Positions of all nodes within the query image
+        :param offsets: Offsets of all nodes relative to their parent ([0, 0] for the root)
+        :param parents: Index of the parent of every node (-1 for the root)
+        :param order: Indices of all nodes in pre-order, starting with the root
+        :param shape: Shape (height, width) of the query image
+        """
+        self.positions = asarray(positions, dtype=int32).reshape(-1, 2)
+        self.offsets = asarray(offsets, dtype=int32).reshape(-1, 2)
+        self.parents = asarray(parents, dtype=int32)
+        self.order = asarray(order, dtype=int32)
+        self.shape = tuple(int(axis) for axis in shape)
+
+    @classmethod
+    def from_node(cls, root_node, shape):
+        """
+        Creates a CompactTree by walking the tree of Node objects starting at the root node
+        :param root_node: Root-Node of the tree
+        :param shape: Shape (height, width) of the query image
+        :return: CompactTree holding the same relations and offsets as the Node objects
+        """
+        positions, offsets, parents = list(), list(), list()
+        open_list = [(root_node, -1)]
+        while open_list:
+            node, parent = open_list.pop()
+            index = len(positions)
+            positions.append(node.position)
+            offsets.append([0, 0] if node.offset is None else node.offset)
+            parents.append(parent)
+            open_list.extend((child, index) for child in reversed(node.children))
+        return cls(positions, offsets, parents, range(len(positions)), shape)
+
+    def __len__(self):
+        return len(self.parents)
+
+    @property
+    def root(self):
+        """
+        :return: Index of the root node
+        """
+        return int(self.order[0])
+
+    @property
+    def root_position(self):
+        """
+        :return: Position of the root node within the query image
+        """
+        return self.positions[self.root]
+
+    def children(self):
+        """
+        :return: List holding the list of child-indices for every node, siblings in the order they were added
+        """
+        children = [list() for _ in range(len(self))]
+        for index in self.order[1:]:
+            children[self.parents[index]].append(int(index))
+        return children
+
+
+def compact(query):
+    """
+    Returns the CompactTree of a query
+    :param query: Query or CompactTree
+    :return: The CompactTree itself or the one created from the Query
+    """
+    if isinstance(query, CompactTree):
+        return query
+    return query.create_compact_tree()
@@ -0,0 +1,107 @@
+# -*- encoding: utf-8 -*-
+"""
+This module places the nodes of a query along the vector strokes of its SVG paths instead of along the skeleton of the
+rasterized paths, so neither rasterization nor skeletonization is needed and the nodes don't depend on the scale.
+Every path is seen as one stroke running between its two most distant vertices. Strokes are cut where they intersect
+other paths, which gives a graph of stroke ends and junctions. Its edges are sampled every DISTANCE pixels.
+"""
+from logging import getLogger
+
+from numpy import array, asarray, ceil, clip, linspace, unique, sort, argsort, vstack
+
+vector_logger = getLogger("Vector")
+
+MERGE_DISTANCE = 1.0
+
+
+def path_strokes(paths):
+    """
+    Reads the strokes and their intersections from QPainterPaths. See external.elka_svg
+    :param paths: List of QPainterPaths of a symbol group
+    :return: Float Numpy-Array of shape (n, 2, 2) holding both ends (x, y) of the n strokes and list of intersections
+             (i, j, (x, y)) between stroke i and stroke j with i < j
+    """
+    from external.elka_svg import most_distant_vertices, path_intersections
+
+    ends = array([most_distant_vertices(path) for path in paths], dtype=float).reshape(-1, 2, 2)
+    intersections = [(i, j, (rect.x() + rect.width() * 0.5, rect.y() + rect.height() * 0.5))
+                     for i, j, rect in path_intersections(paths)]
+    return ends, intersections
+
+
+def merge_vertices(points, tolerance=MERGE_DISTANCE):
+    """
+    Merges points closer than the tolerance into the closest point coming first. See external.elka_svg
+    :param points: Numpy-Array of shape (n, 2)
+    :param tolerance: Distance, below which points are merged
+    :return: Numpy-Array of the merged points and Numpy-Array holding the index of the merged point for every point
+    """
+    from external.elka_svg import merge_vertices as merge
+    return merge(points, tolerance)
+
+
+def stroke_graph(ends, intersections, tolerance=MERGE_DISTANCE):
+    """
+    Creates the graph of the strokes. Each stroke is cut at its intersections, which are sorted along the stroke.
+    :param ends: Numpy-Array of shape (n, 2, 2) holding both ends of the n strokes
+    :param intersections: List of intersections (i, j, point) between stroke i and stroke j
+    :param tolerance: Distance, below which vertices are merged
+    :return: Numpy-Array of shape (m, 2) holding the vertices and list of edges (a, b) between them
+    """
+    ends = asarray(ends, dtype=float).reshape(-1, 2, 2)
+    points = [ends.reshape(-1, 2)] + [asarray(point, dtype=float).reshape(1, 2) for _, _, point in intersections]
+    vertices, remap = merge_vertices(vstack(points), tolerance)
+
+    strokes = [[remap[2 * index], remap[2 * index + 1]] for index in range(len(ends))]
+    for index, (i, j, _) in enumerate(intersections):
+        strokes[i].append(remap[2 * len(ends) + index])
+        strokes[j].append(remap[2 * len(ends) + index])
+
+    edges = set()
+    for (begin, end), stroke in zip(ends, strokes):
+        stroke = unique(stroke)
+        along = (vertices[stroke] - begin).dot(end - begin)
+        stroke = stroke[argsort(along, kind="stable")]
+        edges.update((int(a), int(b)) if a < b else (int(b), int(a)) for a, b in zip(stroke[:-1], stroke[1:]))
+    return vertices, sorted(edges)
+
+
+def sample_edges(vertices, edges, distance):
+    """
+    Places points on every vertex and evenly along every edge, about distance apart
+    :param vertices: Numpy-Array of shape (m, 2) holding the vertices
+    :param edges: List of edges (a, b)
+    :param distance: Distance between neighboring points along an edge
+    :return: Float Numpy-Array of the points, starting with the vertices
+    """
+    points = [asarray(vertices, dtype=float).reshape(-1, 2)]
+    for a, b in edges:
+        begin, end = vertices[a], vertices[b]
+        steps = int(ceil(((end - begin) ** 2).sum() ** 0.5 / distance - 0.5))
+        if steps > 1:
+            points.append(begin + linspace(0, 1, steps + 1)[1:-1, None] * (end - begin))
+    return vstack(points)
+
+
+def place_nodes(paths, origin, scale, distance, shape):
+    """
+    Places the nodes of a query along the strokes of its paths
+    :param paths: List of QPainterPaths of a symbol group
+    :param origin: Top left corner (x, y) of the bounding box of the paths
+    :param scale: Multiplier for the scale
+    :param distance: Distance between neighboring nodes in pixels
+    :param shape: Shape (height, width) of the query, the nodes are clipped to
+    :return: Int Numpy-Array of shape (n, 2) holding the unique positions (y, x) of the nodes, the first ones being
+             the stroke ends and junctions, and the number of those
+    """
+    ends, intersections = path_strokes(paths)
+    ends = (ends - origin)[..., ::-1] * scale
+    intersections = [(i, j, (asarray(point) - origin)[::-1] * scale) for i, j, point in intersections]
+
+    vertices, edges = stroke_graph(ends, intersections)
+    vector_logger.info("Stroke graph has %d vertices and %d edges", len(vertices), len(edges))
+    points = clip(sample_edges(vertices, edges, distance).round().astype(int), 0, asarray(shape) - 1)
+
+    _, first = unique(points, axis=0, return_index=True)
+    first = sort(first)
+    return points[first], int((first < len(vertices)).sum())
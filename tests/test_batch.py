@@ -0,0 +1,60 @@
+# -*- encoding: utf-8 -*-
+from unittest import TestCase
+
+from numpy import array
+
+from pss.energy import target_distance_transform
+from pss.tree import CompactTree
+from tests.test_tiling import ArrayTarget, build_target
+from tests.test_tree import build_compact_tree
+
+
+def build_small_tree():
+    """
+    Builds a tree of two nodes, which is smaller than the one of build_compact_tree
+    """
+    return CompactTree(array([[1, 1], [1, 4]]), array([[0, 0], [0, 3]]), [-1, 0], [0, 1], (3, 6))
+
+
+class BatchSearchTestCase(TestCase):
+    def setUp(self):
+        from pss.batch import BatchSearch
+
+        self.trees = [build_compact_tree(), build_small_tree()]
+        self.target = ArrayTarget(build_target())
+        self.search = BatchSearch(self.trees, self.target, 5, workers=2)
+
+    def test_padding_fits_every_query(self):
+        self.assertEqual(self.search.padding, (10, 10))
+
+    def test_shared_distance_transform_is_read_only(self):
+        self.assertFalse(self.search.root_dt.flags.writeable)
+
+    def test_shared_distance_transform_matches_own_distance_transform(self):
+        for tree in self.trees:
+            expected = target_distance_transform(self.target.original_array, tree.shape)
+            self.assertTrue((self.search.shared_distance_transform(tree.shape) == expected).all())
+
+    def test_results_match_single_searches(self):
+        from pss.eval import Evaluation
+        from pss.model import DistanceTransform
+
+        for tree, minimum, found_symbols in zip(self.trees, self.search.minima, self.search.found_symbols):
+            evaluation = Evaluation(tree, self.target, DistanceTransform(tree, self.target), 5)
+            self.assertEqual([list(values) for values in minimum], [list(values) for values in evaluation.minimum])
+            self.assertEqual([energy for _, energy in found_symbols],
+                             [energy for _, energy in evaluation.found_symbols])
+
+    def test_search_keeps_minima_and_symbols_only(self):
+        minimum, found_symbols = self.search.search(self.trees[0])
+        self.assertEqual([list(values) for values in minimum], [list(values) for values in self.search.minima[0]])
+        self.assertEqual(len(found_symbols), len(self.search.found_symbols[0]))
+
+    def test_window_is_passed_on(self):
+        from pss.batch import BatchSearch
+        from pss.eval import Evaluation
+        from pss.model import DistanceTransform
+
+        search = BatchSearch(self.trees, self.target, 5, window=3)
+        evaluation = Evaluation(self.trees[0], self.target, DistanceTransform(self.trees[0], self.target), 5, window=3)
+        self.assertEqual([list(values) for values in search.minima[0]], [list(values) for values in evaluation.minimum])
@@ -0,0 +1,103 @@
+# -*- encoding: utf-8 -*-
+from os import utime, listdir
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from numpy import arange, array, zeros
+from numpy.random import RandomState
+
+from pss.cache import QueryCache, pack_bool_array, unpack_bool_array, stat_entry
+
+
+class PackTestCase(TestCase):
+    def test_bool_array_survives_packing(self):
+        values = RandomState(0).rand(7, 13) > 0.5
+        packed, shape = pack_bool_array(values)
+        self.assertLess(packed.nbytes, values.nbytes)
+        self.assertTrue((unpack_bool_array(packed, shape) == values).all())
+
+
+class QueryCacheTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.cache = QueryCache(self.directory)
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_key_is_deterministic(self):
+        self.assertEqual(QueryCache.key("svg", arange(5), 1, 3), QueryCache.key("svg", arange(5), 1, 3))
+
+    def test_key_depends_on_every_part(self):
+        key = QueryCache.key("svg", arange(5), 1, 3)
+        self.assertNotEqual(key, QueryCache.key("bin", arange(5), 1, 3))
+        self.assertNotEqual(key, QueryCache.key("svg", arange(6), 1, 3))
+        self.assertNotEqual(key, QueryCache.key("svg", arange(5), 2, 3))
+        self.assertNotEqual(key, QueryCache.key("svg", arange(5).astype(float), 1, 3))
+
+    def test_missing_key_returns_none(self):
+        self.assertIsNone(self.cache.load(QueryCache.key("missing")))
+
+    def test_stored_arrays_can_be_loaded(self):
+        key = QueryCache.key("query")
+        self.cache.store(key, {"positions": array([[1, 2], [3, 4]]), "skeleton": zeros(3, dtype=bool)})
+        arrays = self.cache.load(key)
+        self.assertEqual(arrays["positions"].tolist(), [[1, 2], [3, 4]])
+        self.assertEqual(arrays["skeleton"].dtype, bool)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        values = {"values": RandomState(1).rand(1000)}
+        keys = [QueryCache.key(i) for i in range(3)]
+        for age, key in enumerate(keys):
+            self.cache.store(key, values)
+            utime(self.cache.path(key), (age, age))
+
+        self.cache.max_bytes = 2.5 * len(open(self.cache.path(keys[0]), "rb").read())
+        utime(self.cache.path(keys[0]), (10, 10))
+        self.cache.evict()
+
+        self.assertIsNotNone(self.cache.load(keys[0]))
+        self.assertIsNone(self.cache.load(keys[1]))
+        self.assertIsNotNone(self.cache.load(keys[2]))
+
+    def test_stored_entry_is_kept_even_if_too_large(self):
+        self.cache.max_bytes = 1
+        key = QueryCache.key("query")
+        self.cache.store(key, {"values": arange(100)})
+        self.assertIsNotNone(self.cache.load(key))
+        self.assertEqual(listdir(self.directory), [key + ".npz"])
+
+    def test_entries_removed_meanwhile_are_skipped(self):
+        missing = join(self.directory, "missing.npz")
+        self.assertIsNone(stat_entry(missing))
+
+        class RacingCache(QueryCache):
+            def entries(self):
+                return [(missing, 10)] + super(RacingCache, self).entries()
+
+        cache = RacingCache(self.directory, max_bytes=1)
+        key = QueryCache.key("query")
+        cache.store(key, {"values": arange(100)})
+        self.assertIsNotNone(cache.load(key))
+
+    def test_corrupt_entries_are_removed(self):
+        key = QueryCache.key("query")
+        for corrupt in [lambda data: data[:20], lambda data: b"PK" + bytes(len(data))]:
+            self.cache.store(key, {"values": arange(100)})
+            with open(self.cache.path(key), "rb") as handle:
+                data = handle.read()
+            with open(self.cache.path(key), "wb") as handle:
+                handle.write(corrupt(data))
+            self.assertIsNone(self.cache.load(key))
+            self.assertEqual(listdir(self.directory), [])
+
+    def test_entry_evicted_while_loading_is_a_miss(self):
+        import pss.cache
+        isfile = pss.cache.isfile
+        pss.cache.isfile = lambda path: True
+        try:
+            self.assertIsNone(self.cache.load(QueryCache.key("evicted")))
+        finally:
+            pss.cache.isfile = isfile
@@ -0,0 +1,257 @@
+# -*- encoding: utf-8 -*-
+from unittest import TestCase
+
+from numpy import zeros, ones, arange, full, argwhere
+from numpy.random import RandomState
+
+from pss.energy import shift_slices, add_shifted, tree_energy, min_convolution, deformable_tree_energy, \
+    ENGINE_SHIFT, energy as energy_of, ScorePool, split_tree, candidate_energy, windowed_candidate_energy
+from pss.tree import CompactTree
+from tests.test_tree import build_compact_tree
+
+
+class ShiftTestCase(TestCase):
+    def test_positive_offset_shifts_towards_the_end(self):
+        destination, source = shift_slices((5, 6), (1, 2))
+        self.assertEqual(destination, (slice(1, 5), slice(2, 6)))
+        self.assertEqual(source, (slice(0, 4), slice(0, 4)))
+
+    def test_negative_offset_shifts_towards_the_beginning(self):
+        destination, source = shift_slices((5, 6), (-1, 0))
+        self.assertEqual(destination, (slice(0, 4), slice(0, 6)))
+        self.assertEqual(source, (slice(1, 5), slice(0, 6)))
+
+    def test_cells_without_source_are_left_untouched(self):
+        score = zeros((3, 3))
+        add_shifted(score, ones((3, 3)), (1, -1))
+        self.assertEqual(score.tolist(), [[0, 0, 0], [1, 1, 0], [1, 1, 0]])
+
+
+class TreeEnergyTestCase(TestCase):
+    def test_single_node_returns_copy_of_distance_transform(self):
+        tree = build_compact_tree()
+        tree.parents[1:] = -1
+        tree.order = tree.order[:1]
+        root_dt = arange(100.0).reshape(10, 10)
+
+        energy = tree_energy(root_dt, tree)
+        self.assertEqual(energy.tolist(), root_dt.tolist())
+        self.assertIsNot(energy, root_dt)
+
+    def test_energy_of_constant_distance_transform(self):
+        energy = tree_energy(ones((10, 10)), build_compact_tree())
+        leaf = 1.0
+        child = (1.0 + leaf) / 1.5
+        root = ((1.0 + child) / 1.5 + leaf) / 1.5
+        self.assertAlmostEqual(energy[5, 5], root)
+
+    def test_children_are_read_at_cell_minus_offset(self):
+        root_dt = zeros((10, 10))
+        root_dt[5, 2] = 3.0
+        energy = tree_energy(root_dt, build_compact_tree())
+        self.assertAlmostEqual(energy[5, 5], 3.0 / 1.5 / 1.5 / 1.5)
+
+
+class DeformableTreeEnergyTestCase(TestCase):
+    def test_min_convolution_spreads_minimum_quadratically(self):
+        score = full((5, 5), 100.0)
+        score[2, 2] = 0
+        convolved = min_convolution(score, (1.0, 2.0))
+        self.assertEqual(convolved[2, 2], 0)
+        self.assertEqual(convolved[0, 2], 4)
+        self.assertEqual(convolved[2, 0], 8)
+        self.assertEqual(convolved[0, 0], 12)
+
+    def test_stiff_deformation_sums_shifted_distance_transforms(self):
+        root_dt = arange(100.0).reshape(10, 10)
+        energy = deformable_tree_energy(root_dt, build_compact_tree(), (1e6, 1e6))
+        expected = root_dt[5, 5] + root_dt[5, 2] + root_dt[2, 2] + root_dt[8, 5]
+        self.assertEqual(energy[5, 5], expected)
+
+    def test_deformed_parts_are_found_at_a_cost(self):
+        root_dt = full((10, 10), 50.0)
+        root_dt[5, 5] = 0
+        root_dt[5, 3] = 0
+        root_dt[2, 2] = 0
+        root_dt[9, 5] = 0
+        energy = deformable_tree_energy(root_dt, build_compact_tree(), (1.0, 1.0))
+        self.assertEqual(energy[5, 5], 1 + 1 + 1)
+
+    def test_unknown_engine_raises_value_error(self):
+        self.assertRaises(ValueError, energy_of, ones((3, 3)), build_compact_tree(), "unknown")
+
+    def test_shift_engine_is_tree_energy(self):
+        root_dt = arange(100.0).reshape(10, 10)
+        tree = build_compact_tree()
+        self.assertTrue((energy_of(root_dt, tree, ENGINE_SHIFT) == tree_energy(root_dt, tree)).all())
+
+
+def build_chain(length):
+    """
+    Builds a tree, in which every node has exactly one child
+    """
+    positions = [[0, i] for i in range(length)]
+    offsets = [[0, 0]] + [[0, 1]] * (length - 1)
+    return CompactTree(positions, offsets, range(-1, length - 1), range(length), (1, length))
+
+
+class ScorePoolTestCase(TestCase):
+    def test_released_buffers_are_reused_and_reset(self):
+        pool = ScorePool(ones((2, 2)))
+        score = pool.acquire()
+        score += 5
+        pool.release(score)
+        self.assertIs(pool.acquire(), score)
+        self.assertEqual(score.tolist(), [[1, 1], [1, 1]])
+        self.assertEqual(pool.allocated, 1)
+
+    def test_chain_needs_two_buffers_only(self):
+        pool = ScorePool(ones((4, 300)))
+        tree_energy(pool.root_dt, build_chain(200), pool)
+        self.assertEqual(pool.allocated, 2)
+
+    def test_deep_chain_does_not_hit_recursion_limit(self):
+        energy = tree_energy(zeros((1, 3)), build_chain(5000))
+        self.assertEqual(energy.tolist(), [[0, 0, 0]])
+
+    def test_bounded_evaluation_matches_node_by_node_sum(self):
+        root_dt = RandomState(3).rand(10, 10)
+        pool = ScorePool(root_dt)
+        energy = tree_energy(root_dt, build_compact_tree(), pool)
+
+        leaf_3, leaf_2 = root_dt.copy(), root_dt.copy()
+        child_1 = root_dt.copy()
+        add_shifted(child_1, leaf_3, (3, 0))
+        child_1 /= 1.5
+        root = root_dt.copy()
+        add_shifted(root, child_1, (0, 3))
+        root /= 1.5
+        add_shifted(root, leaf_2, (-3, 0))
+        root /= 1.5
+        self.assertTrue((energy == root).all())
+        self.assertEqual(pool.allocated, 2)
+
+
+def build_random_tree(seed, count):
+    """
+    Builds a tree, in which every node is attached to a random earlier node
+    """
+    random = RandomState(seed)
+    parents = [-1] + [random.randint(0, index) for index in range(1, count)]
+    children = [[] for _ in range(count)]
+    for index in range(1, count):
+        children[parents[index]].append(index)
+    order, stack = list(), [0]
+    while stack:
+        index = stack.pop()
+        order.append(index)
+        stack.extend(reversed(children[index]))
+    positions = random.randint(0, 12, size=(count, 2))
+    offsets = [[0, 0]] + [positions[index] - positions[parents[index]] for index in range(1, count)]
+    return CompactTree(positions, offsets, parents, order, (12, 12))
+
+
+class ParallelEvaluationTestCase(TestCase):
+    def setUp(self):
+        self.root_dt = RandomState(3).rand(40, 50)
+
+    def test_split_tree_covers_every_node_once(self):
+        tree = build_random_tree(0, 30)
+        children = tree.children()
+        frontier = split_tree(tree, children, 6)
+        self.assertGreaterEqual(len(frontier), 6)
+        covered = list()
+        for root in frontier:
+            stack = [root]
+            while stack:
+                index = stack.pop()
+                covered.append(index)
+                stack.extend(children[index])
+        self.assertLessEqual(len(covered), len(tree))
+        self.assertEqual(len(covered), len(set(covered)))
+
+    def test_split_tree_stops_at_leaves(self):
+        self.assertEqual(split_tree(build_chain(3), build_chain(3).children(), 8), [2])
+
+    def test_parallel_energy_is_bit_identical(self):
+        for seed in range(3):
+            tree = build_random_tree(seed, 40)
+            expected = tree_energy(self.root_dt, tree)
+            for workers in (2, 3, 8):
+                self.assertTrue((tree_energy(self.root_dt, tree, workers=workers) == expected).all())
+
+    def test_parallel_deformable_energy_is_bit_identical(self):
+        tree = build_random_tree(1, 15)
+        expected = deformable_tree_energy(self.root_dt, tree)
+        self.assertTrue((deformable_tree_energy(self.root_dt, tree, workers=4) == expected).all())
+
+
+class CandidateEnergyTestCase(TestCase):
+    def setUp(self):
+        self.root_dt = RandomState(4).rand(30, 35)
+
+    def test_energies_match_tree_energy_everywhere(self):
+        for seed in range(3):
+            tree = build_random_tree(seed, 25)
+            expected = tree_energy(self.root_dt, tree)
+            candidates = argwhere(ones(self.root_dt.shape))
+            self.assertTrue((candidate_energy(self.root_dt, tree, candidates) == expected.ravel()).all())
+
+    def test_energies_of_few_candidates(self):
+        tree = build_compact_tree()
+        expected = tree_energy(self.root_dt, tree)
+        candidates = [[0, 0], [12, 30], [29, 34]]
+        self.assertEqual(candidate_energy(self.root_dt, tree, candidates).tolist(),
+                         [expected[0, 0], expected[12, 30], expected[29, 34]])
+
+    def test_candidates_outside_of_canvas_raise(self):
+        with self.assertRaises(ValueError):
+            candidate_energy(self.root_dt, build_compact_tree(), [[30, 0]])
+
+    def test_windowed_energies_match_whole_canvas(self):
+        from pss.energy import target_distance_transform
+        from tests.test_tiling import build_target
+
+        target = build_target()
+        for seed in range(3):
+            tree = build_random_tree(seed, 25)
+            root_dt = target_distance_transform(target, tree.shape)
+            height, width = root_dt.shape
+            for candidates in ([[0, 0], [tree.shape[0] + 40, tree.shape[1] + 60], [height - 1, width - 1]],
+                               [[tree.shape[0] + 30, tree.shape[1] + 50], [tree.shape[0] + 34, tree.shape[1] + 47]]):
+                self.assertEqual(windowed_candidate_energy(target, tree, candidates, 1).tolist(),
+                                 candidate_energy(root_dt, tree, candidates).tolist())
+        with self.assertRaises(ValueError):
+            windowed_candidate_energy(target, tree, [[-1, 0]], 1)
+
+    def test_close_candidates_share_one_window(self):
+        import pss.energy
+        from tests.test_tiling import build_target
+
+        calls = list()
+        exact = pss.energy.exact_distance_transform
+
+        def counting(target_array, padding, window, radius):
+            calls.append(window)
+            return exact(target_array, padding, window, radius)
+
+        tree = build_compact_tree()
+        candidates = [[tree.shape[0] + y, tree.shape[1] + x] for y, x in [(30, 50), (32, 55), (35, 51)]]
+        pss.energy.exact_distance_transform = counting
+        try:
+            windowed_candidate_energy(build_target(), tree, candidates, 1)
+            self.assertEqual(len(calls), 1)
+            windowed_candidate_energy(build_target(), tree, [[0, 0], [90, 120]], 1)
+            self.assertEqual(len(calls), 1)
+        finally:
+            pss.energy.exact_distance_transform = exact
+
+    def test_candidate_energy_matches_distance_transform(self):
+        from pss.model import CandidateEnergy, DistanceTransform
+        from tests.test_tiling import ArrayTarget, build_target
+
+        target = ArrayTarget(build_target())
+        sum_dt = DistanceTransform(build_compact_tree(), target).sum_dt
+        ys, xs = [0, 40, 89], [0, 60, 119]
+        energies = CandidateEnergy(build_compact_tree(), target, (ys, xs)).energies
+        self.assertEqual(energies.tolist(), sum_dt[ys, xs].tolist())
@@ -0,0 +1,54 @@
+# -*- encoding: utf-8 -*-
+from unittest import TestCase
+
+from numpy import zeros, full, array, arange, allclose
+from numpy.random import RandomState
+
+from external.generalized_distance_transform import of_column, of_image, of_rows, of_image_vectorized
+
+
+class GeneralizedDistanceTransformTestCase(TestCase):
+    def test_column_of_single_zero_is_squared_distance(self):
+        column = full(7, 100.0)
+        column[2] = 0
+        self.assertEqual(of_column(column).tolist(), [4, 1, 0, 1, 4, 9, 16])
+
+    def test_rows_match_column_reference(self):
+        data = RandomState(0).rand(20, 31) * 50
+        expected = [of_column(row) for row in data]
+        self.assertTrue((of_rows(data) == expected).all())
+
+    def test_rows_of_integer_image_match_column_reference(self):
+        data = RandomState(1).randint(0, 2, (9, 12)) * 2**15
+        expected = [of_column(row.astype(float)) for row in data]
+        self.assertTrue((of_rows(data) == expected).all())
+
+    def test_image_matches_reference(self):
+        image = RandomState(2).rand(25, 18) * 100
+        image[image < 60] = 0
+        self.assertTrue((of_image_vectorized(image) == of_image(image)).all())
+
+    def test_image_of_single_zero_is_squared_euclidean_distance(self):
+        image = full((5, 6), 2.0**15)
+        image[1, 2] = 0
+        transformed = of_image_vectorized(image)
+        self.assertEqual(transformed[4, 5], 3 ** 2 + 3 ** 2)
+        self.assertEqual(transformed[1, 2], 0)
+
+    def test_single_row_and_column(self):
+        self.assertEqual(of_rows(zeros((3, 1))).tolist(), [[0], [0], [0]])
+        self.assertEqual(of_image_vectorized(full((1, 4), 9.0)).tolist(), [[9, 9, 9, 9]])
+
+    def test_non_positive_weight_is_rejected(self):
+        for weight in [0, -1.0]:
+            with self.assertRaises(ValueError):
+                of_rows(zeros((2, 3)), weight)
+
+    def test_tiny_weights_match_brute_force(self):
+        data = array([[32768, 0, 32768, 32768, 0, 32768], [5, 1e6, 1e6, 1e6, 1e6, 3]])
+        q = arange(data.shape[1])
+        for weight in [1e-6, 1e-3, 1.0]:
+            expected = (weight * (q[:, None] - q[None, :]) ** 2 + data[:, None, :]).min(axis=2)
+            self.assertTrue(allclose(of_rows(data, weight), expected))
+        column = array([32768.0, 0, 32768, 32768, 0, 32768]) * 1e9
+        self.assertEqual(of_column(column).tolist(), [1, 0, 1, 1, 0, 1])
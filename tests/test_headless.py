@@ -0,0 +1,82 @@
+# -*- encoding: utf-8 -*-
+from csv import DictReader
+from io import StringIO
+from json import loads
+from os import mkdir
+from os.path import join
+from shutil import rmtree
+from subprocess import check_output
+from sys import executable
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from pss.detection import Detection
+from tests.test_tiling import ArrayTarget, build_target
+from tests.test_tree import build_compact_tree
+
+
+def build_rows():
+    from pss.headless import records
+
+    detections = [Detection((5, 6), (0, 10, 1, 11), 1.5), Detection((50, 60), (45, 55, 55, 65), 2.5)]
+    return records(detections, "tablet.png", "query")
+
+
+class TargetPathsTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_directories_and_manifests_are_expanded(self):
+        from pss.headless import target_paths
+
+        tablets = join(self.directory, "tablets")
+        mkdir(tablets)
+        for name in ("b.png", "a.svg", "notes.md"):
+            open(join(tablets, name), "w").close()
+        manifest = join(self.directory, "manifest.txt")
+        with open(manifest, "w") as handle:
+            handle.write("c.png\n\nsub/d.svg\n")
+
+        self.assertEqual(target_paths([tablets, manifest, "e.png"]),
+                         [join(tablets, "a.svg"), join(tablets, "b.png"), join(self.directory, "c.png"),
+                          join(self.directory, "sub/d.svg"), "e.png"])
+
+
+class WriteRecordsTestCase(TestCase):
+    def test_json_lines(self):
+        from pss.headless import write_records
+
+        handle = StringIO()
+        write_records([build_rows()], handle)
+        rows = [loads(line) for line in handle.getvalue().splitlines()]
+        self.assertEqual(rows[1], {"target": "tablet.png", "query": "query", "rank": 1, "y": 50, "x": 60, "top": 45,
+                                   "bottom": 55, "left": 55, "right": 65, "energy": 2.5})
+
+    def test_csv(self):
+        from pss.headless import write_records
+
+        handle = StringIO()
+        write_records([build_rows()], handle, csv=True)
+        rows = list(DictReader(StringIO(handle.getvalue())))
+        self.assertEqual([row["energy"] for row in rows], ["1.5", "2.5"])
+        self.assertEqual(rows[0]["top"], "0")
+
+
+class ScanTargetTestCase(TestCase):
+    def test_detections_match_evaluation(self):
+        from pss.eval import Evaluation
+        from pss.headless import scan_target
+        from pss.model import DistanceTransform
+
+        tree = build_compact_tree()
+        target = ArrayTarget(build_target())
+        detections = scan_target(tree, target, 5)
+        evaluation = Evaluation(tree, target, DistanceTransform(tree, target), 5)
+        self.assertEqual([detection.position for detection in detections], list(zip(*evaluation.minimum)))
+
+    def test_matplotlib_is_not_imported(self):
+        output = check_output([executable, "-c", "import sys, pss.headless; print('matplotlib' in sys.modules)"])
+        self.assertEqual(output.strip(), b"False")
@@ -0,0 +1,27 @@
+# -*- encoding: utf-8 -*-
+from subprocess import run, PIPE
+from sys import executable
+from unittest import TestCase
+
+# Seconds importing pss.model may take including numpy, measured at about 0.15s
+IMPORT_BUDGET = 0.75
+HEAVY_MODULES = ("PyQt4", "qimage2ndarray", "skimage", "matplotlib", "scipy.ndimage", "sklearn", "mahotas")
+
+
+def import_time(module):
+    """
+    Measures the import time of a module in a fresh interpreter, which times the import itself by perf_counter
+    :return: Import time in seconds
+    """
+    code = "from time import perf_counter; start = perf_counter(); import {}; print(perf_counter() - start)"
+    return float(run([executable, "-c", code.format(module)], stdout=PIPE, check=True).stdout.decode())
+
+
+class ImportTimeTestCase(TestCase):
+    def test_model_imports_within_budget(self):
+        self.assertLess(min(import_time("pss.model") for _ in range(3)), IMPORT_BUDGET)
+
+    def test_model_does_not_load_heavy_modules(self):
+        code = "import sys, pss.model; print(' '.join(m for m in {} if m in sys.modules))".format(HEAVY_MODULES)
+        loaded = run([executable, "-c", code], stdout=PIPE, check=True).stdout.decode().split()
+        self.assertEqual(loaded, [])
@@ -0,0 +1,89 @@
+# -*- encoding: utf-8 -*-
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from numpy import zeros, hypot, ogrid
+
+from pss.junctions import skeleton_points, find_corners, neighbour_codes, CROSSINGS
+from pss.raster import RASTERIZER_NUMPY
+from pss.synthetic import write_test_resources
+
+
+def build_skeleton(*lines, **kwargs):
+    """
+    Draws one pixel wide lines (y0, x0, y1, x1) into a skeleton
+    """
+    from skimage.draw import line
+    skeleton = zeros(kwargs.get("shape", (40, 40)), dtype=bool)
+    for y0, x0, y1, x1 in lines:
+        skeleton[line(y0, x0, y1, x1)] = True
+    return skeleton
+
+
+class CrossingNumberTestCase(TestCase):
+    def test_codes_hold_the_neighbours(self):
+        skeleton = build_skeleton((1, 0, 1, 2), shape=(3, 3))
+        self.assertEqual(neighbour_codes(skeleton)[1].tolist(), [4, 64 + 4, 64])
+
+    def test_crossing_numbers(self):
+        self.assertEqual(CROSSINGS[0], 0)
+        self.assertEqual(CROSSINGS[1], 1)
+        self.assertEqual(CROSSINGS[1 + 2], 1)
+        self.assertEqual(CROSSINGS[1 + 16], 2)
+        self.assertEqual(CROSSINGS[1 + 4 + 16], 3)
+        self.assertEqual(CROSSINGS[255], 0)
+
+
+class SkeletonPointsTestCase(TestCase):
+    def test_straight_strokes_have_their_ends_only(self):
+        for line in [(5, 5, 5, 35), (5, 3, 30, 37)]:
+            endpoints, junctions, corners = skeleton_points(build_skeleton(line))
+            self.assertEqual(endpoints.tolist(), [list(line[:2]), list(line[2:])])
+            self.assertEqual(len(junctions) + len(corners), 0)
+
+    def test_sharp_bends_are_corners(self):
+        _, _, corners = skeleton_points(build_skeleton((5, 5, 30, 5), (30, 5, 30, 35)))
+        self.assertEqual(corners.tolist(), [[30, 5]])
+        _, _, corners = skeleton_points(build_skeleton((5, 5, 30, 20), (30, 20, 5, 35)))
+        self.assertEqual(corners.tolist(), [[30, 20]])
+
+    def test_junctions_are_found_once(self):
+        for lines, junction, ends in [(((5, 5, 5, 35), (5, 20, 35, 20)), [5, 20], 3),
+                                      (((5, 5, 20, 20), (5, 35, 20, 20), (20, 20, 38, 20)), [20, 20], 3),
+                                      (((5, 5, 35, 35), (5, 35, 35, 5)), [20, 20], 4)]:
+            endpoints, junctions, corners = skeleton_points(build_skeleton(*lines))
+            self.assertEqual(junctions.tolist(), [junction])
+            self.assertEqual(len(endpoints), ends)
+            self.assertEqual(len(corners), 0)
+
+    def test_closed_strokes_get_a_point(self):
+        from skimage.morphology import skeletonize
+        y, x = ogrid[:40, :40]
+        skeleton = skeletonize(abs(hypot(y - 20, x - 20) - 12) < 0.7)
+        self.assertEqual(sum(len(points) for points in skeleton_points(skeleton)), 0)
+        self.assertEqual(len(find_corners(skeleton)), 1)
+
+    def test_corners_are_sorted_row_major(self):
+        corners = find_corners(build_skeleton((5, 5, 5, 30), (5, 30, 30, 30), (30, 30, 30, 5), (30, 5, 5, 5)))
+        self.assertEqual(corners.tolist(), [[5, 5], [5, 30], [30, 5], [30, 30]])
+
+
+class CrossingQueryTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        write_test_resources(self.directory, shape=(120, 160))
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_query_is_built_up_with_crossing_corners(self):
+        from pss.model import Query, CORNERS_CROSSING
+        from pss.svg import QuerySvg
+
+        query = Query(QuerySvg(join(self.directory, "test_query.svg"), rasterizer=RASTERIZER_NUMPY),
+                      corners=CORNERS_CROSSING)
+        corners = [node.position.tolist() for node in query.corner_nodes]
+        self.assertEqual(corners, find_corners(query.enlarged_skeleton).tolist())
+        self.assertGreater(len(query.create_compact_tree()), len(corners))
@@ -0,0 +1,84 @@
+# -*- encoding: utf-8 -*-
+from unittest import TestCase
+
+from numpy import argsort, nonzero
+from numpy.random import RandomState
+from scipy.ndimage import minimum_filter
+
+from pss.minima import local_minima, smallest, suppression_window, minimum_window, WINDOW_QUERY
+from tests.test_tiling import ArrayTarget, build_target
+from tests.test_tree import build_compact_tree
+
+
+class SuppressionWindowTestCase(TestCase):
+    def test_default_is_a_tenth_of_the_shorter_side(self):
+        self.assertEqual(suppression_window((90, 120)), (9, 9))
+
+    def test_default_is_at_least_one(self):
+        self.assertEqual(minimum_window((5, 120)), 1)
+
+    def test_window_in_pixels(self):
+        self.assertEqual(suppression_window((90, 120), 7), (7, 7))
+        self.assertEqual(suppression_window((90, 120), (3, 5)), (3, 5))
+
+    def test_window_of_query(self):
+        self.assertEqual(suppression_window((90, 120), WINDOW_QUERY, (10, 12)), (10, 12))
+
+
+class SmallestTestCase(TestCase):
+    def setUp(self):
+        self.values = RandomState(0).randint(0, 6, (60, 70)).astype(float)
+        self.ys, self.xs = local_minima(self.values, (3, 3))
+        self.order = argsort(self.values[self.ys, self.xs], kind="stable")
+
+    def test_local_minima_match_minimum_filter(self):
+        ys, xs = nonzero(minimum_filter(self.values, size=(3, 4), mode="nearest") == self.values)
+        found = local_minima(self.values, (3, 4))
+        self.assertEqual((found[0].tolist(), found[1].tolist()), (ys.tolist(), xs.tolist()))
+
+    def test_same_as_stable_argsort(self):
+        for limit in (1, 5, 40, len(self.ys), len(self.ys) + 3):
+            ys, xs = smallest(self.values, self.ys, self.xs, limit)
+            self.assertEqual(ys.tolist(), self.ys[self.order][:limit].tolist())
+            self.assertEqual(xs.tolist(), self.xs[self.order][:limit].tolist())
+
+    def test_no_limit_gives_no_cells(self):
+        ys, xs = smallest(self.values, self.ys, self.xs, 0)
+        self.assertEqual((len(ys), len(xs)), (0, 0))
+
+
+class EvaluationTestCase(TestCase):
+    def setUp(self):
+        from pss.model import DistanceTransform
+
+        self.tree = build_compact_tree()
+        self.target = ArrayTarget(build_target())
+        self.dt = DistanceTransform(self.tree, self.target)
+
+    def test_minima_match_full_argsort(self):
+        from pss.eval import Evaluation
+
+        sum_dt = self.dt.sum_dt
+        ys, xs = nonzero(minimum_filter(sum_dt, size=sum_dt.shape[0] // 10, mode="nearest") == sum_dt)
+        order = argsort(sum_dt[ys, xs], kind="stable")[:10]
+        minimum = Evaluation(self.tree, self.target, self.dt, 10).minimum
+        self.assertEqual([values.tolist() for values in minimum], [ys[order].tolist(), xs[order].tolist()])
+
+    def test_window_of_query(self):
+        from pss.eval import Evaluation
+
+        evaluation = Evaluation(self.tree, self.target, self.dt, 10, window=WINDOW_QUERY)
+        self.assertEqual(evaluation.window, (10, 10))
+        filtered = minimum_filter(self.dt.sum_dt, size=(10, 10), mode="nearest")
+        for y, x in zip(*evaluation.minimum):
+            self.assertEqual(filtered[y, x], self.dt.sum_dt[y, x])
+
+    def test_detections_match_found_symbols(self):
+        from pss.eval import Evaluation
+
+        evaluation = Evaluation(self.tree, self.target, self.dt, 5)
+        detections = list(evaluation.detections(crop=True))
+        self.assertEqual([detection.position for detection in detections], list(zip(*evaluation.minimum)))
+        for detection, (box, energy) in zip(detections, evaluation.found_symbols):
+            self.assertEqual(detection.crop.tolist(), box.tolist())
+            self.assertEqual(detection.energy, energy)
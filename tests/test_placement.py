@@ -0,0 +1,63 @@
+# -*- encoding: utf-8 -*-
+from unittest import TestCase
+
+from numpy import zeros, array
+
+from pss.placement import SkeletonGraph
+
+
+def build_skeleton():
+    """
+    Builds an enlarged skeleton in the shape of a "T"
+    :return: Boolean Numpy-Array and the positions of its corners and junctions
+    """
+    skeleton = zeros((15, 17), dtype=bool)
+    skeleton[2, 2:15] = True
+    skeleton[2:13, 8] = True
+    return skeleton, [array([2, 2]), array([2, 14]), array([2, 8]), array([12, 8])]
+
+
+class SkeletonGraphTestCase(TestCase):
+    def setUp(self):
+        self.skeleton, self.corners = build_skeleton()
+        self.graph = SkeletonGraph(self.skeleton, self.corners, 3)
+
+    def test_true_list_excludes_corners(self):
+        true_list = [tuple(position) for position in self.graph.true_list()]
+        self.assertEqual(len(true_list), self.skeleton.sum() - len(self.corners))
+        self.assertNotIn((2, 8), true_list)
+
+    def test_true_list_is_row_major(self):
+        true_list = [tuple(position) for position in self.graph.true_list()]
+        self.assertEqual(true_list, sorted(true_list))
+
+    def test_nodes_are_placed_on_the_ring_distance_away(self):
+        placed = [tuple(position) for position in self.graph.place_nodes()]
+        self.assertEqual(placed, [(2, 5), (3, 8), (4, 8), (5, 8), (2, 11), (6, 8), (9, 8)])
+
+    def test_nodes_are_never_placed_on_corners(self):
+        corners = set(tuple(corner) for corner in self.corners)
+        for position in self.graph.place_nodes():
+            self.assertNotIn(tuple(position), corners)
+
+    def test_placing_twice_gives_same_nodes(self):
+        first = [tuple(position) for position in self.graph.place_nodes()]
+        second = [tuple(position) for position in self.graph.place_nodes()]
+        self.assertEqual(first, second)
+
+
+class GreedyPlacementTestCase(TestCase):
+    def test_skeleton_graph_places_same_nodes_as_greedy_walk(self):
+        from pss.model import Node, Query, DISTANCE
+
+        skeleton, corners = build_skeleton()
+        query = Query.__new__(Query)
+        query.enlarged_skeleton = skeleton
+        query.corner_nodes = [Node(position=corner) for corner in corners]
+        query.true_list = query.create_true_list()
+        query.open_list = list()
+        query.closed_list = list()
+
+        greedy = [tuple(node.position) for node in query.add_nodes_greedily()]
+        graph = [tuple(position) for position in SkeletonGraph(skeleton, corners, DISTANCE).place_nodes()]
+        self.assertEqual(greedy, graph)
@@ -0,0 +1,126 @@
+# -*- encoding: utf-8 -*-
+from json import load
+from os.path import join, isfile
+from pstats import Stats
+from shutil import rmtree
+from tempfile import mkdtemp
+import tracemalloc
+from unittest import TestCase
+
+from numpy import ones
+
+import pss.profiling
+from pss.profiling import Tracer, stage
+from tests.test_tiling import ArrayTarget, build_target
+from tests.test_tree import build_compact_tree
+
+
+class TracerTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.tracer = Tracer().start()
+
+    def tearDown(self):
+        if pss.profiling.tracer is not None:
+            self.tracer.stop()
+        rmtree(self.directory)
+
+    def test_stage_does_nothing_without_tracer(self):
+        self.tracer.stop()
+        with stage("outer"):
+            pass
+        self.assertEqual(self.tracer.stages, [])
+
+    def test_stage_records_time_and_memory(self):
+        with stage("allocate"):
+            values = ones(2**20)
+            del values
+        record = self.tracer.stages[0]
+        self.assertEqual(record["stage"], "allocate")
+        self.assertGreaterEqual(record["wall"], 0)
+        self.assertGreaterEqual(record["cpu"], 0)
+        self.assertGreaterEqual(record["peak_memory"], 8 * 2**20)
+
+    def test_peak_of_inner_stage_counts_for_outer_stage(self):
+        with stage("outer"):
+            with stage("inner"):
+                values = ones(2**20)
+                del values
+        inner, outer = self.tracer.stages
+        self.assertEqual((inner["stage"], inner["depth"], outer["stage"], outer["depth"]), ("inner", 1, "outer", 0))
+        self.assertGreaterEqual(outer["peak_memory"], inner["peak_memory"])
+
+    def test_peak_is_traced_without_reset_peak(self):
+        reset_peak, pss.profiling.RESET_PEAK = pss.profiling.RESET_PEAK, False
+        try:
+            with stage("allocate"):
+                values = ones(2**22)
+                del values
+            with stage("hold"):
+                values = ones(2**18)
+        finally:
+            pss.profiling.RESET_PEAK = reset_peak
+        allocate, hold = self.tracer.stages
+        self.assertGreaterEqual(allocate["peak_memory"], 8 * 2**22)
+        self.assertGreaterEqual(hold["peak_memory"], 8 * 2**18)
+        self.assertLess(hold["peak_memory"], 8 * 2**22)
+        del values
+
+    def test_tracing_started_elsewhere_keeps_running(self):
+        self.tracer.stop()
+        tracemalloc.start()
+        try:
+            Tracer().start().stop()
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_summary_sums_up_repeated_stages(self):
+        for _ in range(3):
+            with stage("repeated"):
+                pass
+        self.assertEqual(self.tracer.summary()["repeated"]["count"], 3)
+
+    def test_report_is_written_as_json(self):
+        with stage("written"):
+            pass
+        path = join(self.directory, "trace.json")
+        self.tracer.write(path)
+        with open(path) as handle:
+            report = load(handle)
+        self.assertEqual([record["stage"] for record in report["stages"]], ["written"])
+        self.assertIn("written", report["summary"])
+
+    def test_profiled_stage_is_dumped(self):
+        self.tracer.stop()
+        path = join(self.directory, "stage.prof")
+        self.tracer = Tracer(memory=False, profile="profiled", profile_path=path).start()
+        with stage("profiled"):
+            sorted(range(1000))
+        self.tracer.stop()
+        self.assertTrue(isfile(path))
+        self.assertTrue(Stats(path).total_calls > 0)
+
+    def test_search_stages_are_traced(self):
+        from pss.eval import Evaluation
+        from pss.model import DistanceTransform
+
+        tree = build_compact_tree()
+        target = ArrayTarget(build_target())
+        Evaluation(tree, target, DistanceTransform(tree, target), 5)
+        self.assertEqual([record["stage"] for record in self.tracer.stages], ["target_dt", "energy", "minima", "crops"])
+
+    def test_tiled_and_pyramid_stages_are_traced(self):
+        from pss.pyramid import PyramidSearch
+        from pss.tiling import TiledSearch
+
+        stages = ["target_dt", "energy", "minima", "crops"]
+        TiledSearch(build_compact_tree(), ArrayTarget(build_target()), 5, tile_size=50)
+        summary = self.tracer.summary()
+        self.assertEqual(sorted(summary), sorted(stages))
+        self.assertEqual(summary["target_dt"]["count"], 6)
+        self.assertEqual(summary["crops"]["count"], 1)
+
+        self.tracer.stages = list()
+        PyramidSearch(build_compact_tree(), ArrayTarget(build_target()), 5, levels=1)
+        self.assertEqual(sorted(self.tracer.summary()), sorted(stages))
@@ -0,0 +1,72 @@
+# -*- encoding: utf-8 -*-
+from unittest import TestCase
+
+from numpy import ones
+from numpy.random import RandomState
+
+from pss.pyramid import PyramidSearch, downsample, scale_tree
+from pss.tree import CompactTree
+from tests.test_energy import build_random_tree
+from tests.test_tiling import ArrayTarget, untiled_minima
+from tests.test_tree import build_compact_tree
+
+
+def build_large_tree():
+    tree = build_random_tree(0, 20)
+    return CompactTree(tree.positions * 2, tree.offsets * 2, tree.parents, tree.order, (24, 24))
+
+
+def build_target_with_symbols(tree, places, seed=0, shape=(300, 360)):
+    """
+    Builds a target of random strokes, in which the nodes of tree are drawn at the given places
+    """
+    random = RandomState(seed)
+    target = ones(shape)
+    for _ in range(60):
+        y, x = random.randint(0, shape[0]), random.randint(0, shape[1])
+        target[y:y + random.randint(1, 10), x:x + 2] = 0
+    for y, x in places:
+        for position in tree.positions - tree.root_position:
+            target[y + position[0], x + position[1]] = 0
+    return target
+
+
+class DownsampleTestCase(TestCase):
+    def test_block_is_stroke_if_any_cell_is_stroke(self):
+        target = ones((4, 5))
+        target[1, 1] = 0
+        target[3, 4] = 0
+        self.assertEqual(downsample(target).tolist(), [[0, 1, 1], [1, 1, 0]])
+
+    def test_scale_tree_scales_positions_and_offsets(self):
+        tree = scale_tree(build_compact_tree())
+        self.assertEqual(tree.positions.tolist(), [[2, 2], [2, 4], [1, 2], [4, 4]])
+        self.assertEqual(tree.offsets.tolist(), [[0, 0], [0, 2], [-1, 0], [2, 0]])
+        self.assertEqual(tree.shape, (5, 5))
+
+
+class PyramidSearchTestCase(TestCase):
+    def setUp(self):
+        self.tree = build_large_tree()
+        self.places = [(60, 80), (200, 250)]
+        self.target = build_target_with_symbols(self.tree, self.places)
+
+    def test_without_levels_matches_untiled_minima(self):
+        search = PyramidSearch(self.tree, ArrayTarget(self.target), 5, levels=0)
+        ys, xs, energies = untiled_minima(self.tree, self.target, 5)
+        self.assertEqual((search.minimum[0], search.minimum[1], search.energies), (ys, xs, energies))
+
+    def test_drawn_symbols_are_found_at_full_resolution(self):
+        search = PyramidSearch(self.tree, ArrayTarget(self.target), 2, levels=2)
+        self.assertEqual(len(search.trees), 3)
+        ys, xs, energies = untiled_minima(self.tree, self.target, 2)
+        self.assertEqual((search.minimum[0], search.minimum[1], search.energies), (ys, xs, energies))
+
+    def test_workers_give_same_minima(self):
+        search = PyramidSearch(self.tree, ArrayTarget(self.target), 2, levels=2)
+        parallel = PyramidSearch(self.tree, ArrayTarget(self.target), 2, levels=2, workers=3)
+        self.assertEqual((parallel.minimum, parallel.energies), (search.minimum, search.energies))
+
+    def test_threshold_drops_candidates(self):
+        search = PyramidSearch(self.tree, ArrayTarget(self.target), 5, levels=1, threshold=-1)
+        self.assertEqual(search.minimum, ([], []))
@@ -0,0 +1,223 @@
+# -*- encoding: utf-8 -*-
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from numpy import array, hypot
+from numpy.random import RandomState
+
+from pss.raster import flatten_path, fill_paths, document_paths, parse_polygons, bounding_box, polygon_data, \
+    FILL_EVENODD, RASTERIZER_NUMPY
+from external.elka_svg import parse_subpaths, parse_transform, LINE, CUBIC
+from pss.synthetic import random_sign, tablet, rasterize, wedge_polygon, query_svg, tablet_svg, write_test_resources
+
+
+def build_square(left, top, size):
+    return array([[left, top], [left + size, top], [left + size, top + size], [left, top + size]], dtype=float)
+
+
+class FlattenPathTestCase(TestCase):
+    def test_subpaths_become_polygons(self):
+        polygons = flatten_path("M 0 0 L 5 0 L 5 5 z m 1 1 l 2 0 l 0 2 z")
+        self.assertEqual([polygon.tolist() for polygon in polygons],
+                         [[[0, 0], [5, 0], [5, 5]], [[1, 1], [3, 1], [3, 3]]])
+
+    def test_curves_are_flattened_onto_the_curve(self):
+        polygon = flatten_path("M 0 0 C 0 10 10 10 10 0")[0]
+        self.assertGreater(len(polygon), 10)
+        self.assertEqual(polygon[-1].tolist(), [10, 0])
+        self.assertAlmostEqual(polygon[:, 1].max(), 7.5)
+
+    def test_offset_is_added(self):
+        self.assertEqual(flatten_path("M 0 0 L 1 0 L 1 1", (10, 20))[0].tolist(), [[10, 20], [11, 20], [11, 21]])
+
+
+class ParseSubpathsTestCase(TestCase):
+    def test_numbers_without_separators(self):
+        points, kinds, closed = parse_subpaths("M1-2.5.5-1l1e1-2")[0]
+        self.assertEqual(points.tolist(), [[1, -2.5], [0.5, -1], [10.5, -3]])
+        self.assertEqual(kinds.tolist(), [LINE, LINE])
+        self.assertFalse(closed)
+
+    def test_implicit_lines_after_move(self):
+        self.assertEqual(parse_subpaths("m1 1 1 1 1 0")[0][0].tolist(), [[1, 1], [2, 2], [3, 2]])
+
+    def test_horizontal_and_vertical_lines(self):
+        points, kinds, closed = parse_subpaths("M0 0H10V5h-5v-2z")[0]
+        self.assertEqual(points.tolist(), [[0, 0], [10, 0], [10, 5], [5, 5], [5, 3]])
+        self.assertTrue(closed)
+
+    def test_subpath_after_close_starts_at_the_start_point(self):
+        subpaths = parse_subpaths("M1 1L2 2zl1 0")
+        self.assertEqual([points.tolist() for points, _, _ in subpaths], [[[1, 1], [2, 2]], [[1, 1], [2, 1]]])
+
+    def test_smooth_curves_reflect_the_control_point(self):
+        points, kinds, _ = parse_subpaths("M0 0C0 5 5 5 5 0s5 -5 5 0")[0]
+        self.assertEqual(kinds.tolist(), [CUBIC, CUBIC])
+        self.assertEqual(points[4].tolist(), [5, -5])
+
+    def test_quadratic_curves_are_elevated(self):
+        points, kinds, _ = parse_subpaths("M0 0Q5 10 10 0T20 0")[0]
+        self.assertEqual(kinds.tolist(), [CUBIC, CUBIC])
+        self.assertAlmostEqual(points[1, 1], 20 / 3.0)
+        self.assertAlmostEqual(points[4, 1], -20 / 3.0)
+
+    def test_arcs_with_compact_flags(self):
+        polygon = flatten_path("M0 0a5 5 0 1010 0")[0]
+        self.assertEqual(polygon[-1].tolist(), [10, 0])
+        self.assertAlmostEqual(hypot(polygon[:, 0] - 5, polygon[:, 1]).min(), 5)
+        self.assertAlmostEqual(polygon[:, 1].max(), 5)
+
+    def test_arc_radii_are_scaled_up(self):
+        polygon = flatten_path("M0 0A1 1 0 0 1 10 0")[0]
+        self.assertAlmostEqual(polygon[:, 1].min(), -5)
+
+
+class FillPathsTestCase(TestCase):
+    def test_same_coverage_as_skimage(self):
+        random = RandomState(0)
+        wedges, _ = tablet(random, (200, 240), [random_sign(random, 8)], density=3)
+        # skimage puts the centers of the pixels on integer coordinates
+        filled = fill_paths([[wedge_polygon(*wedge)] for wedge in wedges], (200, 240), origin=(-0.5, -0.5))
+        self.assertTrue((filled == rasterize(wedges, (200, 240))).all())
+
+    def test_pixels_are_covered_by_their_center(self):
+        filled = fill_paths([[build_square(1, 2, 3)]], (8, 8))
+        self.assertEqual(filled.sum(), 9)
+        self.assertTrue(filled[2:5, 1:4].all())
+
+    def test_fill_rules_of_a_hole(self):
+        path = [build_square(0, 0, 10), build_square(3, 3, 4)]
+        self.assertEqual(fill_paths([path], (10, 10)).sum(), 100)
+        self.assertEqual(fill_paths([path], (10, 10), rule=FILL_EVENODD).sum(), 84)
+
+    def test_overlapping_paths_do_not_cancel_out(self):
+        paths = [[build_square(0, 0, 10)], [build_square(3, 3, 4)[::-1]]]
+        self.assertEqual(fill_paths(paths, (10, 10)).sum(), 100)
+
+    def test_origin_and_scale(self):
+        filled = fill_paths([[build_square(10, 10, 2)]], (4, 6), origin=(10, 10), scale=(3, 2))
+        self.assertEqual(filled.sum(), 24)
+
+    def test_paths_outside_are_clipped(self):
+        self.assertEqual(fill_paths([[build_square(-5, -5, 20)]], (4, 4)).sum(), 16)
+
+
+class ParseTransformTestCase(TestCase):
+    def affine(self, transform):
+        return parse_transform(transform)[:2][:, [0, 1, 3]].round(9).tolist()
+
+    def test_translations_with_one_or_two_arguments(self):
+        for transform in ["translate(10 20)", "translate(10, 20)", " translate( 10,20 ) "]:
+            self.assertEqual(self.affine(transform), [[1, 0, 10], [0, 1, 20]])
+        self.assertEqual(self.affine("translate(-1.5e1)"), [[1, 0, -15], [0, 1, 0]])
+
+    def test_linear_transforms(self):
+        self.assertEqual(self.affine("scale(2)"), [[2, 0, 0], [0, 2, 0]])
+        self.assertEqual(self.affine("scale(2 3)"), [[2, 0, 0], [0, 3, 0]])
+        self.assertEqual(self.affine("rotate(90)"), [[0, -1, 0], [1, 0, 0]])
+        self.assertEqual(self.affine("rotate(90, 5, 5)"), [[0, -1, 10], [1, 0, 0]])
+        self.assertEqual(self.affine("skewX(45)"), [[1, 1, 0], [0, 1, 0]])
+        self.assertEqual(self.affine("skewY(45)"), [[1, 0, 0], [1, 1, 0]])
+        self.assertEqual(self.affine("matrix(1 2 3 4 5 6)"), [[1, 3, 5], [2, 4, 6]])
+
+    def test_lists_are_applied_right_to_left(self):
+        self.assertEqual(self.affine("translate(10, 0) scale(2)"), [[2, 0, 10], [0, 2, 0]])
+        self.assertEqual(self.affine("scale(2),translate(10, 0)"), [[2, 0, 20], [0, 2, 0]])
+
+    def test_invalid_transforms_raise(self):
+        for transform in ["foo(1)", "translate(1, 2, 3)", "scale(2) x"]:
+            with self.assertRaises(ValueError):
+                parse_transform(transform)
+
+
+class SvgGeometryTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        random = RandomState(1)
+        self.sign = random_sign(random, 5)
+        self.wedges, _ = tablet(random, (100, 150), [self.sign])
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def write(self, name, content):
+        path = join(self.directory, name)
+        with open(path, "w") as handle:
+            handle.write(content)
+        return path
+
+    def test_document_paths_and_view_box(self):
+        paths, view_box = document_paths(self.write("tablet.svg", tablet_svg(self.wedges, (100, 150))))
+        self.assertEqual(view_box, (0, 0, 150, 100))
+        self.assertEqual(len(paths), len(self.wedges))
+
+    def test_group_transforms_are_applied(self):
+        path = self.write("moved.svg", '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10">'
+                                       '<g transform="translate(2, 3)"><path d="M 0 0 L 1 0 L 1 1"/></g>'
+                                       '<path d="M 0 0 L 1 0 L 1 1" fill="none"/></svg>')
+        paths, _ = document_paths(path)
+        self.assertEqual([polygon.tolist() for path in paths for polygon in path], [[[2, 3], [3, 3], [3, 4]]])
+
+    def coverage(self, body):
+        paths, _ = document_paths(self.write("covered.svg", '<svg xmlns="http://www.w3.org/2000/svg" '
+                                                            'viewBox="0 0 20 20">{}</svg>'.format(body)))
+        return fill_paths(paths, (20, 20))
+
+    def test_whole_transformation_is_applied(self):
+        square = '<path d="M 0 0 L 2 0 L 2 2 L 0 2 z"/>'
+        expected = fill_paths([[build_square(4, 6, 4)]], (20, 20))
+        for body in ['<g transform="translate(4 6) scale(2)">{}</g>'.format(square),
+                     '<g transform="translate(4, 6)"><path d="M 0 0 L 2 0 L 2 2 L 0 2 z" transform="scale(2)"/></g>',
+                     '<g transform="rotate(90, 8, 8)"><g transform="scale(2)">'
+                     '<path d="M 3 4 L 5 4 L 5 6 L 3 6 z"/></g></g>']:
+            self.assertEqual(self.coverage(body).tolist(), expected.tolist())
+
+    def test_fill_is_inherited(self):
+        square = '<path d="M 0 0 L 4 0 L 4 4 L 0 4 z"/>'
+        self.assertFalse(self.coverage('<g fill="none">{}</g>'.format(square)).any())
+        self.assertFalse(self.coverage('<g style="fill: none">{}</g>'.format(square)).any())
+        self.assertEqual(self.coverage('<g style="fill:none"><path d="M 0 0 L 4 0 L 4 4 L 0 4 z" fill="black"/></g>')
+                         .sum(), 16)
+
+    def test_strokes_are_drawn(self):
+        line = '<path d="M 2 5 L 8 5" fill="none" stroke="black" stroke-width="2"/>'
+        expected = fill_paths([[build_square(2, 4, 2), build_square(4, 4, 2), build_square(6, 4, 2)]], (20, 20))
+        self.assertEqual(self.coverage(line).tolist(), expected.tolist())
+        self.assertEqual(self.coverage('<g style="stroke:black;stroke-width:2" transform="scale(2)">'
+                                       '<path d="M 1 2.5 L 4 2.5 L 4 8" fill="none"/></g>')[:, 8].sum(), 13)
+
+    def test_symbol_groups_are_read_as_polygons(self):
+        names, groups = zip(*parse_polygons("", self.write("query.svg", query_svg([self.sign]))))
+        self.assertEqual(names, ("Query",))
+        self.assertEqual(len(groups[0]), 5)
+        self.assertEqual(len(polygon_data(groups[0])), sum(len(polygon) + 1 for path in groups[0] for polygon in path))
+        left, top, width, height = bounding_box(groups[0])
+        self.assertTrue(0 < width and 0 < height)
+
+
+class NumpyRasterizerTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        write_test_resources(self.directory, shape=(120, 160))
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_query_is_built_up_without_qt(self):
+        from pss.model import Query
+        from pss.svg import QuerySvg
+
+        query = Query(QuerySvg(join(self.directory, "test_query.svg"), rasterizer=RASTERIZER_NUMPY))
+        self.assertTrue(query.original_array.any())
+        self.assertIsNone(query.image)
+        self.assertGreater(len(query.create_compact_tree()), 1)
+
+    def test_target_is_rasterized_without_qt(self):
+        from pss.model import Target
+        from pss.svg import TargetSvg
+
+        target = Target(TargetSvg(join(self.directory, "test_target.svg"), rasterizer=RASTERIZER_NUMPY))
+        # The QImage of a target is created with width and height swapped
+        self.assertEqual(target.original_array.shape, (160, 120))
@@ -0,0 +1,107 @@
+# -*- encoding: utf-8 -*-
+from os.path import isfile
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from numpy import arange, memmap, nonzero
+from scipy.ndimage import minimum_filter
+
+from pss.energy import target_distance_transform, tree_energy, ScorePool
+from pss.scratch import Scratch, mapped_nonzero
+from tests.test_tiling import ArrayTarget, build_target
+from tests.test_tree import build_compact_tree
+
+
+class ScratchTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.scratch = Scratch(self.directory)
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_stored_array_can_be_loaded(self):
+        stored = self.scratch.store("values", arange(12.0).reshape(3, 4))
+        stored.flush()
+        loaded = self.scratch.load("values")
+        self.assertIsInstance(loaded, memmap)
+        self.assertEqual(loaded.tolist(), arange(12.0).reshape(3, 4).tolist())
+
+    def test_allocator_creates_unique_names(self):
+        allocate, names = self.scratch.allocator("score")
+        allocate((2, 2), float)
+        allocate((2, 2), float)
+        self.assertEqual(names, ["score_0", "score_1"])
+        self.assertEqual(self.scratch.names(), ["score_0", "score_1"])
+
+    def test_scratches_sharing_a_directory_keep_their_arrays(self):
+        other = Scratch(self.directory)
+        self.scratch.store("values", arange(4.0)).flush()
+        other.store("values", arange(4.0) + 1).flush()
+        self.assertNotEqual(other.directory, self.scratch.directory)
+        self.assertEqual(self.scratch.load("values").tolist(), arange(4.0).tolist())
+
+    def test_unique_names_are_reserved_once(self):
+        self.assertEqual([self.scratch.unique("root_dt") for _ in range(3)], ["root_dt", "root_dt_2", "root_dt_3"])
+
+    def test_remove_deletes_file(self):
+        self.scratch.empty("values", (2, 2))
+        self.scratch.remove("values")
+        self.assertFalse(isfile(self.scratch.path("values")))
+
+    def test_mapped_pool_gives_same_energy(self):
+        tree = build_compact_tree()
+        root_dt = target_distance_transform(build_target(), tree.shape)
+        allocate, names = self.scratch.allocator("score")
+        mapped = tree_energy(root_dt, tree, ScorePool(root_dt, allocate=allocate))
+        self.assertIsInstance(mapped, memmap)
+        self.assertTrue((mapped == tree_energy(root_dt, tree)).all())
+
+    def test_parallel_pools_map_every_buffer(self):
+        from tests.test_energy import build_random_tree
+
+        tree = build_random_tree(0, 40)
+        root_dt = target_distance_transform(build_target(), tree.shape)
+        allocate, names = self.scratch.allocator("score")
+        pool = ScorePool(root_dt, allocate=allocate)
+        mapped = tree_energy(root_dt, tree, pool, workers=4)
+        self.assertTrue((mapped == tree_energy(root_dt, tree)).all())
+        self.assertGreater(len(names), pool.allocated)
+        self.assertEqual(len(set(names)), len(names))
+        self.assertEqual(self.scratch.names(), sorted(names))
+
+    def test_mapped_nonzero_matches_nonzero(self):
+        energy = target_distance_transform(build_target(), (3, 3))
+        filtered = minimum_filter(energy, size=5, mode="nearest")
+        ys, xs = nonzero(filtered == energy)
+        import pss.scratch
+        rows_per_chunk, pss.scratch.ROWS_PER_CHUNK = pss.scratch.ROWS_PER_CHUNK, 7
+        try:
+            mapped_ys, mapped_xs = mapped_nonzero(filtered, energy)
+        finally:
+            pss.scratch.ROWS_PER_CHUNK = rows_per_chunk
+        self.assertEqual(mapped_ys.tolist(), ys.tolist())
+        self.assertEqual(mapped_xs.tolist(), xs.tolist())
+
+    def test_distance_transform_gives_same_energy(self):
+        from pss.model import DistanceTransform
+
+        tree = build_compact_tree()
+        target = build_target()
+        in_memory = DistanceTransform(tree, ArrayTarget(target))
+        mapped = DistanceTransform(tree, ArrayTarget(target), scratch=self.scratch)
+        self.assertTrue((mapped.root_dt == in_memory.root_dt).all())
+        self.assertTrue((mapped.sum_dt == in_memory.sum_dt).all())
+        self.assertEqual(self.scratch.names(), ["root_dt", "sum_dt"])
+        self.assertTrue((self.scratch.load("sum_dt") == in_memory.sum_dt).all())
+
+    def test_distance_transforms_sharing_a_scratch_keep_their_energy(self):
+        from pss.model import DistanceTransform
+
+        tree = build_compact_tree()
+        first = DistanceTransform(tree, ArrayTarget(build_target()), scratch=self.scratch)
+        expected = first.sum_dt.copy()
+        DistanceTransform(tree, ArrayTarget(build_target()[::-1].copy()), scratch=self.scratch)
+        self.assertEqual(self.scratch.names(), ["root_dt", "root_dt_2", "sum_dt", "sum_dt_2"])
+        self.assertTrue((first.sum_dt == expected).all())
@@ -0,0 +1,17 @@
+# -*- encoding: utf-8 -*-
+from argparse import ArgumentTypeError
+from unittest import TestCase
+
+from pss.minima import WINDOW_QUERY
+from pss.settings import window_size
+
+
+class WindowSizeTestCase(TestCase):
+    def test_positive_sizes_and_query_are_accepted(self):
+        self.assertEqual(window_size("7"), 7)
+        self.assertEqual(window_size(WINDOW_QUERY), WINDOW_QUERY)
+
+    def test_other_values_are_rejected(self):
+        for value in ["0", "-3", "abc", "2.5", ""]:
+            with self.assertRaises(ArgumentTypeError):
+                window_size(value)
@@ -1,9 +1,16 @@
 # -*- encoding: utf-8 -*-
 
 from os.path import join, dirname, abspath
+from shutil import rmtree
+from tempfile import mkdtemp
 from unittest import TestCase
 
+from numpy.random import RandomState
+
+from external.elka_svg import index, parse
+from pss.raster import polygon_path, RASTERIZER_NUMPY
 from pss.svg import QuerySvg
+from pss.synthetic import random_sign, group_svg, SVG_HEADER
 
 FILE_LOCATION = dirname(abspath(__file__))
 
@@ -27,3 +34,52 @@ class SvgHandlerTestCase(TestCase):
         self.assertEqual(svg_handler.get_symbol_group_size(symbol_group), 16)
 
 
+
+
+def build_nested_query_svg():
+    """
+    Builds an SVG-file of three signs, the second one within a translated group
+    """
+    signs = [random_sign(RandomState(seed), 4) for seed in range(3)]
+    groups = [group_svg("sign{}".format(index), "Query{}".format(index), sign) for index, sign in enumerate(signs)]
+    groups[1] = '<g id="outer" transform="translate(5, 7)">\n' + groups[1].replace(
+        '<g id="sign1">', '<g id="sign1" transform="translate(1, 2)">') + '</g>\n'
+    return SVG_HEADER.format(width=100, height=100) + "".join(groups) + "</svg>\n"
+
+
+class LazyQuerySvgTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.path = join(self.directory, "query.svg")
+        with open(self.path, "w") as handle:
+            handle.write(build_nested_query_svg())
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_index_finds_the_groups_parse_finds(self):
+        _, groups = index("", self.path)
+        self.assertEqual([group[0] for group in groups], [name for name, _ in parse("", self.path, polygon_path)])
+        self.assertEqual(groups[1][3], (5, 7))
+
+    def test_groups_are_parsed_when_accessed(self):
+        svg_query = QuerySvg(self.path, "Query", rasterizer=RASTERIZER_NUMPY)
+        self.assertEqual(svg_query.names, ("Query0", "Query1", "Query2"))
+        self.assertEqual(svg_query.svg_symbol_groups.parsed, dict())
+        self.assertEqual(svg_query.get_symbol_group_size(svg_query.svg_symbol_groups[1]), 4)
+        self.assertEqual(list(svg_query.svg_symbol_groups.parsed), [1])
+
+    def test_parsed_group_equals_the_one_of_parse(self):
+        svg_query = QuerySvg(self.path, rasterizer=RASTERIZER_NUMPY)
+        for lazy, (_, paths) in zip(svg_query.svg_symbol_groups, parse("", self.path, polygon_path)):
+            self.assertEqual([[polygon.tolist() for polygon in path] for path in lazy],
+                             [[polygon.tolist() for polygon in path] for path in paths])
+
+    def test_namespaces_of_ancestors_are_declared(self):
+        sign = random_sign(RandomState(0), 4)
+        group = group_svg("sign0", "Query0", sign).replace("<path ", '<path sodipodi:nodetypes="ccc" ')
+        layer = '<g xmlns:sodipodi="http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd" id="layer">\n{}</g>\n'
+        with open(self.path, "w") as handle:
+            handle.write(SVG_HEADER.format(width=100, height=100) + layer.format(group) + "</svg>\n")
+        svg_query = QuerySvg(self.path, rasterizer=RASTERIZER_NUMPY)
+        self.assertEqual(len(svg_query.svg_symbol_groups[0]), len(next(parse("", self.path, polygon_path))[1]))
@@ -0,0 +1,57 @@
+# -*- encoding: utf-8 -*-
+from os import listdir
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+from xml.etree.ElementTree import fromstring
+
+from numpy.random import RandomState
+from skimage.io import imread
+
+from pss.synthetic import random_sign, query_svg, sign_tree, rasterize, shift, write_png, write_test_resources, \
+    SyntheticTarget, SIGN_SIZE
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+class SyntheticTestCase(TestCase):
+    def setUp(self):
+        self.sign = random_sign(RandomState(0), 6)
+        self.directory = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_query_svg_has_titled_group_of_paths(self):
+        root = fromstring(query_svg([self.sign, self.sign]))
+        groups = root.findall(SVG + "g")
+        self.assertEqual([group.find(SVG + "title").text for group in groups], ["Query", "Query1"])
+        self.assertEqual(len(groups[0].findall(SVG + "path")), 6)
+
+    def test_sign_is_filled_within_its_box(self):
+        strokes = rasterize(shift(self.sign, SIGN_SIZE, SIGN_SIZE), (3 * SIGN_SIZE, 3 * SIGN_SIZE))
+        self.assertTrue(strokes.any())
+        self.assertFalse(strokes[0].any() or strokes[-1].any())
+
+    def test_sign_tree_gets_more_nodes_for_smaller_spacing(self):
+        coarse, fine = sign_tree(self.sign, 8), sign_tree(self.sign, 2)
+        self.assertLess(len(coarse), len(fine))
+        self.assertEqual(fine.parents[fine.root], -1)
+        self.assertTrue((fine.positions < fine.shape).all())
+
+    def test_target_is_reproducible(self):
+        first = SyntheticTarget((200, 300), [self.sign], seed=1)
+        second = SyntheticTarget((200, 300), [self.sign], seed=1)
+        self.assertEqual(first.placements, second.placements)
+        self.assertTrue((first.original_array == second.original_array).all())
+        self.assertTrue((first.original_array == ~first.inverted_array).all())
+
+    def test_png_round_trip(self):
+        strokes = rasterize(self.sign, (60, 70))
+        write_png(self.directory + "/sign.png", strokes)
+        self.assertTrue(((imread(self.directory + "/sign.png") == 0) == strokes).all())
+
+    def test_writes_test_resources(self):
+        write_test_resources(self.directory, shape=(100, 120))
+        self.assertEqual(sorted(listdir(self.directory)),
+                         ["test_query.png", "test_query.svg", "test_target.png", "test_target.svg"])
@@ -0,0 +1,136 @@
+# -*- encoding: utf-8 -*-
+from unittest import TestCase
+
+from numpy import ones, nonzero, argsort, minimum
+from numpy.random import RandomState
+from scipy.ndimage import minimum_filter
+
+from pss.energy import target_distance_transform, tree_energy
+from pss.tiling import TiledSearch, minimum_window
+from tests.test_tree import build_compact_tree
+
+
+class ArrayTarget(object):
+    def __init__(self, original_array):
+        self.original_array = original_array
+
+
+def build_target(seed=0, shape=(90, 120)):
+    """
+    Builds a target of short vertical strokes (zeros) on a white background (ones)
+    """
+    random = RandomState(seed)
+    target = ones(shape)
+    for _ in range(25):
+        y, x = random.randint(0, shape[0]), random.randint(0, shape[1])
+        target[y:y + random.randint(1, 12), x:x + 2] = 0
+    return target
+
+
+def untiled_minima(tree, target, limit):
+    height, width = tree.shape
+    sum_dt = tree_energy(target_distance_transform(target, tree.shape), tree)[height:-height, width:-width]
+    filtered = minimum_filter(sum_dt, size=minimum_window(sum_dt.shape), mode="nearest")
+    ys, xs = nonzero(filtered == sum_dt)
+    order = argsort(sum_dt[ys, xs], kind="stable")[:limit]
+    return ys[order].tolist(), xs[order].tolist(), sum_dt[ys[order], xs[order]].tolist()
+
+
+class TiledSearchTestCase(TestCase):
+    def test_tiles_cover_the_target(self):
+        search = TiledSearch(build_compact_tree(), ArrayTarget(build_target()), 5, tile_size=50)
+        self.assertEqual(list(search.tiles()), [(0, 50, 0, 50), (0, 50, 50, 100), (0, 50, 100, 120),
+                                                (50, 90, 0, 50), (50, 90, 50, 100), (50, 90, 100, 120)])
+
+    def test_tiled_minima_match_untiled_minima(self):
+        tree = build_compact_tree()
+        for seed, tile_size in ((0, 17), (1, 40), (2, 200)):
+            target = build_target(seed)
+            search = TiledSearch(tree, ArrayTarget(target), 10, tile_size=tile_size, radius=2)
+            ys, xs, energies = untiled_minima(tree, target, 10)
+            self.assertEqual(list(search.minimum[0]), ys)
+            self.assertEqual(list(search.minimum[1]), xs)
+            self.assertEqual(search.energies, energies)
+
+    def test_distance_halo_grows_until_distances_are_exact(self):
+        target = ones((60, 60))
+        target[0, 0] = 0
+        search = TiledSearch(build_compact_tree(), ArrayTarget(target), 1, tile_size=20, radius=1)
+        window = (40, 60, 40, 60)
+        expected = target_distance_transform(target, search.padding)[40:60, 40:60]
+        self.assertTrue((search.tile_distance_transform(window) == expected).all())
+
+    def test_distance_halo_of_blank_tile_is_capped(self):
+        import pss.energy
+        from pss.energy import DISTANCE_DIVISOR
+
+        target = ones((300, 300))
+        target[0, 0] = 0
+        search = TiledSearch(build_compact_tree(), ArrayTarget(target), 1, tile_size=20, radius=1, max_radius=8)
+        window = (200, 220, 200, 220)
+        shapes = list()
+        padded_canvas = pss.energy.padded_canvas
+
+        def recording(target_array, padding, halo=None):
+            canvas = padded_canvas(target_array, padding, halo)
+            shapes.append(canvas.shape)
+            return canvas
+
+        pss.energy.padded_canvas = recording
+        try:
+            distances = search.tile_distance_transform(window)
+        finally:
+            pss.energy.padded_canvas = padded_canvas
+        self.assertEqual(max(shapes), (36, 36))
+        expected = target_distance_transform(target, search.padding)[200:220, 200:220]
+        self.assertTrue((distances == minimum(expected, 8 ** 2 / DISTANCE_DIVISOR)).all())
+
+    def test_workers_give_same_minima(self):
+        from tests.test_energy import build_random_tree
+
+        tree = build_random_tree(0, 40)
+        search = TiledSearch(tree, ArrayTarget(build_target()), 5, tile_size=40, workers=3)
+        ys, xs, energies = untiled_minima(tree, build_target(), 5)
+        self.assertEqual((list(search.minimum[0]), list(search.minimum[1]), search.energies), (ys, xs, energies))
+
+    def test_found_symbols_carry_their_energy(self):
+        search = TiledSearch(build_compact_tree(), ArrayTarget(build_target()), 3, tile_size=50)
+        self.assertEqual(len(search.found_symbols), 3)
+        self.assertEqual(search.found_symbols[0][1], search.energies[0])
+
+
+class RecordingTiledSearch(TiledSearch):
+    searched = None
+
+    def tile_minima(self, core):
+        self.searched = (self.searched or list()) + [core]
+        return super(RecordingTiledSearch, self).tile_minima(core)
+
+
+class DetectionsTestCase(TestCase):
+    def setUp(self):
+        self.tree = build_compact_tree()
+        self.target = build_target()
+
+    def test_search_can_be_deferred(self):
+        search = TiledSearch(self.tree, ArrayTarget(self.target), 5, tile_size=40, search=False)
+        self.assertFalse(hasattr(search, "minimum"))
+
+    def test_merged_detections_match_ranking(self):
+        search = TiledSearch(self.tree, ArrayTarget(self.target), 5, tile_size=40)
+        detections = sorted(search.detections(), key=lambda detection: (detection.energy, detection.position))
+        self.assertEqual([detection.position for detection in detections[:5]], list(zip(*search.minimum)))
+        self.assertEqual([detection.energy for detection in detections[:5]], search.energies)
+
+    def test_detections_of_tile_come_before_next_tile_is_searched(self):
+        search = RecordingTiledSearch(self.tree, ArrayTarget(self.target), 5, tile_size=40, search=False)
+        next(search.detections())
+        self.assertEqual(search.searched, [(0, 40, 0, 40)])
+
+    def test_crop_matches_found_symbol(self):
+        search = TiledSearch(self.tree, ArrayTarget(self.target), 5, tile_size=200)
+        for detection, (box, energy) in zip(search.detections(crop=True), search.found_symbols):
+            top, bottom, left, right = detection.bounding_box
+            self.assertEqual(detection.crop.tolist(), box.tolist())
+            self.assertEqual((bottom - top, right - left), self.tree.shape)
+            self.assertEqual(detection.energy, energy)
@@ -0,0 +1,102 @@
+# -*- encoding: utf-8 -*-
+from pickle import dumps, loads
+from unittest import TestCase
+
+from numpy import array, int32
+
+from pss.tree import minimum_spanning_tree, CompactTree, compact
+
+
+def build_positions():
+    return array([[1, 2], [2, 2], [2, 4], [3, 5], [3, 1], [4, 2], [5, 3], [6, 2], [7, 4], [6, 5]])
+
+
+class MinimumSpanningTreeTestCase(TestCase):
+    def test_every_node_but_the_root_gets_a_parent(self):
+        relations = minimum_spanning_tree(build_positions(), 5)
+        self.assertEqual(sorted(child for child, _ in relations), [0, 1, 2, 3, 4, 6, 7, 8, 9])
+
+    def test_parents_are_added_before_their_children(self):
+        added = {5}
+        for child, parent in minimum_spanning_tree(build_positions(), 5):
+            self.assertIn(parent, added)
+            added.add(child)
+
+    def test_relations_of_small_tree(self):
+        relations = dict(minimum_spanning_tree(build_positions(), 5))
+        self.assertEqual(relations, {0: 1, 1: 4, 2: 1, 3: 2, 4: 5, 6: 5, 7: 6, 8: 6, 9: 8})
+
+    def test_ties_are_won_by_the_earlier_node(self):
+        relations = minimum_spanning_tree(array([[0, 0], [0, 2], [0, -2]]), 0)
+        self.assertEqual(relations, [(1, 0), (2, 0)])
+
+    def test_nodes_on_the_same_position_are_not_connected(self):
+        relations = minimum_spanning_tree(array([[0, 0], [0, 0], [0, 5]]), 0)
+        self.assertEqual(relations, [(2, 0), (1, 2)])
+
+
+class GreedyTreeTestCase(TestCase):
+    def test_prim_creates_same_relations_as_find_closest_node(self):
+        from pss.model import Node, Query, TREE_GREEDY, TREE_PRIM
+
+        relations = dict()
+        for tree in (TREE_GREEDY, TREE_PRIM):
+            query = Query.__new__(Query)
+            query.tree = tree
+            query.nodes = [Node(position=position) for position in build_positions()]
+            query.root_node = query.nodes[5]
+            nodes = list(query.nodes)
+            query.build_up_tree()
+            relations[tree] = [(nodes.index(node.parent) if node.parent else None, list(node.offset))
+                               for node in nodes if node.parent]
+        self.assertEqual(relations[TREE_GREEDY], relations[TREE_PRIM])
+
+
+def build_compact_tree():
+    """
+    Builds a small tree by hand:    0
+                                   / \
+                                  1   2
+                                  |
+                                  3
+    """
+    positions = array([[5, 5], [5, 8], [2, 5], [8, 8]])
+    offsets = array([[0, 0], [0, 3], [-3, 0], [3, 0]])
+    return CompactTree(positions, offsets, [-1, 0, 0, 1], [0, 1, 3, 2], (10, 10))
+
+
+class CompactTreeTestCase(TestCase):
+    def setUp(self):
+        self.tree = build_compact_tree()
+
+    def test_arrays_are_int32(self):
+        for values in (self.tree.positions, self.tree.offsets, self.tree.parents, self.tree.order):
+            self.assertEqual(values.dtype, int32)
+
+    def test_root_is_first_in_order(self):
+        self.assertEqual(self.tree.root, 0)
+        self.assertEqual(list(self.tree.root_position), [5, 5])
+
+    def test_children_keep_their_order(self):
+        self.assertEqual(self.tree.children(), [[1, 2], [3], [], []])
+
+    def test_can_be_pickled(self):
+        tree = loads(dumps(self.tree))
+        self.assertEqual(tree.shape, (10, 10))
+        self.assertTrue((tree.offsets == self.tree.offsets).all())
+
+    def test_compact_returns_compact_tree_itself(self):
+        self.assertIs(compact(self.tree), self.tree)
+
+    def test_can_be_created_from_nodes(self):
+        from pss.model import Node, link_nodes
+
+        nodes = [Node(position=position) for position in self.tree.positions]
+        link_nodes(nodes[1], nodes[0])
+        link_nodes(nodes[2], nodes[0])
+        link_nodes(nodes[3], nodes[1])
+
+        tree = CompactTree.from_node(nodes[0], (10, 10))
+        self.assertEqual(tree.positions.tolist(), [[5, 5], [5, 8], [8, 8], [2, 5]])
+        self.assertEqual(tree.offsets.tolist(), [[0, 0], [0, 3], [3, 0], [-3, 0]])
+        self.assertEqual(tree.parents.tolist(), [-1, 0, 1, 0])
@@ -0,0 +1,77 @@
+# -*- encoding: utf-8 -*-
+from unittest import TestCase
+
+from numpy import array, eye, hstack
+from numpy.random import RandomState
+
+from external.elka_svg import overlapping_boxes
+from pss.vector import merge_vertices, stroke_graph, sample_edges
+
+
+def build_cross():
+    """
+    Builds two strokes crossing at (5, 5)
+    """
+    ends = array([[[0, 5], [10, 5]], [[5, 0], [5, 10]]], dtype=float)
+    return ends, [(0, 1, (5, 5))]
+
+
+class StrokeGraphTestCase(TestCase):
+    def test_close_vertices_are_merged_into_the_first(self):
+        vertices, remap = merge_vertices([[0, 0], [5, 5], [0.5, 0], [5, 5.2]])
+        self.assertEqual(vertices.tolist(), [[0, 0], [5, 5]])
+        self.assertEqual(remap.tolist(), [0, 1, 0, 1])
+
+    def test_strokes_are_cut_at_their_intersections(self):
+        vertices, edges = stroke_graph(*build_cross())
+        self.assertEqual(vertices.tolist(), [[0, 5], [10, 5], [5, 0], [5, 10], [5, 5]])
+        self.assertEqual(edges, [(0, 4), (1, 4), (2, 4), (3, 4)])
+
+    def test_intersections_are_sorted_along_the_stroke(self):
+        ends = array([[[0, 0], [0, 12]], [[-1, 8], [1, 8]], [[-1, 4], [1, 4]]], dtype=float)
+        vertices, edges = stroke_graph(ends, [(0, 1, (0, 8)), (0, 2, (0, 4))])
+        along = [(a, b) for a, b in edges if vertices[a][0] == vertices[b][0] == 0]
+        self.assertEqual(sorted(tuple(sorted(vertices[[a, b], 1])) for a, b in along), [(0, 4), (4, 8), (8, 12)])
+
+    def test_stroke_without_intersections_is_one_edge(self):
+        vertices, edges = stroke_graph(array([[[0, 0], [0, 9]]]), [])
+        self.assertEqual(edges, [(0, 1)])
+
+    def test_edges_are_sampled_about_distance_apart(self):
+        vertices, edges = stroke_graph(*build_cross())
+        points = sample_edges(vertices, edges, 3)
+        self.assertEqual(len(points), 9)
+        self.assertEqual(points[:5].tolist(), vertices.tolist())
+        self.assertIn([2.5, 5], points.tolist())
+
+    def test_short_edges_get_no_points_between_their_vertices(self):
+        points = sample_edges(array([[0, 0], [0, 4]], dtype=float), [(0, 1)], 3)
+        self.assertEqual(len(points), 2)
+
+
+def build_random_boxes(seed, count, size=100):
+    random = RandomState(seed)
+    corners = random.uniform(0, size, size=(count, 2))
+    extents = random.uniform(1, 8, size=(count, 2))
+    return hstack([corners, corners + extents])
+
+
+class SpatialIndexTestCase(TestCase):
+    def test_overlapping_boxes_finds_every_pair_once(self):
+        boxes = build_random_boxes(0, 150)
+        expected = [(i, j) for i in range(len(boxes)) for j in range(i + 1, len(boxes))
+                    if boxes[i, 0] <= boxes[j, 2] and boxes[j, 0] <= boxes[i, 2] and
+                    boxes[i, 1] <= boxes[j, 3] and boxes[j, 1] <= boxes[i, 3]]
+        self.assertEqual(overlapping_boxes(boxes), expected)
+
+    def test_touching_boxes_overlap(self):
+        self.assertEqual(overlapping_boxes([[0, 0, 1, 1], [1, 1, 2, 2], [3, 0, 4, 1]]), [(0, 1)])
+
+    def test_merge_vertices_matches_comparing_all_pairs(self):
+        points = RandomState(1).uniform(0, 20, size=(300, 2))
+        vertices, remap = merge_vertices(points, 1.5)
+        for point, index in zip(points, remap):
+            distances = ((vertices - point) ** 2).sum(axis=1)
+            self.assertLess(distances[index], 1.5 ** 2)
+        self.assertTrue((((vertices[:, None] - vertices[None]) ** 2).sum(axis=2) + eye(len(vertices)) * 9 >=
+                         1.5 ** 2).all())